@@ -0,0 +1,115 @@
+"""
+Throughput benchmark for response parsing.
+
+Parses a corpus of extraction responses repeatedly with response_parser and
+reports responses per second for the text format and for structured output.
+The corpus is the message content of the mock server's recordings (see
+mock_openai_server.py) when there are any, plus synthetic responses in both
+formats covering units, dimensions, JSON-like values and duplicate synonyms.
+
+Usage:
+    python benchmark_parser.py --recordings llm_recordings --seconds 2
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+
+import mock_openai_server
+import response_parser
+
+SYNTHETIC_PARAMETERS = [
+    ("BORE DIAMETER", "ø50 mm"), ("BORE", "50 mm"), ("ROD DIAMETER", "28 mm"), ("STROKE LENGTH", "200 mm"),
+    ("OPERATING PRESSURE", "160 bar"), ("WORKING PRESSURE", "2320 psi"), ("TEST PRESSURE", "24 MPA"),
+    ("MOUNTING TYPE", "{'Front': 'Flange', 'Rear': 'Clevis'}"), ("PORT TYPE", "BSP"), ("PORT SIZE", "G1/2"),
+    ("DIMENSIONS", "93 x 55 x 29 cm"), ("CLOSED HEIGHT", "200mm FOR 1 TON, 750mm FOR 1.5TON"),
+    ("LOAD CAPACITY", "5 t"), ("TEMPERATURE RANGE", "-20 C to 80 C"), ("MATERIAL", "Not specified"),
+    ("DRAWING NUMBER", "HC-0042"), ("WEIGHT", "[value]"),
+    # Identifiers whose digits are followed by a unit-like letter must be left alone
+    ("MODEL NUMBER", "HC-4520C"), ("DWG NO", "DWG-1002F"), ("PART NUMBER", "300F-12")
+]
+
+
+def synthetic_responses(count, seed=7):
+    """Text and structured responses built from random subsets of SYNTHETIC_PARAMETERS"""
+    rng = random.Random(seed)
+    texts, structured = [], []
+    for _ in range(count):
+        chosen = rng.sample(SYNTHETIC_PARAMETERS, rng.randint(6, len(SYNTHETIC_PARAMETERS)))
+        lines = ["DOCUMENT_TYPE: Engineering Drawing", "COMPONENT_TYPE: CYLINDER"]
+        for name, value in chosen:
+            lines.append(f"{name}: {value}")
+            if rng.random() < 0.8:
+                lines.append(f"{name}_JUSTIFICATION: Read from the specification table at the top right.")
+        texts.append("\n".join(lines))
+        structured.append({
+            "document_type": "Engineering Drawing",
+            "component_type": "CYLINDER",
+            "parameters": [
+                {"name": name, "value": value, "justification": "Read from the title block."}
+                for name, value in chosen
+            ]
+        })
+    return texts, structured
+
+
+def recorded_responses(directory):
+    """Message contents of the mock server's recordings, split into text and structured responses"""
+    texts, structured = [], []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "rb") as f:
+                completion = json.loads(f.read())
+            content = completion["choices"][0]["message"]["content"]
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            continue
+        if not isinstance(content, str):
+            continue
+        try:
+            data = json.loads(content)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and "parameters" in data:
+            structured.append(data)
+        else:
+            texts.append(content)
+    return texts, structured
+
+
+def measure(parse, corpus, seconds):
+    """Parse the corpus round after round for about the given time; return responses per second"""
+    parsed = 0
+    started = time.perf_counter()
+    while True:
+        for item in corpus:
+            parse(item)
+        parsed += len(corpus)
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return parsed / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response parsing throughput")
+    parser.add_argument("--recordings", default=mock_openai_server.DEFAULT_RECORDINGS_DIR,
+                        help="Directory of mock server recordings to take responses from")
+    parser.add_argument("--synthetic", type=int, default=200, help="Synthetic responses of each format")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time spent on each format")
+    args = parser.parse_args()
+
+    texts, structured = recorded_responses(args.recordings)
+    print(f"{len(texts)} recorded text and {len(structured)} recorded structured response(s)")
+    synthetic_texts, synthetic_structured = synthetic_responses(args.synthetic)
+    texts += synthetic_texts
+    structured += synthetic_structured
+
+    for name, parse, corpus in [("text", response_parser.parse_text, texts),
+                                ("structured", response_parser.parse_structured, structured)]:
+        rate = measure(parse, corpus, args.seconds)
+        print(f"{name:>10}: {rate:10.0f} responses/s over {len(corpus)} response(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Offline throughput benchmark for the LLM request path.
+
+Starts mock_openai_server.py in-process and pushes synthetic pages through
+page_pipeline and llm_transport (scheduler, retries, streaming) at several
+concurrency levels, reporting wall time, pages per second, page latency
+percentiles and the scheduler counters. The response cache is disabled so
+every call reaches the server, and every level starts with a fresh
+scheduler whose limits (--scheduler-rpm, --scheduler-tpm) are high by
+default, so the levels compare concurrency rather than run order.
+
+Usage:
+    python benchmark_pipeline.py --pages 40 --concurrency 1,4,8 --latency lognormal:1.0,0.5 --rate-429 0.05
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+# Every call must reach the server; set before the transport modules read their settings
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+import llm_transport  # noqa: E402
+import metrics  # noqa: E402
+import mock_openai_server  # noqa: E402
+import page_pipeline  # noqa: E402
+import rate_limiter  # noqa: E402
+
+SYNTHETIC_CONTENT = json.dumps({
+    "document_type": "Engineering Drawing",
+    "component_type": "CYLINDER",
+    "parameters": [
+        {"name": name, "value": value, "justification": "Read from the specification table at the top right."}
+        for name, value in [
+            ("BORE DIAMETER", "50 mm"), ("ROD DIAMETER", "28 mm"), ("STROKE LENGTH", "200 mm"),
+            ("OPERATING PRESSURE", "160 BAR"), ("MOUNTING TYPE", "Rear clevis"), ("DRAWING NUMBER", "HC-0042")
+        ]
+    ]
+})
+
+
+def synthetic_completion():
+    return json.dumps({
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": SYNTHETIC_CONTENT}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1500, "completion_tokens": 400, "total_tokens": 1900}
+    }).encode("utf-8")
+
+
+def make_worker(url, calls_per_page, stream):
+    def worker(page):
+        started = time.perf_counter()
+        for call in range(calls_per_page):
+            payload = {
+                "model": "gpt-4o",
+                "messages": [{"role": "user", "content": f"Benchmark page {page} call {call}"}],
+                "max_tokens": 400,
+                "temperature": 0.1
+            }
+            if stream:
+                response = llm_transport.stream_chat_completion(url, payload, lambda text: None)
+            else:
+                response = llm_transport.post_chat_completion(url, payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+        return time.perf_counter() - started
+    return worker
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM request path against the local stand-in server")
+    parser.add_argument("--pages", type=int, default=24)
+    parser.add_argument("--calls-per-page", type=int, default=3, help="Model calls per page (triage, extraction, second pass)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated page concurrency levels")
+    parser.add_argument("--keys", type=int, default=1, help="Number of API keys in the scheduler pool")
+    parser.add_argument("--stream", action="store_true", help="Use streamed completions")
+    parser.add_argument("--latency", default="lognormal:0.5,0.4")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute the stand-in server allows")
+    # Client-side scheduler limits, high by default so levels measure concurrency rather than the token budget
+    parser.add_argument("--scheduler-rpm", type=int, default=1000000, help="Scheduler requests per minute per key")
+    parser.add_argument("--scheduler-tpm", type=int, default=1000000000, help="Scheduler tokens per minute per key")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server_args = mock_openai_server.build_arg_parser().parse_args([
+        "--port", "0", "--latency", args.latency, "--token-delay", str(args.token_delay),
+        "--rate-429", str(args.rate_429), "--rpm", str(args.rpm), "--retry-after", "0.2", "--seed", str(args.seed)
+    ])
+    server, state = mock_openai_server.start_server(server_args)
+    state.default_response = synthetic_completion()
+    url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+    api_keys = [f"benchmark-key-{i}" for i in range(args.keys)]
+    worker = make_worker(url, args.calls_per_page, args.stream)
+
+    print(f"{'workers':>7} {'wall s':>8} {'pages/s':>8} {'p50 s':>7} {'p95 s':>7} {'retries':>8} {'429s':>6} {'waits':>6}")
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        random.seed(args.seed)
+        metrics.reset()
+        # Fresh token buckets per level, so earlier levels do not throttle later ones
+        rate_limiter.install(rate_limiter.RequestScheduler(api_keys, args.scheduler_rpm, args.scheduler_tpm))
+        started = time.perf_counter()
+        results = page_pipeline.run_pages(range(args.pages), worker, max_workers=concurrency)
+        wall = time.perf_counter() - started
+
+        latencies = [result for result in results if isinstance(result, float)]
+        counters = metrics.snapshot()
+        print(f"{concurrency:>7} {wall:>8.2f} {args.pages / wall:>8.2f} {percentile(latencies, 0.5):>7.2f} "
+              f"{percentile(latencies, 0.95):>7.2f} {counters.get('llm_retries', 0):>8} "
+              f"{counters.get('llm_rate_limited', 0):>6} {counters.get('llm_scheduler_waits', 0):>6}")
+        failed = len(results) - len(latencies)
+        if failed:
+            print(f"        {failed} page(s) failed")
+
+    print(json.dumps(state.counters))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-page CPU cost of PDF page rendering: PNG round-trip versus direct samples.
+
+Compares the old chain (pixmap -> PNG -> PIL decode -> RGB -> JPEG with
+optimize) with pdf_raster's path (pixmap samples -> PIL frombuffer -> JPEG)
+and reports CPU milliseconds per page for each. Uses the given PDF, or a
+synthetic drawing-like document when none is given.
+
+Usage:
+    python benchmark_raster.py --pdf vendor_drawings.pdf --pages 20
+"""
+import argparse
+import io
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import pdf_raster
+
+
+def png_chain(page, zoom):
+    """The previous render path, kept here as the baseline"""
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    img = Image.open(io.BytesIO(pix.tobytes("png"))).convert('RGB')
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='JPEG', quality=90, optimize=True)
+    return img_byte_arr.getvalue()
+
+
+def direct_samples(page, zoom):
+    img = pdf_raster.pixmap_to_image(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False))
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='JPEG', quality=90)
+    return img_byte_arr.getvalue()
+
+
+def synthetic_pdf(pages):
+    """A4 landscape pages with line work, dimensions and a title block"""
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page(width=842, height=595)
+        for i in range(40):
+            page.draw_line((40 + i * 18, 60), (40 + i * 18, 420))
+            page.draw_circle((300 + (i % 8) * 40, 240), 10 + i % 5)
+            page.insert_text((50 + (i % 10) * 70, 450 + (i // 10) * 14), f"Ø{20 + i} ±0.{i % 9}", fontsize=8)
+        page.draw_rect((560, 470, 820, 580))
+        page.insert_text((570, 500), f"DRAWING NO. HC-{page_num:04d}   SCALE 1:2", fontsize=10)
+    return document.tobytes()
+
+
+def measure(document, render, zoom):
+    sizes = []
+    started = time.process_time()
+    for page in document:
+        sizes.append(len(render(page, zoom)))
+    elapsed = time.process_time() - started
+    return elapsed / max(1, len(sizes)) * 1000, sum(sizes) / max(1, len(sizes)) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page rendering CPU time per page")
+    parser.add_argument("--pdf", default=None, help="PDF to render (synthetic document when omitted)")
+    parser.add_argument("--pages", type=int, default=10, help="Pages in the synthetic document")
+    parser.add_argument("--zoom", type=float, default=pdf_raster.RASTER_ZOOM)
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        pdf_bytes = synthetic_pdf(args.pages)
+    document = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+    print(f"{document.page_count} page(s) at zoom {args.zoom}")
+    for name, render in [("png round-trip", png_chain), ("direct samples", direct_samples)]:
+        cpu_ms, size_kb = measure(document, render, args.zoom)
+        print(f"{name:>15}: {cpu_ms:8.1f} ms CPU/page, {size_kb:8.1f} KB/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,39 @@
 import streamlit as st
 import base64
-from PIL import Image, ImageDraw, ImageFont
+import json
+from PIL import Image
 import io
 import pandas as pd
 import os
-import requests
 import datetime
 from pdf2image import convert_from_bytes
 import tempfile
 import sys
 import subprocess
-import fitz  # PyMuPDF
 from pdf2image.exceptions import PDFPageCountError
 import uuid
-import numpy as np
-
-# Try to import pytesseract, but make it optional
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
-
-import pytesseract
-pytesseract.pytesseract.tesseract_cmd = r"C:\Users\shrey\Downloads\tesseract-ocr-w64-setup-v5.3.0.20221214.exe"
+import llm_transport
+import page_pipeline
+import metrics
+import image_policy
+import regions
+import stream_parser
+import pdf_raster
+import pdf_text
+import orientation
+import ocr_orientation
+import page_badge
+import jpeg_rotation
+import phash_index
+import tiling
+import image_store
+import thumbnails
+import response_parser
+import units
+import param_aliases
+
+# pytesseract is optional; set TESSERACT_CMD when the tesseract binary is not on PATH
+TESSERACT_AVAILABLE = ocr_orientation.TESSERACT_AVAILABLE
 
 
 
@@ -51,9 +61,18 @@ if not API_KEY:
 if 'current_api_key' not in st.session_state:
     st.session_state.current_api_key = API_KEY
 
+# Pool of API keys rotated by the request scheduler - add extra keys as a
+# comma-separated OPENAI_API_KEYS environment variable
+API_KEYS = [API_KEY] + [key.strip() for key in os.environ.get("OPENAI_API_KEYS", "").split(",") if key.strip()]
+llm_transport.configure_api_keys(API_KEYS)
 
-def handle_api_response(response_json, retry_func=None, *args, **kwargs):
-    """Handle API response and switch keys if needed"""
+
+def handle_api_response(response_json):
+    """
+    Handle API error responses.
+    Rate limits are retried and rotated across keys by the request scheduler,
+    so a rate-limit error reaching this point means every key is exhausted.
+    """
     if 'error' in response_json:
         error = response_json.get('error', {})
         if isinstance(error, dict):
@@ -62,15 +81,9 @@ def handle_api_response(response_json, retry_func=None, *args, **kwargs):
             error_message = error.get('message', '')
             
             # Check for rate limit error
-            if error_type == 'rate_limit_exceeded' or 'rate limit' in error_message.lower():
-                if switch_api_key():
-                    st.warning("Switching to alternate API key due to rate limit...")
-                    if retry_func:
-                        return retry_func(*args, **kwargs)
-                    return None
-                else:
-                    st.error("❌ All API keys have reached their rate limits!")
-                    return None
+            if error_type == 'rate_limit_exceeded' or error_code == 'rate_limit_exceeded' or 'rate limit' in error_message.lower():
+                st.error("❌ All API keys have reached their rate limits!")
+                return None
             # Handle other specific error codes
             elif error_code == 'invalid_api_key' or error_type == 'invalid_request_error' and 'api key' in error_message.lower():
                 st.error("❌ Authentication failed: Please check your API key")
@@ -86,103 +99,66 @@ def handle_api_response(response_json, retry_func=None, *args, **kwargs):
                 return None
     return response_json
 
-def process_api_response(response, retry_func=None, *args, **kwargs):
+def extract_response_content(content):
+    """
+    Normalise message content from the model into the parameter-justification text format.
+    A parameter block following other text is cut out, and a fenced JSON block is
+    converted to KEY: value lines. Anything else is returned unchanged.
+    """
+    # First, check if there's a parameter-justification format after the JSON
+    # This is our preferred format as it already has justifications
+    if "DOCUMENT_TYPE:" in content and "DOCUMENT_TYPE_JUSTIFICATION:" in content:
+        # Find where the parameter format starts
+        param_start = content.find("DOCUMENT_TYPE:")
+        if param_start > 0:
+            return content[param_start:]
+    
+    # If no parameter format, check for JSON
+    if "```json" in content and "```" in content.split("```json", 1)[1]:
+        # Extract JSON content
+        json_content = content.split("```json", 1)[1].split("```", 1)[0].strip()
+        # Try to parse it as JSON
+        try:
+            parsed_json = json.loads(json_content)
+            # Convert JSON to parameter format
+            formatted_content = []
+            for key, value in parsed_json.items():
+                # Skip null or N/A values
+                if value is None or value == "N/A":
+                    continue
+                # Format key properly
+                formatted_key = key.upper().replace(" ", "_")
+                formatted_content.append(f"{formatted_key}: {value}")
+                # Add justification
+                if key == "Document Type":
+                    formatted_content.append(f"{formatted_key}_JUSTIFICATION: Determined based on document format and content.")
+                elif key == "Component Type":
+                    formatted_content.append(f"{formatted_key}_JUSTIFICATION: Identified from component characteristics in the document.")
+                elif key == "Notes":
+                    continue  # Skip justification for notes
+                else:
+                    formatted_content.append(f"{formatted_key}_JUSTIFICATION: Extracted from the document. Specific location unspecified.")
+            return "\n".join(formatted_content)
+        except Exception as e:
+            # If JSON parsing fails, return the original content
+            print(f"JSON parsing error: {str(e)}")
+    
+    # If no JSON or parameter format found, return the original content
+    return content
+
+def process_api_response(response):
     """Process API response and handle errors"""
     try:
         response_json = response.json()
         
         # Check if response is successful and contains choices for OpenAI
         if response.status_code == 200 and "choices" in response_json:
-            content = response_json["choices"][0]["message"]["content"]
-            
-            # First, check if there's a parameter-justification format after the JSON
-            # This is our preferred format as it already has justifications
-            if "DOCUMENT_TYPE:" in content and "DOCUMENT_TYPE_JUSTIFICATION:" in content:
-                # Find where the parameter format starts
-                param_start = content.find("DOCUMENT_TYPE:")
-                if param_start > 0:
-                    return content[param_start:]
-            
-            # If no parameter format, check for JSON
-            if "```json" in content and "```" in content.split("```json", 1)[1]:
-                # Extract JSON content
-                json_content = content.split("```json", 1)[1].split("```", 1)[0].strip()
-                # Try to parse it as JSON
-                try:
-                    import json
-                    parsed_json = json.loads(json_content)
-                    # Convert JSON to parameter format
-                    formatted_content = []
-                    for key, value in parsed_json.items():
-                        # Skip null or N/A values
-                        if value is None or value == "N/A":
-                            continue
-                        # Format key properly
-                        formatted_key = key.upper().replace(" ", "_")
-                        formatted_content.append(f"{formatted_key}: {value}")
-                        # Add justification
-                        if key == "Document Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Determined based on document format and content.")
-                        elif key == "Component Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Identified from component characteristics in the document.")
-                        elif key == "Notes":
-                            continue  # Skip justification for notes
-                        else:
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Extracted from the document. Specific location unspecified.")
-                    return "\n".join(formatted_content)
-                except Exception as e:
-                    # If JSON parsing fails, return the original content
-                    print(f"JSON parsing error: {str(e)}")
-            
-            # If no JSON or parameter format found, return the original content
-            return content
+            return extract_response_content(response_json["choices"][0]["message"]["content"])
             
         # Handle API errors
-        handled_response = handle_api_response(response_json, retry_func, *args, **kwargs)
+        handled_response = handle_api_response(response_json)
         if handled_response and "choices" in handled_response:
-            content = handled_response["choices"][0]["message"]["content"]
-            
-            # First, check if there's a parameter-justification format after the JSON
-            # This is our preferred format as it already has justifications
-            if "DOCUMENT_TYPE:" in content and "DOCUMENT_TYPE_JUSTIFICATION:" in content:
-                # Find where the parameter format starts
-                param_start = content.find("DOCUMENT_TYPE:")
-                if param_start > 0:
-                    return content[param_start:]
-            
-            # If no parameter format, check for JSON
-            if "```json" in content and "```" in content.split("```json", 1)[1]:
-                # Extract JSON content
-                json_content = content.split("```json", 1)[1].split("```", 1)[0].strip()
-                # Try to parse it as JSON
-                try:
-                    import json
-                    parsed_json = json.loads(json_content)
-                    # Convert JSON to parameter format
-                    formatted_content = []
-                    for key, value in parsed_json.items():
-                        # Skip null or N/A values
-                        if value is None or value == "N/A":
-                            continue
-                        # Format key properly
-                        formatted_key = key.upper().replace(" ", "_")
-                        formatted_content.append(f"{formatted_key}: {value}")
-                        # Add justification
-                        if key == "Document Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Determined based on document format and content.")
-                        elif key == "Component Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Identified from component characteristics in the document.")
-                        elif key == "Notes":
-                            continue  # Skip justification for notes
-                        else:
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Extracted from the document. Specific location unspecified.")
-                    return "\n".join(formatted_content)
-                except Exception as e:
-                    # If JSON parsing fails, return the original content
-                    print(f"JSON parsing error: {str(e)}")
-            
-            # If no JSON or parameter format found, return the original content
-            return content
+            return extract_response_content(handled_response["choices"][0]["message"]["content"])
             
         # If we get here, something went wrong
         error_info = response_json.get('error', {})
@@ -196,376 +172,106 @@ def process_api_response(response, retry_func=None, *args, **kwargs):
     except Exception as e:
         return f"❌ Processing Error: {str(e)}"
 
-# OpenAI API URL for GPT-4o
-API_URL = "https://api.openai.com/v1/chat/completions"
+# OpenAI API URL for GPT-4o - point LLM_API_URL at any OpenAI-compatible endpoint,
+# e.g. the local stand-in in mock_openai_server.py for offline benchmarking
+API_URL = os.environ.get("LLM_API_URL", "https://api.openai.com/v1/chat/completions")
+
+# Open pooled connections to the API host once per process
+llm_transport.warm_up(API_URL)
+
+# Request extraction results as JSON matching a schema instead of free text
+STRUCTURED_OUTPUT = os.environ.get("LLM_STRUCTURED_OUTPUT", "1") != "0"
+# Stream first-pass extraction responses so fields show up as they arrive
+STREAM_RESPONSES = os.environ.get("LLM_STREAM", "1") != "0"
+# Image sent with vector PDF pages whose text layer is used: "small" or "none"
+PDF_TEXT_IMAGE = os.environ.get("PDF_TEXT_IMAGE", "small")
 
 def encode_image_to_base64(image_bytes):
     return "data:image/jpeg;base64," + base64.b64encode(image_bytes).decode("utf-8")
 
-def parse_ai_response(response_text):
-    """Parse the AI response into a structured format with enhanced handling for mixed document types."""
-    results = {}
-    justifications = {}
-    document_info = {}
-    lines = response_text.split('\n')
+def get_llm_cache_context(component_type=None):
+    """Extraction settings that shape the prompt and therefore belong in the LLM cache key"""
+    custom_parameters = st.session_state.get("custom_parameters", {})
+    return {
+        "parameter_mode": st.session_state.get("parameter_mode"),
+        "custom_parameters": custom_parameters.get(component_type, []) if component_type else []
+    }
+
+def build_extraction_schema(component_type=None):
+    """
+    Build the response_format for structured extraction output.
+    In Custom mode parameter names are restricted to the custom list; otherwise the
+    expected parameters for the component type are listed while any name is accepted.
+    """
+    custom_params = []
+    if st.session_state.parameter_mode == "Custom" and component_type:
+        custom_params = st.session_state.custom_parameters.get(component_type, [])
     
-    # Debug the raw response
-    print(f"Raw AI response: {response_text[:200]}...")
+    name_schema = {"type": "string"}
+    if custom_params:
+        name_schema["enum"] = list(custom_params)
+    else:
+        expected_params = get_parameters_for_type(component_type)
+        name_schema["description"] = (
+            "Parameter name exactly as it appears in the document. Parameters commonly found: "
+            + ", ".join(expected_params)
+        )
     
-    # First pass to extract document type information
-    for line in lines:
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip().upper()
-            value = value.strip()
-            
-            # Capture document type information
-            if key == "DOCUMENT_TYPE":
-                document_info["DOCUMENT_TYPE"] = value
-            elif key == "COMPONENT_TYPE":
-                document_info["COMPONENT_TYPE"] = value
-    
-    # Add document info to results if found
-    if document_info:
-        for key, value in document_info.items():
-            results[key] = value
-    
-    # Second pass to extract all parameters and justifications
-    for line in lines:
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip().upper()
-            # Remove any ** characters from parameter names
-            key = key.replace('*', '')
-            value = value.strip()
-            # Remove any ** characters from the beginning of values
-            if value.startswith('**'):
-                value = value[2:].strip()
-            
-            # Skip document type keys already processed
-            if key in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
-                continue
-                
-            # Check if this is a justification field
-            if key.endswith('_JUSTIFICATION'):
-                base_key = key.replace('_JUSTIFICATION', '')
-                justifications[base_key] = value
-            else:
-                # Check if value contains any variation of [value] and set to empty if it does
-                if '[value]' in value.lower() or '[values]' in value.lower():
-                    value = ""
-                
-                # Handle different forms of "Not Specified" consistently
-                if any(not_spec in value.upper() for not_spec in ["NOT SPECIFIED", "NOT AVAILABLE", "NOT VISIBLE", "UNKNOWN", "N/A", "NONE", "NOT FOUND", "NOT INDICATED", "NOT MARKED", "NOT GIVEN", "MISSING"]):
-                    value = ""
-                    
-                # Parse JSON-like structures into separate lines
-                if (value.startswith('{') and value.endswith('}')) or \
-                   (value.startswith('[{') and value.endswith('}]')) or \
-                   (value.startswith("'") and ":" in value):
-                    try:
-                        # Handle dict format: {'key1': 'value1', 'key2': 'value2'} 
-                        # or list format: [{'key': 'value'}]
-                        # or quoted string format: 'Mounting': 'Rear Clevis'
-                        
-                        # Strip outer brackets for processing
-                        processed_value = value
-                        if value.startswith('[{') and value.endswith('}]'):
-                            processed_value = value[1:-1]  # Remove outer brackets
-                        if value.startswith('{') and value.endswith('}'):
-                            processed_value = value.strip('{}')
-                            
-                        value_parts = []
-                        
-                        # Handle different formats of key-value pairs
-                        import re
-                        
-                        # Try to directly extract key-value pairs
-                        # This handles formats like 'key1': 'value1', 'key2': 'value2'
-                        pairs = re.findall(r'[\'"]([^\'"]*)[\'"]\s*:\s*[\'"]([^\'"]*)[\'"]\s*(?:,|$)', processed_value)
-                        
-                        if pairs:
-                            # Just use the values directly without the keys - this is what we want to display
-                            value_parts = [v for _, v in pairs]
-                            value = v if len(value_parts) == 1 else "\n".join(value_parts)
-                        else:
-                            # Fallback to simple splitting if regex didn't work
-                            if ',' in processed_value:
-                                parts = processed_value.split(',')
-                                for part in parts:
-                                    if ':' in part:
-                                        k, v = part.split(':', 1)
-                                        k = k.strip().strip('\'"')
-                                        v = v.strip().strip('\'"')
-                                        # Just add the value, not the key
-                                        value_parts.append(v)
-                                
-                                if value_parts:
-                                    value = value_parts[0] if len(value_parts) == 1 else "\n".join(value_parts)
-                    except Exception as e:
-                        # If parsing fails, keep the original value but remove quotes and braces
-                        if value.startswith("'") and value.endswith("'"):
-                            value = value.strip("'")
-                        elif value.startswith('"') and value.endswith('"'):
-                            value = value.strip('"')
-                        print(f"Error parsing JSON-like value: {e}")
-                
-                # Clean and standardize common units
-                if value:
-                    # Standardize diameter symbol
-                    value = value.replace('ø', 'Ø')
-                    
-                    # Standardize units for consistency
-                    unit_mappings = {
-                        r'\bmm\b': 'mm',
-                        r'\bcm\b': 'cm',
-                        r'\bm\b': 'm',
-                        r'\bkg\b': 'kg',
-                        r'\bg\b': 'g',
-                        r'\bt\b': 'tons',
-                        r'\bbar\b': 'BAR',
-                        r'\bBAR\b': 'BAR',
-                        r'\bpsi\b': 'PSI',
-                        r'\bPSI\b': 'PSI',
-                        r'\bmpa\b': 'MPa',
-                        r'\bMPa\b': 'MPa',
-                        r'\bMPA\b': 'MPa',
-                        r'\bC\b': '°C',
-                        r'\bF\b': '°F',
-                        r'\b°C\b': '°C',
-                        r'\b°F\b': '°F',
-                        r'\bDEG C\b': '°C',
-                        r'\bDEG F\b': '°F'
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "drawing_extraction",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "document_type": {"type": "string"},
+                    "component_type": {"type": "string"},
+                    "parameters": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": name_schema,
+                                "value": {"type": "string", "description": "Value with units, empty if not found"},
+                                "justification": {"type": "string", "description": "Where in the document the value was found"}
+                            },
+                            "required": ["name", "value", "justification"],
+                            "additionalProperties": False
+                        }
                     }
-                    
-                    import re
-                    for pattern, replacement in unit_mappings.items():
-                        value = re.sub(pattern, replacement, value)
-                
-                # Store the value    
-                results[key] = value if value else ""  # Keep blank if missing
-    
-    # Create a parameter mapping for related parameters to avoid duplication
-    parameter_relationships = {
-        # Standard relationships between similar parameters
-        "HEIGHT": ["HEIGHT", "ITEM HEIGHT", "TOTAL HEIGHT"],
-        "LENGTH": ["LENGTH", "ITEM LENGTH", "TOTAL LENGTH"],
-        "WIDTH": ["WIDTH", "ITEM WIDTH", "TOTAL WIDTH"],
-        "WEIGHT": ["WEIGHT", "ITEM WEIGHT", "UNIT WEIGHT", "PRODUCT WEIGHT"],
-        "CLOSED HEIGHT": ["CLOSED HEIGHT", "MINIMUM HEIGHT", "MIN HEIGHT", "COLLAPSED HEIGHT"],
-        "OPEN HEIGHT": ["OPEN HEIGHT", "MAXIMUM HEIGHT", "MAX HEIGHT", "EXTENDED HEIGHT"],
-        "BORE DIAMETER": ["BORE DIAMETER", "BORE DIA", "INSIDE DIAMETER", "INNER DIAMETER", "BORE"],
-        "ROD DIAMETER": ["ROD DIAMETER", "ROD DIA", "SHAFT DIAMETER", "PISTON ROD DIAMETER"],
-        "LOAD CAPACITY": ["LOAD CAPACITY", "RATED CAPACITY", "RATED CAPACITY/LOAD", "RATED LOAD", "CAPACITY", "MAX LOAD"],
-        "OPERATING PRESSURE": ["OPERATING PRESSURE", "PRESSURE RATING", "WORKING PRESSURE", "MAX PRESSURE"],
-        "DIMENSIONS": ["DIMENSIONS", "ITEM DIMENSIONS", "OVERALL DIMENSIONS", "PRODUCT DIMENSIONS"],
-        "MAKE": ["MAKE", "MANUFACTURER", "MANUFACTURER/MAKE", "BRAND", "MANUFACTURER/BRAND"],
-        "MODEL": ["MODEL", "MODEL NUMBER", "MODEL/PART NUMBER", "PART NUMBER", "MODEL NO", "PART NO"],
-        "MATERIAL": ["MATERIAL", "BODY MATERIAL", "CONSTRUCTION MATERIAL", "HOUSING MATERIAL"]
+                },
+                "required": ["document_type", "component_type", "parameters"],
+                "additionalProperties": False
+            }
+        }
     }
-    
-    # Special handling for port-related parameters
-    port_params = ["PORT SIZE", "PORT TYPE", "PORT LOCATION"]
-    all_port_values = {}
-    
-    # Special handling for numeric range values like dimensions
-    # Extract all numeric values with units from dimensions
-    for dim_param in ["DIMENSIONS", "ITEM DIMENSIONS", "OVERALL DIMENSIONS"]:
-        if dim_param in results and results[dim_param]:
-            dimensions = results[dim_param]
-            
-            # Extract L x W x H pattern
-            import re
-            dim_pattern = r'(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)'
-            match = re.search(dim_pattern, dimensions.lower())
-            
-            if match:
-                # Extract the values and units
-                length, width, height = match.groups()
-                
-                # Find the unit after the dimensions
-                unit_match = re.search(r'(?:x|×)\s*\d+(?:\.\d+)?\s*([a-zA-Z]+)', dimensions.lower())
-                unit = unit_match.group(1) if unit_match else "cm"  # Default to cm if no unit found
-                
-                # Only set length/width/height if they're not already present
-                if "LENGTH" not in results or not results["LENGTH"]:
-                    results["LENGTH"] = f"{length} {unit}"
-                    results["LENGTH_JUSTIFICATION"] = "Extracted from overall dimensions."
-                
-                if "WIDTH" not in results or not results["WIDTH"]:
-                    results["WIDTH"] = f"{width} {unit}"
-                    results["WIDTH_JUSTIFICATION"] = "Extracted from overall dimensions."
-                
-                if "HEIGHT" not in results or not results["HEIGHT"]:
-                    results["HEIGHT"] = f"{height} {unit}"
-                    results["HEIGHT_JUSTIFICATION"] = "Extracted from overall dimensions."
-    
-    # Process port parameters to combine them if appropriate
-    for port_param in port_params:
-        if port_param in results and results[port_param]:
-            all_port_values[port_param] = results[port_param]
-    
-    # If we have both port type and size, consider creating a combined PORT_SPECIFICATION
-    if "PORT TYPE" in all_port_values and "PORT SIZE" in all_port_values:
-        port_type = all_port_values["PORT TYPE"]
-        port_size = all_port_values["PORT SIZE"]
-        
-        # Only combine if both have values
-        if port_type and port_size:
-            # Create combined port specification
-            results["PORT_SPECIFICATION"] = f"{port_type} {port_size}"
-            results["PORT_SPECIFICATION_JUSTIFICATION"] = "Combined from port type and port size information."
-    
-                    # Normalize parameter names to find relations
-    normalized_results = {}
-    for key in list(results.keys()):
-        if not key.endswith("_JUSTIFICATION") and results.get(key, "").strip():
-            # Check if key contains JSON-like structure but wasn't properly parsed yet
-            value = results[key]
-            if isinstance(value, str) and (
-                (value.startswith('{') and value.endswith('}')) or
-                (value.startswith('[{') and value.endswith('}]')) or
-                (value.startswith("'") and ":" in value)
-            ):
-                # Apply the same JSON parsing logic here to ensure consistent display
-                try:
-                    # Process different JSON-like formats
-                    processed_value = value
-                    if value.startswith('[{') and value.endswith('}]'):
-                        processed_value = value[1:-1]
-                    if value.startswith('{') and value.endswith('}'):
-                        processed_value = value.strip('{}')
-                        
-                    import re
-                    pairs = re.findall(r'[\'"]([^\'"]*)[\'"]\s*:\s*[\'"]([^\'"]*)[\'"]\s*(?:,|$)', processed_value)
-                    
-                    if pairs:
-                        # Extract just the values
-                        values = [v for _, v in pairs]
-                        if len(values) == 1:
-                            results[key] = values[0]
-                        else:
-                            results[key] = "\n".join(values)
-                except Exception as e:
-                    # If parsing fails, leave as is
-                    print(f"Error normalizing JSON value: {e}")
-            
-            norm_key = key.upper()
-            normalized_results[norm_key] = results[key]
-            
-            # Find and remove any related parameters that would cause duplication
-            for main_param, related_params in parameter_relationships.items():
-                if norm_key in related_params:
-                    # This is a related parameter, check if main parameter exists with value
-                    main_norm = main_param.upper()
-                    if main_norm in normalized_results and normalized_results[main_norm]:
-                        # If main parameter already has a value, this is a duplicate
-                        if main_norm != norm_key:
-                            # Transfer the justification from this param to the main param
-                            just_key = f"{key}_JUSTIFICATION"
-                            main_just_key = f"{main_param}_JUSTIFICATION"
-                            if just_key in results:
-                                results[main_just_key] = results[just_key]
-                            # Remove this duplicate parameter
-                            results[key] = ""
-    
-    # Handle dimension-related parameters to avoid duplicates
-    if "DIMENSIONS" in results and results["DIMENSIONS"]:
-        # If we have dimensions but no height/width values, try to extract them
-        dimensions = results["DIMENSIONS"]
-        
-        # Try to parse dimensions like "93 x 55 x 29 Centimeters" into height/width/depth
-        if "x" in dimensions.lower() or "×" in dimensions:
-            # Handle both x and × symbols
-            dim_parts = [part.strip() for part in dimensions.lower().replace('×', 'x').split("x")]
-            
-            # Extract unit if present
-            unit = ""
-            last_part = dim_parts[-1]
-            # Find where the numbers end and unit begins
-            for i, char in enumerate(last_part):
-                if not (char.isdigit() or char == "." or char.isspace()):
-                    if i > 0:
-                        unit = last_part[i:].strip()
-                        dim_parts[-1] = last_part[:i].strip()
-                    break
-            
-            # Only set these if they're not already present with values
-            if len(dim_parts) >= 1 and ("LENGTH" not in results or not results["LENGTH"]):
-                length_val = dim_parts[0]
-                if unit:
-                    length_val += " " + unit
-                results["LENGTH"] = length_val
-                results["LENGTH_JUSTIFICATION"] = "Extracted from item dimensions."
-            
-            if len(dim_parts) >= 2 and ("WIDTH" not in results or not results["WIDTH"]):
-                width_val = dim_parts[1]
-                if unit:
-                    width_val += " " + unit
-                results["WIDTH"] = width_val
-                results["WIDTH_JUSTIFICATION"] = "Extracted from item dimensions."
-            
-            if len(dim_parts) >= 3 and ("HEIGHT" not in results or not results["HEIGHT"]):
-                height_val = dim_parts[2]
-                if unit:
-                    height_val += " " + unit
-                results["HEIGHT"] = height_val
-                results["HEIGHT_JUSTIFICATION"] = "Extracted from item dimensions."
-    
-    # Handle structured fields like Closed/Open Heights specifically for jacks/cylinders
-    # For the Hyco jack in the image, we need to recognize the format "height FOR weight"
-    for height_field in ["CLOSED HEIGHT", "OPEN HEIGHT", "MINIMUM HEIGHT", "MAXIMUM HEIGHT"]:
-        if height_field in results and "FOR" in results[height_field].upper():
-            # This might be a height specification that varies by weight/model
-            height_value = results[height_field]
-            
-            # Try to extract structured height data in format "X FOR Y, Z FOR W"
-            import re
-            # Look for pattern like "200mm FOR 1 TON, 750mm FOR 1.5TON"
-            height_matches = re.findall(r'(\d+(?:\.\d+)?(?:\s*[a-zA-Z]+)?)\s+FOR\s+([\d\.]+\s*TON)', height_value, re.IGNORECASE)
-            
-            if height_matches:
-                # Create a structured version with all heights by capacity
-                structured_value = ", ".join([f"{height} @ {capacity}" for height, capacity in height_matches])
-                results[height_field] = structured_value
-                results[f"{height_field}_JUSTIFICATION"] = "Structured from height specifications that vary by capacity."
-    
-    # Add justifications to results using a list of original keys to avoid modification during iteration
-    original_keys = list(results.keys())
-    for key in original_keys:
-        # Skip document metadata fields and justification fields
-        if key in ["DOCUMENT_TYPE", "COMPONENT_TYPE"] or key.endswith("_JUSTIFICATION"):
-            continue
-            
-        # If justification is missing, add a contextual default one
-        if key not in justifications:
-            doc_type = document_info.get("DOCUMENT_TYPE", "").upper()
-            
-            if results[key]:
-                if "PRODUCT_LISTING" in doc_type or "CATALOG" in doc_type:
-                    justifications[key] = "Extracted from the product listing specifications."
-                elif "SPECIFICATION" in doc_type:
-                    justifications[key] = "Extracted from the specification sheet."
-                elif "MIXED" in doc_type:
-                    justifications[key] = "Extracted from the document. Exact location unspecified."
-                else:
-                    justifications[key] = "Extracted directly from the drawing."
-            else:
-                if "PRODUCT_LISTING" in doc_type or "CATALOG" in doc_type:
-                    justifications[key] = "Not provided in the product listing."
-                elif "SPECIFICATION" in doc_type:
-                    justifications[key] = "Not included in the specification sheet."
-                elif "MIXED" in doc_type:
-                    justifications[key] = "Not found in any part of the document."
-                else:
-                    justifications[key] = "Not visible in the drawing."
-        
-        # Add the justification to the results
-        just_key = f"{key}_JUSTIFICATION"
-        if just_key not in results:
-            results[just_key] = justifications.get(key, "")
-    
-    return results
+
+def parse_ai_response(response_text):
+    """Parse a PARAMETER: value / PARAMETER_JUSTIFICATION: text response into the result structure."""
+    # Debug the raw response
+    print(f"Raw AI response: {response_text[:200]}...")
+    return response_parser.parse_text(response_text)
+
+def parse_structured_response(data):
+    """
+    Load a structured-output response (see build_extraction_schema) straight into
+    the result structure, without going through the text format.
+    """
+    return response_parser.parse_structured(data)
+
+def parse_extraction_response(content):
+    """Parse extraction output: structured JSON when available, otherwise the text format."""
+    if STRUCTURED_OUTPUT:
+        try:
+            data = json.loads(content)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and "parameters" in data:
+            metrics.incr("structured_responses")
+            return parse_structured_response(data)
+        metrics.incr("structured_fallbacks")
+    return parse_ai_response(content)
 
 def validate_and_improve_justifications(parsed_results):
     """
@@ -578,19 +284,19 @@ def validate_and_improve_justifications(parsed_results):
     # Get all parameter keys (excluding justifications and component type)
     param_keys = [k for k in results.keys() if not k.endswith('_JUSTIFICATION') and k != 'COMPONENT_TYPE']
     
-    # Drawing-specific justifications for common parameters
+    # Drawing-specific justifications for common parameters, keyed by canonical id (see param_aliases.py)
     drawing_specific_justifications = {
-        "BORE_DIAMETER": "Measured from the internal diameter dimension line in the cylinder cross-section view.",
-        "OUTSIDE_DIAMETER": "Measured from the external diameter dimension line in the drawing views.",
-        "ROD_DIAMETER": "Extracted from the piston rod dimension line, typically shown in the side view or cross-section.",
-        "STROKE_LENGTH": "Determined from the stroke dimension line between fully retracted and extended positions.",
-        "CLOSED_LENGTH": "Measured from the overall length dimension in the fully retracted position.",
-        "OPEN_LENGTH": "Calculated from the closed length plus stroke distance shown in the drawing.",
-        "CYLINDER_ACTION": "Determined by examining the port configuration in the drawing (single vs. double acting).",
-        "MOUNTING_TYPE": "Identified from the mounting detail view showing the attachment method.",
-        "PORT_TYPE": "Read from the port detail view or cross-section showing the connection type.",
-        "PORT_LOCATION": "Observed from the port positions shown in the main drawing views.",
-        "SEAL_TYPE": "Identified from the seal detail section view showing the seal configuration.",
+        "BORE DIAMETER": "Measured from the internal diameter dimension line in the cylinder cross-section view.",
+        "OUTSIDE DIAMETER": "Measured from the external diameter dimension line in the drawing views.",
+        "ROD DIAMETER": "Extracted from the piston rod dimension line, typically shown in the side view or cross-section.",
+        "STROKE LENGTH": "Determined from the stroke dimension line between fully retracted and extended positions.",
+        "CLOSED LENGTH": "Measured from the overall length dimension in the fully retracted position.",
+        "OPEN LENGTH": "Calculated from the closed length plus stroke distance shown in the drawing.",
+        "CYLINDER ACTION": "Determined by examining the port configuration in the drawing (single vs. double acting).",
+        "MOUNTING TYPE": "Identified from the mounting detail view showing the attachment method.",
+        "PORT TYPE": "Read from the port detail view or cross-section showing the connection type.",
+        "PORT LOCATION": "Observed from the port positions shown in the main drawing views.",
+        "SEAL TYPE": "Identified from the seal detail section view showing the seal configuration.",
         "DIMENSIONS": "Extracted from the primary dimension lines showing length, width, and height.",
         "WEIGHT": "Inferred from material and volume calculations based on dimensions in the drawing."
     }
@@ -600,8 +306,8 @@ def validate_and_improve_justifications(parsed_results):
         value = results.get(key, "").strip()
         justification = results.get(justification_key, "").strip()
         
-        # Format the key for matching against our dictionary (standardize format)
-        formatted_key = key.upper().replace(' ', '_')
+        # Canonical id for matching against our dictionary, so any spelling of a parameter matches
+        formatted_key = param_aliases.canonical(key)
         
         # Check if justification exists and is meaningful
         if not justification or justification.lower() in ["not available", "not specified", "unknown", "not provided", "not visible"]:
@@ -648,12 +354,10 @@ def validate_and_improve_justifications(parsed_results):
         
         # Ensure all values have proper formatting
         if key in ["OPERATING PRESSURE", "PRESSURE RATING"] and value:
-            if "BAR" not in value.upper():
-                results[key] = f"{value} BAR"
+            results[key] = units.standardise(value, "BAR")
         
         elif key in ["OPERATING TEMPERATURE"] and value:
-            if "DEG" not in value.upper() and "°C" not in value:
-                results[key] = f"{value} DEG C"
+            results[key] = units.standardise(value, "°C")
         
         # Remove any values that are clearly guesses
         if "approximately" in value.lower() or "about" in value.lower() or "around" in value.lower() or \
@@ -663,9 +367,24 @@ def validate_and_improve_justifications(parsed_results):
     
     return results
 
-def analyze_engineering_drawing(image_bytes, component_type=None):
-    """Universal analyzer for all types of engineering drawings using a single comprehensive prompt"""
-    base64_image = encode_image_to_base64(image_bytes)
+def analyze_engineering_drawing(image_bytes, component_type=None, on_field=None, text_layer=None):
+    """
+    Universal analyzer for all types of engineering drawings using a single comprehensive prompt.
+    When on_field is given the response is streamed and on_field(name, value) is
+    called for each field as soon as it arrives.
+    When text_layer (see pdf_text.py) is given, the PDF's own text is sent with a
+    small image, or no image when PDF_TEXT_IMAGE is "none".
+    Returns the parsed results dict, or an error string starting with ❌.
+    """
+    image_content = []
+    if not text_layer or PDF_TEXT_IMAGE != "none":
+        stage = "text_assist" if text_layer else "extraction"
+        image_content = [{
+            "type": "image_url",
+            "image_url": {
+                "url": encode_image_to_base64(image_policy.prepare_image(image_bytes, stage))
+            }
+        }]
     
     # If component type is provided, use a more targeted prompt
     system_content = "You are an expert mechanical engineer with extensive experience in engineering design, manufacturing, and technical documentation analysis. Your task is to extract ALL technical specifications and provide insightful engineering analysis based on the design elements in the document. Always assume the document has been properly oriented for reading. Extract parameter names EXACTLY as they appear in the drawing, without categorizing them or using predefined parameter names."
@@ -945,13 +664,21 @@ def analyze_engineering_drawing(image_bytes, component_type=None):
         "STEP 12. OUTPUT FORMAT\n"
         "  - Format your extraction with the EXACT parameter names as they appear in the drawing\n"
         "  - DO NOT use generic category names like 'PRIMARY PHYSICAL DIMENSIONS'\n"
-        "  - DO NOT add dashes or bullet points before parameter names\n"
         "  - Instead use the drawing's original parameter names like 'Bore Diameter', 'Rod Diameter', etc.\n"
         "  - For each parameter, include a value and detailed justification explaining its source\n"
-        "  - Use the parameter-justification format where each parameter is followed by its justification\n"
-        "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
         "  - For empty parameters, explain why the information couldn't be found\n"
     )
+    if STRUCTURED_OUTPUT:
+        user_content += (
+            "  - Return a JSON object with the document type, the component type and one entry per parameter\n"
+            "    holding its name, value and justification\n"
+        )
+    else:
+        user_content += (
+            "  - DO NOT add dashes or bullet points before parameter names\n"
+            "  - Use the parameter-justification format where each parameter is followed by its justification\n"
+            "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
+        )
     
     # If component type is provided, use a more targeted prompt
     if component_type and component_type not in ["UNKNOWN"]:
@@ -992,6 +719,10 @@ def analyze_engineering_drawing(image_bytes, component_type=None):
             Each parameter in this list must be included in your output, even if with an empty value.
             """
     
+    # Text read straight from a vector PDF replaces reading those characters from pixels
+    if text_layer:
+        user_content += pdf_text.prompt_section(text_layer)
+    
     # Make the initial API call
     payload = {
         "model": "gpt-4o",
@@ -1006,126 +737,141 @@ def analyze_engineering_drawing(image_bytes, component_type=None):
                     {
                         "type": "text",
                         "text": user_content
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": base64_image
-                        }
                     }
-                ]
+                ] + image_content
             }
         ],
         "max_tokens": 4000,
         "temperature": 0.1
     }
-
-    headers = {
-        "Authorization": f"Bearer {st.session_state.current_api_key}",
-        "Content-Type": "application/json"
-    }
+    if STRUCTURED_OUTPUT:
+        payload["response_format"] = build_extraction_schema(component_type)
 
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
-        result = process_api_response(response, analyze_engineering_drawing, image_bytes, component_type)
+        # Large-format raster sheets are read tile by tile so small text survives the API's downscaling
+        if not text_layer and tiling.needs_tiling(image_bytes):
+            first_pass_results = extract_from_tiles(payload, image_bytes, component_type)
+            if isinstance(first_pass_results, dict):
+                if on_field is not None:
+                    for name, value in first_pass_results.items():
+                        if not name.endswith("_JUSTIFICATION"):
+                            on_field(name, value)
+                return finish_extraction(image_bytes, first_pass_results, component_type)
+            # No tile produced results: fall back to the whole page
+        
+        if on_field is not None and STREAM_RESPONSES:
+            field_parser = stream_parser.StreamingFieldParser()
+            
+            def on_text(text):
+                for name, value in field_parser.feed(text):
+                    on_field(name, value)
+            
+            response = llm_transport.stream_chat_completion(API_URL, payload, on_text, get_llm_cache_context(component_type))
+        else:
+            response = llm_transport.post_chat_completion(API_URL, payload, get_llm_cache_context(component_type))
+        result = process_api_response(response)
         
         if "❌" not in result:
             # Parse results from first pass
-            first_pass_results = parse_ai_response(result)
-            
-            # Process pressure ranges for consistent formatting in first pass
-            for pressure_param in ['OPERATING PRESSURE', 'PRESSURE RATING']:
-                if pressure_param in first_pass_results:
-                    pressure = first_pass_results.get(pressure_param, '').strip()
-                    if pressure:
-                        # Standardize pressure range format
-                        if '...' in pressure or '..' in pressure:
-                            # Replace ellipsis with 'to'
-                            pressure = pressure.replace('...', ' to ').replace('..', ' to ')
-                        elif 'TO' in pressure.upper():
-                            # Replace 'TO' with 'to' for consistent formatting
-                            pressure = pressure.upper().replace('TO', 'to').lower()
-                            pressure = pressure.replace('to', ' to ').replace('  to  ', ' to ')
-                        
-                        # Ensure "BAR" format is consistent
-                        if 'BAR' not in pressure.upper():
-                            pressure = pressure + " BAR"
-                        
-                        # Normalize spacing
-                        pressure = ' '.join(pressure.split())
-                        first_pass_results[pressure_param] = pressure
-            
-            # Process temperature ranges in first pass
-            if 'OPERATING TEMPERATURE' in first_pass_results:
-                temp = first_pass_results.get('OPERATING TEMPERATURE', '').strip()
-                if temp:
-                    # Standardize temperature range format
-                    if '...' in temp or '..' in temp:
-                        # Replace ellipsis with 'to'
-                        temp = temp.replace('...', ' to ').replace('..', ' to ')
-                    elif 'TO' in temp.upper():
-                        # Replace 'TO' with 'to' for consistent formatting
-                        temp = temp.upper().replace('TO', 'to').lower()
-                        temp = temp.replace('to', ' to ').replace('  to  ', ' to ')
-                    elif '+' in temp and '-' in temp:
-                        # Handle formats like "-10°C +60°C"
-                        parts = temp.replace('°C', '').replace('DEG C', '').split()
-                        # Extract the numbers
-                        nums = [p for p in parts if any(c.isdigit() for c in p)]
-                        if len(nums) >= 2:
-                            temp = f"{nums[0]} to {nums[1]} DEG C"
-                    
-                    # Ensure "DEG C" format is consistent
-                    if 'DEG C' not in temp.upper():
-                        # Remove any existing temperature units
-                        temp = temp.replace('°C', '').replace('C', '')
-                        # Add DEG C
-                        if 'DEG' not in temp.upper():
-                            temp = temp + " DEG C"
-                    
-                    # Normalize spacing
-                    temp = ' '.join(temp.split())
-                    first_pass_results['OPERATING TEMPERATURE'] = temp
-            
-            # Perform second pass for any missing fields without showing messages
-            final_results = perform_second_extraction_pass(image_bytes, first_pass_results, component_type)
-            
-            # Validate and improve justifications
-            final_results = validate_and_improve_justifications(final_results)
-            
-            # Get component type
-            component_type = final_results.get('COMPONENT_TYPE', '')
-            if not component_type:
-                # Try to determine component type from other parameters
-                if 'CYLINDER ACTION' in final_results:
-                    component_type = 'CYLINDER'
-                elif 'GEAR TYPE' in final_results:
-                    component_type = 'GEARBOX'
-                elif 'MODEL NO' in final_results and 'SIZE OF VALVE' in final_results:
-                    component_type = 'VALVE'
-                elif 'PROPERTY CLASS' in final_results and 'NUT STANDARD' in final_results:
-                    component_type = 'NUT'
-                elif 'PISTON LIFTING FORCE' in final_results:
-                    component_type = 'LIFTING_RAM'
-                else:
-                    component_type = 'UNKNOWN'
-            
-            # Add component type to results
-            final_results['COMPONENT_TYPE'] = component_type
+            first_pass_results = parse_extraction_response(result)
+            if text_layer:
+                first_pass_results = pdf_text.merge_title_block(first_pass_results, text_layer)
             
-            # Compare first and second pass results to count how many fields were improved
-            improved_fields = 0
-            for key, value in final_results.items():
-                if not key.endswith("_JUSTIFICATION") and key not in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
-                    # If second pass found a value where first pass had none
-                    if value and (key not in first_pass_results or not first_pass_results[key]):
-                        improved_fields += 1
-            
-            return '\n'.join([f"{k}: {v}" for k, v in final_results.items()])
+            return finish_extraction(image_bytes, first_pass_results, component_type)
         return result
     except Exception as e:
         return f"❌ Processing Error: {str(e)}"
 
+def finish_extraction(image_bytes, first_pass_results, component_type):
+    """
+    Normalise first-pass results, run the second pass for missing fields and
+    settle the component type. Returns the final results dict.
+    """
+    # Standard "low to high UNIT" form for pressures and temperatures, bar and °C when no unit is given
+    for pressure_param in ['OPERATING PRESSURE', 'PRESSURE RATING']:
+        pressure = first_pass_results.get(pressure_param, '').strip()
+        if pressure:
+            first_pass_results[pressure_param] = units.standardise(pressure, "BAR")
+    temp = first_pass_results.get('OPERATING TEMPERATURE', '').strip()
+    if temp:
+        first_pass_results['OPERATING TEMPERATURE'] = units.standardise(temp, "°C")
+    
+    # Perform second pass for any missing fields without showing messages
+    final_results = perform_second_extraction_pass(image_bytes, first_pass_results, component_type)
+    
+    # Validate and improve justifications
+    final_results = validate_and_improve_justifications(final_results)
+    
+    # Get component type
+    component_type = final_results.get('COMPONENT_TYPE', '')
+    if not component_type:
+        # Try to determine component type from other parameters
+        if 'CYLINDER ACTION' in final_results:
+            component_type = 'CYLINDER'
+        elif 'GEAR TYPE' in final_results:
+            component_type = 'GEARBOX'
+        elif 'MODEL NO' in final_results and 'SIZE OF VALVE' in final_results:
+            component_type = 'VALVE'
+        elif 'PROPERTY CLASS' in final_results and 'NUT STANDARD' in final_results:
+            component_type = 'NUT'
+        elif 'PISTON LIFTING FORCE' in final_results:
+            component_type = 'LIFTING_RAM'
+        else:
+            component_type = 'UNKNOWN'
+    
+    # Add component type to results
+    final_results['COMPONENT_TYPE'] = component_type
+    
+    # Compare first and second pass results to count how many fields were improved
+    improved_fields = 0
+    for key, value in final_results.items():
+        if not key.endswith("_JUSTIFICATION") and key not in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
+            # If second pass found a value where first pass had none
+            if value and (key not in first_pass_results or not first_pass_results[key]):
+                improved_fields += 1
+    
+    return final_results
+
+def extract_from_tiles(payload, image_bytes, component_type):
+    """
+    First-pass extraction of a large-format sheet, tile by tile (see tiling.py).
+    Every tile is sent concurrently with the page prompt plus a note on where the tile sits.
+    Returns the merged results dict, or None when no tile produced results.
+    """
+    tiles, crops = tiling.crop_tiles(image_bytes)
+    prompt = payload["messages"][1]["content"][0]["text"]
+    
+    def extract_tile(index):
+        tile_payload = dict(payload)
+        tile_payload["messages"] = [
+            payload["messages"][0],
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": tiling.tile_prompt(tiles[index]) + prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": encode_image_to_base64(image_policy.prepare_image(crops[index], "tile"))
+                        }
+                    }
+                ]
+            }
+        ]
+        response = llm_transport.post_chat_completion(API_URL, tile_payload, get_llm_cache_context(component_type))
+        result = process_api_response(response)
+        if "❌" in result:
+            return result
+        return parse_extraction_response(result)
+    
+    tile_results = page_pipeline.map_concurrent(extract_tile, range(len(tiles)), tiling.TILE_CONCURRENCY)
+    metrics.incr("pages_tiled")
+    metrics.incr("tile_requests", len(tiles))
+    return tiling.merge_tile_results(tiles, tile_results)
+
 def get_parameters_for_type(drawing_type):
     """Return the list of parameters to extract based on drawing type"""
     drawing_type = drawing_type.upper() if drawing_type else ""
@@ -1330,16 +1076,49 @@ def get_extraction_parameters(drawing_type):
 print("Current API key:", st.session_state.current_api_key)
 
 
-def identify_drawing_type(image_bytes):
-    """Identify the type of technical document and component using AI vision model"""
-    base64_image = encode_image_to_base64(image_bytes)
+def record_drawing_type(document_type, component_type):
+    """Remember identified document/component types in session state for later reference"""
+    # Store document type for future reference
+    if 'document_types' not in st.session_state:
+        st.session_state.document_types = {}
+    
+    # Store the document type information
+    st.session_state.document_types[f"{document_type}: {component_type}"] = {
+        'document_type': document_type,
+        'component_type': component_type
+    }
+    
+    # Handle standard component types
+    standard_types = ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "JACK", "TRANSMISSION_JACK"]
+    
+    # Store custom component types
+    if component_type not in standard_types and component_type != "UNKNOWN":
+        if 'custom_component_types' not in st.session_state:
+            st.session_state.custom_component_types = {}
+        
+        st.session_state.custom_component_types[component_type] = {
+            'document_type': document_type
+        }
+
+def triage_page(image_bytes, rotation=None):
+    """
+    Determine rotation, document type and component type of a page in one vision call.
+    A thumbnail sized by the "triage" image policy is sent instead of the full-resolution page.
+    When rotation is already known (see orientation.resolve), image_bytes must be
+    the rotated page and the model is only asked for the two types.
+    
+    Returns:
+        Dict with 'rotation' (ROTATE_0/90/180/270), 'document_type' and
+        'component_type', or a "❌ ..." error string if the call failed.
+    """
+    base64_image = encode_image_to_base64(image_policy.prepare_image(image_bytes, "triage"))
     
     payload = {
         "model": "gpt-4o",
         "messages": [
             {
                 "role": "system",
-                "content": "You are an expert level electrical and mechanical engineer with extensive experience analyzing all types of technical documents including engineering drawings, product listings, and specification sheets. Your task is to accurately identify both document types and component types with high precision and consistency. The image has been automatically oriented correctly for reading. Never guess - only provide definitive answers when certain."
+                "content": "You are an expert level electrical and mechanical engineer with extensive experience analyzing all types of technical documents including engineering drawings, product listings, and specification sheets. Your task is to determine whether a document image needs rotation for reading and to identify its document type and component type with high precision and consistency. Never guess - only provide definitive answers when certain."
             },
             {
                 "role": "user",
@@ -1347,16 +1126,15 @@ def identify_drawing_type(image_bytes):
                     {
                         "type": "text",
                         "text": (
-                            "TASK: Identify BOTH the document type AND component type in this technical document. The image has been properly oriented for you.\n\n"
+                            triage_rotation_section(rotation) +
                             
-                            "### CRITICAL INSTRUCTIONS\n"
-                            "1. First determine the DOCUMENT TYPE:\n"
+                            "2. DOCUMENT TYPE:\n"
                             "   - ENGINEERING_DRAWING: Contains technical drawings with dimensions and specifications\n"
                             "   - PRODUCT_LISTING: Contains product information, pricing, and marketing content\n"
                             "   - SPECIFICATION_SHEET: Contains organized technical specifications in tables or lists\n"
                             "   - MIXED_DOCUMENT: Contains multiple document types combined\n\n"
                             
-                            "2. Then identify the COMPONENT TYPE:\n"
+                            "3. COMPONENT TYPE:\n"
                             "   - CYLINDER (pneumatic, hydraulic, etc.)\n"
                             "   - VALVE\n"
                             "   - GEARBOX\n"
@@ -1368,24 +1146,14 @@ def identify_drawing_type(image_bytes):
                             "   - MOTOR\n"
                             "   - Other specific component type in ALL CAPS\n\n"
                             
-                            "3. Examination Process:\n"
-                            "   - Check title blocks, headers, and document structure first\n"
-                            "   - Look for company logos, document templates, and formatting\n"
-                            "   - Examine tables, dimensions, and technical notations\n"
-                            "   - Be EXTREMELY CONSISTENT in your categorization\n\n"
-                            
                             "### RESPONSE FORMAT\n"
-                            "You MUST respond in this exact format: 'DOCUMENT_TYPE: COMPONENT_TYPE'\n"
-                            "Examples:\n"
-                            "- 'ENGINEERING_DRAWING: CYLINDER'\n"
-                            "- 'PRODUCT_LISTING: TRANSMISSION_JACK'\n"
-                            "- 'SPECIFICATION_SHEET: VALVE'\n"
-                            "- 'MIXED_DOCUMENT: HYDRAULIC_CYLINDER'\n\n"
-                            
-                            "If you can identify the document type but not the component type, respond with 'DOCUMENT_TYPE: UNKNOWN'.\n"
-                            "If you cannot identify either with confidence, respond with 'UNKNOWN: UNKNOWN'.\n\n"
+                            "You MUST respond with exactly these lines:\n" +
+                            ("" if rotation else "ROTATION: <one of ROTATE_0, ROTATE_90, ROTATE_180, ROTATE_270>\n") +
+                            "DOCUMENT_TYPE: <document type>\n"
+                            "COMPONENT_TYPE: <component type>\n\n"
                             
-                            "IMPORTANT: Your response must be ONLY the document and component types in the format specified above. No explanations or additional text."
+                            "Use UNKNOWN for a document or component type you cannot identify with confidence.\n"
+                            "IMPORTANT: No explanations or additional text."
                         )
                     },
                     {
@@ -1397,61 +1165,56 @@ def identify_drawing_type(image_bytes):
                 ]
             }
         ],
-        "max_tokens": 100,
+        "max_tokens": 40,
         "temperature": 0
     }
 
-    headers = {
-        "Authorization": f"Bearer {st.session_state.current_api_key}",
-        "Content-Type": "application/json"
-    }
-
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
-        result = process_api_response(response, identify_drawing_type, image_bytes)
-        
-        # Parse the result which should be in format "DOCUMENT_TYPE: COMPONENT_TYPE"
-        if "❌" not in result:
-            result = result.strip().upper()
-            
-            # Store document type information in session state
-            if ':' in result:
-                document_type, component_type = result.split(':', 1)
-                document_type = document_type.strip()
-                component_type = component_type.strip()
-                
-                # Store document type for future reference
-                if 'document_types' not in st.session_state:
-                    st.session_state.document_types = {}
-                
-                # Store the document type information
-                st.session_state.document_types[result] = {
-                    'document_type': document_type,
-                    'component_type': component_type
-                }
-            else:
-                # If no colon found, assume it's just a component type
-                component_type = result
-                document_type = "ENGINEERING_DRAWING"  # Default
-            
-            # Handle standard component types
-            standard_types = ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "JACK", "TRANSMISSION_JACK"]
-            
-            # Store custom component types
-            if component_type not in standard_types and component_type != "UNKNOWN":
-                if 'custom_component_types' not in st.session_state:
-                    st.session_state.custom_component_types = {}
-                
-                st.session_state.custom_component_types[component_type] = {
-                    'document_type': document_type
-                }
-            
-            return component_type
-        
-        return result
+        response = llm_transport.post_chat_completion(API_URL, payload)
+        result = process_api_response(response)
+        if "❌" in result:
+            return result
+        
+        triage = {}
+        for line in result.strip().upper().split('\n'):
+            if ':' in line:
+                key, value = line.split(':', 1)
+                triage[key.strip().strip('*')] = value.strip().strip('*').strip()
+        
+        rotation = rotation or triage.get("ROTATION", "")
+        if rotation not in ("ROTATE_0", "ROTATE_90", "ROTATE_180", "ROTATE_270"):
+            # Model did not answer the rotation question - use local OCR instead
+            rotation = detect_orientation_fallback(image_bytes)
+        document_type = triage.get("DOCUMENT_TYPE") or "UNKNOWN"
+        component_type = triage.get("COMPONENT_TYPE") or "UNKNOWN"
+        
+        record_drawing_type(document_type, component_type)
+        return {
+            "rotation": rotation,
+            "document_type": document_type,
+            "component_type": component_type
+        }
     except Exception as e:
         return f"❌ Processing Error: {str(e)}"
 
+def triage_rotation_section(rotation):
+    """The rotation question of the triage prompt, or a note that the page is already upright"""
+    if rotation:
+        return (
+            "TASK: Triage this technical document image. The image is correctly oriented.\n\n"
+            "1. ROTATION - already determined, do not answer it.\n\n"
+        )
+    return (
+        "TASK: Triage this technical document image. The image may NOT be correctly oriented.\n\n"
+        
+        "1. ROTATION - tell me if the image needs rotation to be read normally:\n"
+        "   - ROTATE_0 (no rotation needed, image is correctly oriented)\n"
+        "   - ROTATE_90 (rotate 90 degrees clockwise)\n"
+        "   - ROTATE_180 (rotate 180 degrees)\n"
+        "   - ROTATE_270 (rotate 270 degrees clockwise / 90 degrees counter-clockwise)\n"
+        "   Be extremely attentive to text orientation, title blocks, and standard engineering drawing layouts.\n\n"
+    )
+
 def submit_feedback_to_company(feedback_data, drawing_info, additional_notes=""):
     """
     Submit feedback to the company's system
@@ -1494,57 +1257,8 @@ def submit_feedback_to_company(feedback_data, drawing_info, additional_notes="")
 def convert_pdf_using_pymupdf(pdf_bytes):
     """Convert PDF to images using PyMuPDF (faster and no external dependencies)"""
     try:
-        # Load PDF from bytes
-        pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-        image_bytes_list = []
-        page_count = pdf_document.page_count
-        
-        # Get document details for better naming
-        metadata = pdf_document.metadata
-        document_title = metadata.get('title', '')
-
-        # Convert each page to an image
-        for page_num in range(page_count):
-            page = pdf_document[page_num]
-            
-            # Get the page as a PNG image with higher resolution
-            pix = page.get_pixmap(matrix=fitz.Matrix(2.5, 2.5))  # Higher quality
-            img_data = pix.tobytes("png")
-            
-            # Convert PNG to JPEG for consistency and smaller size
-            img = Image.open(io.BytesIO(img_data))
-            img_byte_arr = io.BytesIO()
-            img = img.convert('RGB')  # Convert to RGB mode for JPEG
-            
-            # Add page number indicator as a subtle overlay
-            draw = ImageDraw.Draw(img)
-            try:
-                # Try to get a font, fallback to default if not available
-                font = ImageFont.truetype("arial.ttf", 24)
-            except IOError:
-                font = ImageFont.load_default()
-                
-            # Add page number indicator in the corner
-            page_text = f"Page {page_num + 1}/{page_count}"
-            text_width = draw.textlength(page_text, font=font) if hasattr(draw, 'textlength') else 150
-            
-            # Position in bottom right with padding
-            draw.rectangle(
-                [(img.width - text_width - 20, img.height - 40), (img.width - 5, img.height - 5)],
-                fill=(50, 50, 50, 180)
-            )
-            draw.text(
-                (img.width - text_width - 10, img.height - 35),
-                page_text,
-                fill=(255, 255, 255),
-                font=font
-            )
-            
-            img.save(img_byte_arr, format='JPEG', quality=90, optimize=True)
-            image_bytes_list.append((img_byte_arr.getvalue(), page_num + 1, page_count, document_title))
-
-        pdf_document.close()
-        return image_bytes_list
+        # Pages are rendered in parallel processes (see pdf_raster.py) and returned in order
+        return pdf_raster.render_pdf(pdf_bytes)
     except Exception as e:
         st.error(f"Error converting PDF with PyMuPDF: {str(e)}")
         return None
@@ -1556,7 +1270,7 @@ def convert_pdf_using_pdf2image_alternative(pdf_bytes):
         images = convert_from_bytes(
             pdf_bytes,
             dpi=300,  # Higher DPI for better quality
-            fmt='jpeg',
+            fmt='ppm',  # Raw pixels, so each page is JPEG-encoded once (below) rather than twice
             grayscale=False,
             size=None,
             use_pdftocairo=False  # Try without pdftocairo first
@@ -1568,31 +1282,6 @@ def convert_pdf_using_pdf2image_alternative(pdf_bytes):
         
         for i, image in enumerate(images):
             img_byte_arr = io.BytesIO()
-            
-            # Add page number indicator
-            draw = ImageDraw.Draw(image)
-            try:
-                # Try to get a font, fallback to default if not available
-                font = ImageFont.truetype("arial.ttf", 24)
-            except IOError:
-                font = ImageFont.load_default()
-                
-            # Add page number indicator in the corner
-            page_text = f"Page {i + 1}/{page_count}"
-            text_width = draw.textlength(page_text, font=font) if hasattr(draw, 'textlength') else 150
-            
-            # Position in bottom right with padding
-            draw.rectangle(
-                [(image.width - text_width - 20, image.height - 40), (image.width - 5, image.height - 5)],
-                fill=(50, 50, 50, 180)
-            )
-            draw.text(
-                (image.width - text_width - 10, image.height - 35),
-                page_text,
-                fill=(255, 255, 255),
-                font=font
-            )
-            
             image.save(img_byte_arr, format='JPEG', quality=90, optimize=True)
             image_bytes_list.append((img_byte_arr.getvalue(), i + 1, page_count, ""))
         
@@ -1601,12 +1290,13 @@ def convert_pdf_using_pdf2image_alternative(pdf_bytes):
         st.error(f"Error with alternative PDF conversion: {str(e)}")
         return None
 
-def convert_pdf_to_images(pdf_bytes, filename=""):
+def convert_pdf_to_images(pdf_bytes, filename="", try_pymupdf=True):
     """Convert PDF bytes to a list of PIL Images using multiple methods"""
     # Try PyMuPDF first (no external dependencies)
-    result = convert_pdf_using_pymupdf(pdf_bytes)
-    if result:
-        return result
+    if try_pymupdf:
+        result = convert_pdf_using_pymupdf(pdf_bytes)
+        if result:
+            return result
 
     # Try pdf2image with alternative settings
     st.info("Attempting PDF conversion with alternative method...")
@@ -1623,7 +1313,8 @@ def convert_pdf_to_images(pdf_bytes, filename=""):
                 temp_pdf.seek(0)
                 
                 try:
-                    images = convert_from_bytes(pdf_bytes, dpi=300, fmt='jpeg', 
+                    # Raw PPM output avoids decoding a JPEG only to re-encode it
+                    images = convert_from_bytes(pdf_bytes, dpi=300, fmt='ppm', 
                                              grayscale=False, size=None,
                                              thread_count=2)
                     
@@ -1632,31 +1323,6 @@ def convert_pdf_to_images(pdf_bytes, filename=""):
                     
                     for i, image in enumerate(images):
                         img_byte_arr = io.BytesIO()
-                        
-                        # Add page number indicator
-                        draw = ImageDraw.Draw(image)
-                        try:
-                            # Try to get a font, fallback to default if not available
-                            font = ImageFont.truetype("arial.ttf", 24)
-                        except IOError:
-                            font = ImageFont.load_default()
-                            
-                        # Add page number indicator in the corner
-                        page_text = f"Page {i + 1}/{page_count}"
-                        text_width = draw.textlength(page_text, font=font) if hasattr(draw, 'textlength') else 150
-                        
-                        # Position in bottom right with padding
-                        draw.rectangle(
-                            [(image.width - text_width - 20, image.height - 40), (image.width - 5, image.height - 5)],
-                            fill=(50, 50, 50, 180)
-                        )
-                        draw.text(
-                            (image.width - text_width - 10, image.height - 35),
-                            page_text,
-                            fill=(255, 255, 255),
-                            font=font
-                        )
-                        
                         image.save(img_byte_arr, format='JPEG', quality=90, optimize=True)
                         image_bytes_list.append((img_byte_arr.getvalue(), i + 1, page_count, ""))
                     
@@ -1684,7 +1350,7 @@ def convert_pdf_to_images(pdf_bytes, filename=""):
 
 def detect_orientation_fallback(image_bytes):
     """
-    Fallback method to detect orientation using basic image analysis.
+    Fallback method to detect orientation locally with Tesseract (see ocr_orientation).
     This is used if the API call fails.
     """
     try:
@@ -1692,65 +1358,26 @@ def detect_orientation_fallback(image_bytes):
         if not TESSERACT_AVAILABLE:
             print("Pytesseract not available for fallback orientation detection")
             return "ROTATE_0"  # Default to no rotation
-            
-        from PIL import Image
-        
-        # Open the image
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Try all four orientations and see which has the most recognized text
-        orientations = {
-            "ROTATE_0": image,
-            "ROTATE_90": image.rotate(-90, expand=True),
-            "ROTATE_180": image.rotate(-180, expand=True),
-            "ROTATE_270": image.rotate(-270, expand=True)
-        }
         
-        best_orientation = "ROTATE_0"
-        max_text_score = 0
-        
-        for orientation, img in orientations.items():
-            try:
-                # Convert to numpy array for tesseract
-                img_array = np.array(img)
-                
-                # Use tesseract to detect text
-                text_data = pytesseract.image_to_data(img_array, output_type=pytesseract.Output.DICT)
-                
-                # Calculate a score based on confidence of detected text
-                conf_values = [int(conf) for conf in text_data['conf'] if conf != '-1']
-                if conf_values:
-                    avg_conf = sum(conf_values) / len(conf_values)
-                    text_count = len([word for word in text_data['text'] if word.strip()])
-                    text_score = avg_conf * text_count
-                    
-                    if text_score > max_text_score:
-                        max_text_score = text_score
-                        best_orientation = orientation
-            except Exception as inner_error:
-                print(f"Error analyzing orientation {orientation}: {str(inner_error)}")
-                # If tesseract fails, just continue with the next orientation
-                continue
-        
-        # Return the best orientation
-        return best_orientation
+        return ocr_orientation.detect_rotation(image_bytes)
     except Exception as e:
         print(f"Fallback orientation detection failed: {str(e)}")
         return "ROTATE_0"  # Default to no rotation on error
 
-def detect_and_correct_orientation(image_bytes):
+def detect_and_correct_orientation(image_bytes, text_layer=None):
     """
     Detect and correct the orientation of an image using OpenAI's vision model.
+    PDF pages whose text layer settles the orientation locally skip the model call.
     Returns the rotated image bytes if rotation is needed, or the original image bytes if not.
     """
+    local_rotation = orientation.resolve(text_layer.get("orientation") if text_layer else None)
+    if local_rotation:
+        metrics.incr("orientation_llm_calls_avoided")
+        return apply_rotation(image_bytes, local_rotation)
+    
     try:
-        # First, decode the image to check if it's already correctly oriented
-        image = Image.open(io.BytesIO(image_bytes))
-        
         # Convert to base64 for API call
-        base64_image = encode_image_to_base64(image_bytes)
-        base64_image_data_url = f"data:image/png;base64,{base64_image}"
-
+        base64_image = encode_image_to_base64(image_policy.prepare_image(image_bytes, "orientation"))
         
         try:
             # Call OpenAI API to determine the orientation
@@ -1771,7 +1398,7 @@ def detect_and_correct_orientation(image_bytes):
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": base64_image_data_url
+                                    "url": base64_image
                                 }
                             }
                         ]
@@ -1781,12 +1408,7 @@ def detect_and_correct_orientation(image_bytes):
                 "temperature": 0
             }
 
-            headers = {
-                "Authorization": f"Bearer {st.session_state.current_api_key}",
-                "Content-Type": "application/json"
-            }
-
-            response = requests.post(API_URL, headers=headers, json=payload)
+            response = llm_transport.post_chat_completion(API_URL, payload)
             if response.status_code == 200:
                 response_json = response.json()
                 rotation_result = response_json["choices"][0]["message"]["content"].strip()
@@ -1799,90 +1421,96 @@ def detect_and_correct_orientation(image_bytes):
             # If API call fails, use fallback method
             rotation_result = detect_orientation_fallback(image_bytes)
         
-        # Rotate the image based on API response
+        return apply_rotation(image_bytes, rotation_result)
+            
+    except Exception as e:
+        print(f"Error in orientation detection: {str(e)}")
+        return image_bytes  # Return original on error
+
+def apply_rotation(image_bytes, rotation_result):
+    """
+    Rotate image bytes according to a ROTATE_0/90/180/270 decision.
+    JPEG pages are turned losslessly where jpegtran is available (see jpeg_rotation).
+    """
+    try:
         if rotation_result == "ROTATE_0":
             print("Image orientation is correct, no rotation needed")
             return image_bytes  # No rotation needed
         
-        # Perform rotation
-        if rotation_result == "ROTATE_90":
-            rotated_image = image.rotate(-90, expand=True)  # Negative for clockwise
-            rotation_message = "Rotated 90° clockwise"
-        elif rotation_result == "ROTATE_180":
-            rotated_image = image.rotate(-180, expand=True)
-            rotation_message = "Rotated 180°"
-        elif rotation_result == "ROTATE_270":
-            rotated_image = image.rotate(-270, expand=True)
-            rotation_message = "Rotated 90° counter-clockwise"
-        else:
+        rotation_messages = {
+            "ROTATE_90": "Rotated 90° clockwise",
+            "ROTATE_180": "Rotated 180°",
+            "ROTATE_270": "Rotated 90° counter-clockwise"
+        }
+        if rotation_result not in rotation_messages:
             return image_bytes  # Default to original if response is unexpected
         
-        # Convert rotated image back to bytes
-        img_byte_arr = io.BytesIO()
-        rotated_image.save(img_byte_arr, format=image.format or 'JPEG')
-        rotated_bytes = img_byte_arr.getvalue()
+        rotated_bytes = jpeg_rotation.rotate(image_bytes, rotation_result)
+        rotation_message = rotation_messages[rotation_result]
         
         # Log the rotation for debugging
         print(f"Image orientation corrected: {rotation_result} - {rotation_message}")
         st.info(f" Image orientation corrected: {rotation_message}")
         
         return rotated_bytes
-            
     except Exception as e:
-        print(f"Error in orientation detection: {str(e)}")
+        print(f"Error rotating image: {str(e)}")
         return image_bytes  # Return original on error
 
-def process_uploaded_file(uploaded_file):
-    """Process uploaded file whether it's an image or PDF"""
+def iter_pdf_pages(pdf_bytes, filename=""):
+    """
+    Yield PDF page records one at a time as they are rendered.
+    Falls back to the list-based converters when PyMuPDF cannot open the document.
+    """
+    rendered = 0
     try:
-        if uploaded_file.type == "application/pdf":
-            # Show processing message
-            with st.spinner('Converting PDF to images...'):
-                # Convert PDF to images
-                pdf_bytes = uploaded_file.read()
-                image_bytes_list = convert_pdf_to_images(pdf_bytes, uploaded_file.name)
-                if not image_bytes_list:
-                    st.error("Failed to convert PDF to images. Please check if the PDF is valid.")
-                    return None
-                
-                # Apply orientation correction to each page
-                corrected_image_bytes_list = []
-                for image_data in image_bytes_list:
-                    image_bytes, page_number, page_count, doc_title = image_data
-                    
-                    # Check and correct orientation
-                    with st.spinner(f'Analyzing orientation of page {page_number}...'):
-                        corrected_bytes = detect_and_correct_orientation(image_bytes)
-                        corrected_image_bytes_list.append((corrected_bytes, page_number, page_count, doc_title))
-                
-                st.success(f"Successfully converted PDF to {len(corrected_image_bytes_list)} images with corrected orientation")
-                return corrected_image_bytes_list
-        else:
-            # Handle direct image upload
-            try:
-                # Verify it's a valid image
-                image_bytes = uploaded_file.read()
-                image = Image.open(io.BytesIO(image_bytes))
-                uploaded_file.seek(0)  # Reset file pointer
-                
-                # Correct orientation
-                with st.spinner('Analyzing image orientation...'):
-                    corrected_bytes = detect_and_correct_orientation(image_bytes)
-                
-                # Return single image with metadata (as a list for consistency)
-                return [(corrected_bytes, 1, 1, uploaded_file.name)]
-            except Exception as e:
-                st.error(f"Invalid image file: {str(e)}")
-                return None
+        for page in pdf_raster.iter_pdf_pages(pdf_bytes):
+            rendered += 1
+            yield page
+        if rendered:
+            return
     except Exception as e:
-        st.error(f"Error processing file: {str(e)}")
-        return None
+        if rendered:
+            st.error(f"Error rendering page {rendered + 1} of {filename}: {str(e)}")
+            return
+        st.error(f"Error converting PDF with PyMuPDF: {str(e)}")
+    
+    for page in convert_pdf_to_images(pdf_bytes, filename, try_pymupdf=False) or []:
+        yield page
 
-def process_drawing(drawing_type, image_data, file_name, img_idx=0):
-    """Process a single drawing and update the session state."""
-    # Unpack image data - handle both formats (backwards compatibility)
+def iter_uploaded_pages(uploaded_file, correct_orientation=True):
+    """
+    Yield the page records of an uploaded image or PDF one at a time, so the
+    first page can be analysed while later pages are still being rendered.
+    Pass correct_orientation=False when the caller runs orientation correction
+    itself as part of the per-page pipeline.
+    """
+    if uploaded_file.type == "application/pdf":
+        pages = iter_pdf_pages(uploaded_file.read(), uploaded_file.name)
+    else:
+        try:
+            # Verify it's a valid image
+            image_bytes = uploaded_file.read()
+            Image.open(io.BytesIO(image_bytes))
+            uploaded_file.seek(0)  # Reset file pointer
+        except Exception as e:
+            st.error(f"Invalid image file: {str(e)}")
+            return
+        pages = [(image_bytes, 1, 1, uploaded_file.name)]
+    
+    for page in pages:
+        if correct_orientation:
+            text_layer = page[4] if len(page) >= 5 else None
+            page = (detect_and_correct_orientation(page[0], text_layer),) + tuple(page[1:])
+        yield page
+
+def unpack_page_data(image_data, file_name, img_idx=0):
+    """
+    Return (image_bytes, suffix, file_name) for a page record, handling the legacy bare-bytes format.
+    PDF page records may carry the page's text layer as an optional fifth element.
+    """
     if isinstance(image_data, tuple) and len(image_data) >= 3:
-        image_bytes, page_number, page_count, doc_title = image_data
+        image_bytes, page_number, page_count, doc_title = image_data[:4]
         suffix = f"_page_{page_number}_of_{page_count}"
         if doc_title:
             file_name = doc_title
@@ -1890,14 +1518,17 @@ def process_drawing(drawing_type, image_data, file_name, img_idx=0):
         # Legacy format
         image_bytes = image_data
         suffix = f"_page_{img_idx + 1}"
-    
+    return image_bytes, suffix, file_name
+
+def add_drawing_row(drawing_type, suffix, status='Processing..'):
+    """Append a placeholder row for a drawing to the table and return its internal ID."""
     # Create a unique identifier for this drawing
     drawing_id = str(uuid.uuid4())[:8]
     
     new_drawing = {
         'Drawing Type': drawing_type,
         'Drawing No.': f"Processing{suffix}",
-        'Processing Status': 'Processing..',
+        'Processing Status': status,
         'Extracted Fields Count': '0/0',
         'Confidence Score': '0%',
         'Internal ID': drawing_id  # Add internal ID for tracking
@@ -1909,118 +1540,280 @@ def process_drawing(drawing_type, image_data, file_name, img_idx=0):
         pd.DataFrame([new_drawing])
     ], ignore_index=True)
     
-    # Process the drawing
-    with st.spinner(f'Analyzing {drawing_type.lower()} drawing{suffix}...'):
-        # Track this component type in the custom_component_types session state
-        if drawing_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
-            if 'custom_component_types' not in st.session_state:
-                st.session_state.custom_component_types = {}
-            st.session_state.custom_component_types[drawing_type] = True
-            
-        # Pass the component type to the analyzer for more targeted analysis
-        result = analyze_engineering_drawing(image_bytes, drawing_type)
+    return drawing_id
+
+def update_drawing_row(drawing_id, values):
+    """Update the columns of the table row identified by its internal ID."""
+    mask = st.session_state.drawings_table['Internal ID'] == drawing_id
+    if any(mask):
+        st.session_state.drawings_table.loc[mask, list(values.keys())] = list(values.values())
+
+def complete_drawing(drawing_id, drawing_type, result, image_bytes, file_name, suffix):
+    """
+    Store the analysis result for a drawing and finalise its table row.
+    result is the parsed results dict from analyze_engineering_drawing, or an error string.
+    """
+    # Track this component type in the custom_component_types session state
+    if drawing_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
+        if 'custom_component_types' not in st.session_state:
+            st.session_state.custom_component_types = {}
+        st.session_state.custom_component_types[drawing_type] = True
+    
+    if isinstance(result, dict):
+        parsed_results = result
+        
+        # Get drawing number based on component type
+        if drawing_type == "VALVE":
+            drawing_number = parsed_results.get('MODEL NO', '')
+        else:
+            drawing_number = parsed_results.get('DRAWING NUMBER', '') or parsed_results.get('MODEL NUMBER', '')
+        
+        if not drawing_number or drawing_number == 'Unknown':
+            # Use file name or component type plus suffix and drawing ID for uniqueness
+            drawing_number = f"{file_name.split('.')[0]}{suffix}_{drawing_id}"
+        
+        # Store results
+        # Session state keeps only the image store key; the raster itself lives on disk
+        st.session_state.current_image_key[drawing_number] = image_store.put(image_bytes) if image_bytes else None
+        st.session_state.current_page_label[drawing_number] = page_badge.badge_text(suffix)
+        st.session_state.all_results[drawing_number] = parsed_results
+        
+        # Get the detected component type from results and update if different
+        detected_type = parsed_results.get('COMPONENT_TYPE', '')
+        if detected_type and detected_type != drawing_type and detected_type != "UNKNOWN":
+            # Update the drawing type in the table
+            drawing_type = detected_type
+            # Also track this detected type
+            if detected_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
+                if 'custom_component_types' not in st.session_state:
+                    st.session_state.custom_component_types = {}
+                st.session_state.custom_component_types[detected_type] = True
         
-        if result and "❌" not in result:
-            parsed_results = parse_ai_response(result)
-            
-            # Get drawing number based on component type
-            if drawing_type == "VALVE":
-                drawing_number = parsed_results.get('MODEL NO', '')
-            else:
-                drawing_number = parsed_results.get('DRAWING NUMBER', '') or parsed_results.get('MODEL NUMBER', '')
-            
-            if not drawing_number or drawing_number == 'Unknown':
-                # Use file name or component type plus suffix and drawing ID for uniqueness
-                drawing_number = f"{file_name.split('.')[0]}{suffix}_{drawing_id}"
-            
-            # Store results
-            st.session_state.current_image[drawing_number] = image_bytes
-            st.session_state.all_results[drawing_number] = parsed_results
-            
-            # Get the detected component type from results and update if different
-            detected_type = parsed_results.get('COMPONENT_TYPE', '')
-            if detected_type and detected_type != drawing_type and detected_type != "UNKNOWN":
-                # Update the drawing type in the table
-                drawing_type = detected_type
-                # Also track this detected type
-                if detected_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
-                    if 'custom_component_types' not in st.session_state:
-                        st.session_state.custom_component_types = {}
-                    st.session_state.custom_component_types[detected_type] = True
-            
-            # Update status
-            parameters = get_extraction_parameters(drawing_type)
-            
-            # Extract all parameters that were detected (excluding justifications and component type)
-            detected_params = [k for k in parsed_results.keys() 
-                              if not k.endswith('_JUSTIFICATION') and k != 'COMPONENT_TYPE']
-            
-            # Count non-empty fields from both standard parameters and any additional detected parameters
-            non_empty_standard = sum(1 for k in parameters if k in parsed_results and parsed_results.get(k, '').strip())
-            non_empty_additional = sum(1 for k in detected_params if k not in parameters and parsed_results.get(k, '').strip())
-            non_empty_fields = non_empty_standard + non_empty_additional
-            
-            # Use the larger of standard parameters or detected parameters for total count
-            total_fields = max(len(parameters), len(detected_params))
-            
-            # Ensure we have valid field counts
-            if total_fields == 0:
-                total_fields = 1  # Avoid division by zero
-            
-            # Add any additional detected parameters to the custom product type if it exists
-            if drawing_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
-                if drawing_type not in st.session_state.custom_products:
-                    # Create a new custom product type with the detected parameters
-                    new_params = [k for k in detected_params if k != 'COMPONENT_TYPE']
-                    st.session_state.custom_products[drawing_type] = {
-                        'parameters': new_params,
-                        'auto_detected': True
-                    }
-                elif isinstance(st.session_state.custom_products[drawing_type], dict):
-                    # Add any new parameters that were detected but not in the current list
-                    current_params = st.session_state.custom_products[drawing_type].get('parameters', [])
-                    for param in detected_params:
-                        if param not in current_params and param != 'COMPONENT_TYPE':
-                            current_params.append(param)
-                    st.session_state.custom_products[drawing_type]['parameters'] = current_params
-            
-            # Calculate confidence percentage with bounds checking
-            confidence_percent = min(100, max(0, (non_empty_fields / total_fields * 100)))
-            
-            new_drawing.update({
-                'Drawing Type': drawing_type,  # Update with potentially new detected type
-                'Drawing No.': drawing_number,
-                'Processing Status': 'Completed' if non_empty_fields >= total_fields * 0.7 else 'Needs Review',
-                'Extracted Fields Count': f"{non_empty_fields}",  # Show only the number of extracted fields
-                'Confidence Score': f"{confidence_percent:.0f}%",
-                'Internal ID': drawing_id  # Keep the internal ID
-            })
+        # Update status
+        parameters = get_extraction_parameters(drawing_type)
+        
+        # Extract all parameters that were detected (excluding justifications and component type)
+        detected_params = [k for k in parsed_results.keys() 
+                          if not k.endswith('_JUSTIFICATION') and k != 'COMPONENT_TYPE']
+        
+        # Count non-empty fields from both standard parameters and any additional detected parameters
+        non_empty_standard = sum(1 for k in parameters if k in parsed_results and parsed_results.get(k, '').strip())
+        non_empty_additional = sum(1 for k in detected_params if k not in parameters and parsed_results.get(k, '').strip())
+        non_empty_fields = non_empty_standard + non_empty_additional
+        
+        # Use the larger of standard parameters or detected parameters for total count
+        total_fields = max(len(parameters), len(detected_params))
+        
+        # Ensure we have valid field counts
+        if total_fields == 0:
+            total_fields = 1  # Avoid division by zero
+        
+        # Add any additional detected parameters to the custom product type if it exists
+        if drawing_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
+            if drawing_type not in st.session_state.custom_products:
+                # Create a new custom product type with the detected parameters
+                new_params = [k for k in detected_params if k != 'COMPONENT_TYPE']
+                st.session_state.custom_products[drawing_type] = {
+                    'parameters': new_params,
+                    'auto_detected': True
+                }
+            elif isinstance(st.session_state.custom_products[drawing_type], dict):
+                # Add any new parameters that were detected but not in the current list
+                current_params = st.session_state.custom_products[drawing_type].get('parameters', [])
+                for param in detected_params:
+                    if param not in current_params and param != 'COMPONENT_TYPE':
+                        current_params.append(param)
+                st.session_state.custom_products[drawing_type]['parameters'] = current_params
+        
+        # Calculate confidence percentage with bounds checking
+        confidence_percent = min(100, max(0, (non_empty_fields / total_fields * 100)))
+        
+        update_drawing_row(drawing_id, {
+            'Drawing Type': drawing_type,  # Update with potentially new detected type
+            'Drawing No.': drawing_number,
+            'Processing Status': 'Completed' if non_empty_fields >= total_fields * 0.7 else 'Needs Review',
+            'Extracted Fields Count': f"{non_empty_fields}",  # Show only the number of extracted fields
+            'Confidence Score': f"{confidence_percent:.0f}%"
+        })
+            
+        return drawing_number
+    else:
+        update_drawing_row(drawing_id, {
+            'Drawing Type': drawing_type,
+            'Processing Status': 'Failed',
+            'Confidence Score': '0%',
+            'Extracted Fields Count': '0/0'
+        })
             
-            # Update the table row
-            mask = st.session_state.drawings_table['Internal ID'] == drawing_id
-            if any(mask):
-                st.session_state.drawings_table.loc[mask, new_drawing.keys()] = list(new_drawing.values())
-            else:
-                # Fallback to updating the last row if ID not found (shouldn't happen)
-                st.session_state.drawings_table.iloc[-1] = new_drawing
-                
-            return drawing_number
+        return None
+
+def complete_duplicate(drawing_id, original):
+    """
+    Finalise the row of a page that is a near-identical copy of an already analysed
+    drawing: the row points at the original's result and is flagged 'Duplicate'.
+    """
+    table = st.session_state.drawings_table
+    original_rows = table[(table['Drawing No.'] == original) & (table['Internal ID'] != drawing_id)]
+    if original_rows.empty:
+        drawing_type = st.session_state.all_results.get(original, {}).get('COMPONENT_TYPE', 'UNKNOWN')
+        fields_count, confidence = '0', '0%'
+    else:
+        original_row = original_rows.iloc[0]
+        drawing_type = original_row['Drawing Type']
+        fields_count, confidence = original_row['Extracted Fields Count'], original_row['Confidence Score']
+    
+    update_drawing_row(drawing_id, {
+        'Drawing Type': drawing_type,
+        'Drawing No.': original,
+        'Processing Status': 'Duplicate',
+        'Extracted Fields Count': fields_count,
+        'Confidence Score': confidence
+    })
+    return original
+
+def analyze_page(image_data):
+    """
+    Run the full per-page pipeline: one triage call for orientation and type, then extraction.
+    Executed on a page_pipeline worker thread, so it must not touch the drawings table.
+    """
+    image_bytes = image_data[0] if isinstance(image_data, tuple) else image_data
+    text_layer = image_data[4] if isinstance(image_data, tuple) and len(image_data) >= 5 else None
+    
+    # PDF text direction usually settles orientation; then triage only asks for the types
+    local_rotation = orientation.resolve(text_layer.get("orientation") if text_layer else None)
+    if local_rotation:
+        image_bytes = apply_rotation(image_bytes, local_rotation)
+    
+    if text_layer and not text_layer.get("has_text_layer"):
+        # Scanned page: keep the raster vision path
+        text_layer = None
+    metrics.incr("pages_text_layer" if text_layer else "pages_raster_only")
+    
+    triage = triage_page(image_bytes, rotation=local_rotation)
+    if not isinstance(triage, dict):
+        return {"image_bytes": image_bytes, "drawing_type": "UNKNOWN", "result": triage}
+    
+    if not local_rotation:
+        image_bytes = apply_rotation(image_bytes, triage["rotation"])
+    drawing_type = triage["component_type"]
+    page_pipeline.report_progress(("COMPONENT_TYPE", drawing_type))
+    
+    # Streamed fields go to the main thread through the pipeline's update queue
+    result = analyze_engineering_drawing(
+        image_bytes, drawing_type,
+        on_field=lambda name, value: page_pipeline.report_progress((name, value)),
+        text_layer=text_layer
+    )
+    return {"image_bytes": image_bytes, "drawing_type": drawing_type, "result": result}
+
+def process_pages(pages, file_name):
+    """
+    Analyse the pages of an upload concurrently.
+    pages may be a generator (see iter_uploaded_pages); pages are pulled as
+    worker slots free up. Rows are added to drawings_table in page order as
+    pages arrive and each row is finalised as soon as its page finishes.
+    Returns one entry per page; page results are not kept once their row is
+    finalised (the raster is in image_store by then).
+    """
+    rows = []
+    drawing_ids = []
+    finished = []
+    streamed_fields = {}
+    # Captured here: worker threads check for duplicates without touching session state
+    page_index = st.session_state.page_index
+    all_results = st.session_state.all_results
+    
+    progress = st.progress(0.0, text=f"Analyzing {file_name}...")
+    live_table = st.empty()
+    live_fields = st.empty()
+    
+    def page_total():
+        # Page records carry the document's page count; fall back to the pages seen so far
+        return max([len(rows)] + [page_count for _, _, _, page_count in rows if page_count])
+    
+    def on_page_start(idx, image_data):
+        _, suffix, page_file_name = unpack_page_data(image_data, file_name, idx)
+        drawing_id = add_drawing_row("PENDING", suffix, status='Queued')
+        # Only the page count is kept; the page bytes stay with the worker
+        page_count = image_data[2] if isinstance(image_data, tuple) and len(image_data) >= 3 else None
+        rows.append((drawing_id, suffix, page_file_name, page_count))
+        drawing_ids.append(drawing_id)
+        show_live_table()
+    
+    def show_live_table():
+        table = st.session_state.drawings_table
+        live_table.dataframe(table[table['Internal ID'].isin(drawing_ids)].drop(columns=['Internal ID']),
+                             use_container_width=True, hide_index=True)
+    
+    def on_page_update(idx, updates):
+        drawing_id, suffix, page_file_name, _ = rows[idx]
+        fields = streamed_fields.setdefault(idx, {})
+        for name, value in updates:
+            if name == "COMPONENT_TYPE":
+                if value and value != "UNKNOWN":
+                    update_drawing_row(drawing_id, {'Drawing Type': value})
+            elif name != "DOCUMENT_TYPE":
+                fields[name] = value
+        
+        non_empty = sum(1 for value in fields.values() if value.strip())
+        update_drawing_row(drawing_id, {
+            'Processing Status': 'Extracting..',
+            'Extracted Fields Count': f"{non_empty}"
+        })
+        show_live_table()
+        
+        # Preview of the fields received so far for the page that just reported
+        if fields:
+            with live_fields.container():
+                st.caption(f"Receiving fields for {page_file_name}{suffix}")
+                st.dataframe(pd.DataFrame(list(fields.items()), columns=['Parameter', 'Value']),
+                             use_container_width=True, hide_index=True)
+    
+    def analyze_or_reuse(image_data):
+        # Near-identical pages (same drawing under another name, repeated title sheets) reuse the earlier result
+        image_bytes = image_data[0] if isinstance(image_data, tuple) else image_data
+        text_layer = image_data[4] if isinstance(image_data, tuple) and len(image_data) >= 5 else None
+        try:
+            signature = phash_index.page_signature(image_bytes, text_layer)
+        except Exception as e:
+            print(f"Page hashing failed: {str(e)}")
+            signature = None
+        
+        match = page_index.find(signature) if signature else None
+        if match and match[0] in all_results:
+            return {"duplicate_of": match[0]}
+        
+        page_result = analyze_page(image_data)
+        page_result["signature"] = signature
+        return page_result
+    
+    def on_page_done(idx, image_data, page_result):
+        drawing_id, suffix, page_file_name, _ = rows[idx]
+        if isinstance(page_result, dict) and page_result.get("duplicate_of"):
+            complete_duplicate(drawing_id, page_result["duplicate_of"])
+        elif isinstance(page_result, dict):
+            drawing_number = complete_drawing(drawing_id, page_result["drawing_type"], page_result["result"],
+                                              page_result["image_bytes"], page_file_name, suffix)
+            if drawing_number and page_result.get("signature"):
+                page_index.add(page_result["signature"], drawing_number)
         else:
-            new_drawing.update({
-                'Processing Status': 'Failed',
-                'Confidence Score': '0%',
-                'Extracted Fields Count': '0/0'
-            })
-            
-            # Update the table row
-            mask = st.session_state.drawings_table['Internal ID'] == drawing_id
-            if any(mask):
-                st.session_state.drawings_table.loc[mask, new_drawing.keys()] = list(new_drawing.values())
-            else:
-                # Fallback to updating the last row if ID not found (shouldn't happen)
-                st.session_state.drawings_table.iloc[-1] = new_drawing
-                
-            return None
+            complete_drawing(drawing_id, "UNKNOWN", page_result, None, page_file_name, suffix)
+        
+        finished.append(idx)
+        total = page_total()
+        progress.progress(len(finished) / total, text=f"Analyzed {len(finished)}/{total} page(s) of {file_name}")
+        show_live_table()
+    
+    results = page_pipeline.run_pages(
+        pages,
+        analyze_or_reuse,
+        max_workers=st.session_state.get("page_concurrency", page_pipeline.PAGE_CONCURRENCY),
+        on_page_done=on_page_done,
+        on_page_update=on_page_update,
+        on_page_start=on_page_start
+    )
+    live_fields.empty()
+    return results
 
 def main():
     # Set page config
@@ -2274,6 +2067,11 @@ def main():
             color: #DC3545;
         }
 
+        .status-duplicate {
+            background-color: rgba(108, 117, 125, 0.1);
+            color: #6C757D;
+        }
+
         /* Progress bar */
         .progress-container {
             width: 100%;
@@ -2582,8 +2380,12 @@ def main():
         st.session_state.all_results = {}
     if 'selected_drawing' not in st.session_state:
         st.session_state.selected_drawing = None
-    if 'current_image' not in st.session_state:
-        st.session_state.current_image = {}
+    if 'current_image_key' not in st.session_state:
+        st.session_state.current_image_key = {}
+    if 'current_page_label' not in st.session_state:
+        st.session_state.current_page_label = {}
+    if 'page_index' not in st.session_state:
+        st.session_state.page_index = phash_index.PageIndex()
     if 'edited_values' not in st.session_state:
         st.session_state.edited_values = {}
     if 'custom_products' not in st.session_state:
@@ -2606,6 +2408,10 @@ def main():
         st.session_state.parameter_mode = "Default"
     if 'custom_parameters' not in st.session_state:
         st.session_state.custom_parameters = {}
+    if 'document_types' not in st.session_state:
+        st.session_state.document_types = {}
+    if 'page_concurrency' not in st.session_state:
+        st.session_state.page_concurrency = page_pipeline.PAGE_CONCURRENCY
 
     # Function to handle state changes that require a rerun
     def set_rerun():
@@ -2641,8 +2447,19 @@ def main():
             - Windows: https://github.com/UB-Mannheim/tesseract/wiki
             - Mac: brew install tesseract
             - Linux: apt-get install tesseract-ocr
+            
+            If the tesseract binary is not on PATH, set the TESSERACT_CMD environment variable to its location.
             """)
         
+        # Number of PDF pages analysed in parallel
+        st.session_state.page_concurrency = st.slider(
+            "Pages Processed in Parallel",
+            min_value=1,
+            max_value=page_pipeline.MAX_PAGE_CONCURRENCY,
+            value=st.session_state.page_concurrency,
+            help="Maximum number of pages of a PDF analysed at the same time"
+        )
+        
         # Component type filter for listing
         if st.session_state.drawings_table.empty:
             component_types = ["All Types"]
@@ -2661,6 +2478,22 @@ def main():
             help="Filter drawings by minimum confidence score"
         )
         
+        # Numeric filter on one extracted parameter, compared in SI units
+        value_filter = None
+        if st.session_state.all_results:
+            si_values, si_units = units.si_columns(units.results_table(st.session_state.all_results))
+            if si_units:
+                filter_parameter = st.selectbox("Filter by Parameter Value", ["None"] + sorted(si_units))
+                if filter_parameter != "None":
+                    si_unit = si_units[filter_parameter]
+                    min_col, max_col = st.columns(2)
+                    with min_col:
+                        minimum = st.number_input(f"Min ({si_unit})", value=None, format="%g")
+                    with max_col:
+                        maximum = st.number_input(f"Max ({si_unit})", value=None, format="%g")
+                    if minimum is not None or maximum is not None:
+                        value_filter = (si_values[filter_parameter], minimum, maximum)
+        
         # Add export all button
         if not st.session_state.drawings_table.empty:
             if st.button("Export All Results to CSV", use_container_width=True):
@@ -2686,6 +2519,12 @@ def main():
                 # Create dataframe and download link
                 if export_data:
                     export_df = pd.DataFrame(export_data)
+                    # Numeric SI columns next to the text values, for sorting and filtering in a spreadsheet
+                    si_values, si_units = units.si_columns(
+                        export_df, [column for column in export_df.columns if column not in ("Drawing Number", "Component Type")]
+                    )
+                    for column, si_unit in si_units.items():
+                        export_df[f"{column} [{si_unit}]"] = si_values[column]
                     csv = export_df.to_csv(index=False)
                     st.download_button(
                         label="Download CSV",
@@ -2695,6 +2534,16 @@ def main():
                         use_container_width=True
                     )
         
+        # Pipeline counters such as LLM cache hits
+        pipeline_metrics = metrics.snapshot()
+        if pipeline_metrics:
+            with st.expander("Pipeline Metrics"):
+                st.dataframe(
+                    pd.DataFrame(list(pipeline_metrics.items()), columns=["Metric", "Value"]),
+                    use_container_width=True,
+                    hide_index=True
+                )
+        
         # Add clear all button with confirmation
         if not st.session_state.drawings_table.empty:
             st.markdown("---")
@@ -2717,7 +2566,9 @@ def main():
                             'Internal ID'
                         ])
                         st.session_state.all_results = {}
-                        st.session_state.current_image = {}
+                        st.session_state.current_image_key = {}
+                        st.session_state.current_page_label = {}
+                        st.session_state.page_index = phash_index.PageIndex()
                         st.session_state.edited_values = {}
                         st.session_state.selected_drawing = None
                         st.session_state.show_confirm = False
@@ -2836,7 +2687,12 @@ def main():
         for idx, file in enumerate(uploaded_files):
             col = cols[idx % 4]
             with col:
-                if file.type == "application/pdf":
+                # Thumbnails are cached by file hash (see thumbnails.py), so reruns do not decode uploads again
+                thumbnail = thumbnails.get_thumbnail(file)
+                if thumbnail is not None:
+                    caption = f"{file.name} (PDF)" if file.type == "application/pdf" else file.name
+                    st.image(thumbnail, caption=caption, width=150)
+                elif file.type == "application/pdf":
                     st.markdown(f"""
                         <div class="card" style="padding: 10px; text-align: center; margin-bottom: 16px;">
                             <svg width="64" height="64" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
@@ -2850,30 +2706,16 @@ def main():
                         </div>
                     """, unsafe_allow_html=True)
                 else:
-                    # For images, display a thumbnail
-                    try:
-                        # Display image directly with st.image instead of using HTML/Base64
-                        image_bytes = file.read()
-                        file.seek(0)  # Reset file pointer after reading
-                        
-                        # Create a thumbnail
-                        image = Image.open(io.BytesIO(image_bytes))
-                        
-                        # Display the image with Streamlit's built-in image component
-                        st.image(image, caption=file.name, width=150)
-                    except Exception as e:
-                        st.error(f"Error displaying image: {str(e)}")
+                    st.error(f"Error displaying image: {file.name} could not be read")
                 
                 # Process button for each file
                 if st.button(f"Process", key=f"process_{idx}"):
                     try:
-                        processed_images = process_uploaded_file(file)
-                        if processed_images:
-                            for img_idx, image_data in enumerate(processed_images):
-                                with st.spinner('Identifying drawing type...'):
-                                    drawing_type = identify_drawing_type(image_data[0] if isinstance(image_data, tuple) else image_data)
-                                    if drawing_type and "❌" not in drawing_type:
-                                        process_drawing(drawing_type, image_data, file.name, img_idx)
+                        # Orientation and type are triaged per page inside the concurrent pipeline
+                        # Pages are rendered lazily and fed to the pipeline as workers free up
+                        results = process_pages(iter_uploaded_pages(file, correct_orientation=False), file.name)
+                        if not results:
+                            st.error("Failed to convert file to images. Please check if the file is valid.")
                     except Exception as e:
                         st.error(f"Error processing {file.name}: {str(e)}")
                     set_rerun()
@@ -2900,6 +2742,12 @@ def main():
                 )
             ]
             
+        # Filter by parameter value (ranges compare by their low end)
+        if value_filter:
+            si_series, minimum, maximum = value_filter
+            matching = si_series.index[units.in_range(si_series, minimum, maximum)]
+            filtered_table = filtered_table[filtered_table["Drawing No."].isin(matching)]
+            
         if filtered_table.empty and not st.session_state.drawings_table.empty:
             st.warning(f"No drawings match the current filters. Try adjusting your filter criteria.")
             
@@ -2951,6 +2799,8 @@ def main():
                         status_class = "status-review"
                     elif row['Processing Status'] == 'Failed':
                         status_class = "status-failed"
+                    elif row['Processing Status'] == 'Duplicate':
+                        status_class = "status-duplicate"
                         
                     st.markdown(f"<span class='status-indicator {status_class}'>{row['Processing Status']}</span>", unsafe_allow_html=True)
                 
@@ -3048,10 +2898,12 @@ def main():
                         <div class="image-container">
                 """, unsafe_allow_html=True)
                 
-                image_data = st.session_state.current_image.get(st.session_state.selected_drawing)
+                image_data = image_store.get(st.session_state.current_image_key.get(st.session_state.selected_drawing))
                 if image_data is not None:
                     try:
-                        image = Image.open(io.BytesIO(image_data))
+                        # The page badge is a display-only overlay; the stored raster stays untouched
+                        page_label = st.session_state.current_page_label.get(st.session_state.selected_drawing, "")
+                        image = Image.open(io.BytesIO(page_badge.badged_image(image_data, page_label)))
                         st.image(image, use_column_width=True)
                     except Exception as e:
                         st.error(f"Unable to display image: {str(e)}. Please try processing the drawing again.")
@@ -3119,9 +2971,16 @@ def main():
                 # Get the defined template parameters for this component type
                 template_parameters = get_extraction_parameters(drawing_type)
                 
-                # Normalize all parameters to remove underscores and standardize case for comparison
+                # Template parameters keep their own rows, even where the template lists two
+                # synonyms (MINIMUM HEIGHT and CLOSED HEIGHT); other spellings share the row of
+                # their canonical parameter (see param_aliases.py)
+                template_keys = {param_aliases.normalise(param) for param in template_parameters}
+                
                 def normalize_param(param):
-                    return param.upper().replace('_', ' ').replace('-', ' ')
+                    normalized = param_aliases.normalise(param)
+                    if normalized in template_keys:
+                        return normalized
+                    return param_aliases.normalise(param_aliases.canonical(param))
                 
                 # Create a parameter mapping to handle different variations of the same parameter
                 param_mapping = {}
@@ -3179,20 +3038,18 @@ def main():
                             normalized_display.add(normalized)
                 
                 # First let's sort parameters by whether they have values and their position in the template
+                template_positions = {}
+                for i, template_param in enumerate(template_parameters):
+                    template_positions.setdefault(normalize_param(template_param), i)
+                
                 def param_sort_key(param):
                     # First priority: has a value
                     has_value = 0 if results.get(param, '').strip() else 1
                     # Second priority: is in template (and its position)
-                    in_template = False
-                    template_pos = len(template_parameters) + 1  # Default to end
-                    
-                    for i, template_param in enumerate(template_parameters):
-                        if normalize_param(param) == normalize_param(template_param):
-                            in_template = True
-                            template_pos = i
-                            break
-                    
-                    return (has_value, 0 if in_template else 1, template_pos)
+                    template_pos = template_positions.get(normalize_param(param))
+                    if template_pos is None:
+                        return (has_value, 1, len(template_parameters) + 1)
+                    return (has_value, 0, template_pos)
                 
                 # Sort the parameters
                 sorted_parameters = sorted(display_parameters, key=param_sort_key)
@@ -3339,6 +3196,10 @@ def main():
                 with col1:
                     # Create DataFrame for export
                     export_df = pd.DataFrame(edited_data)
+                    if not export_df.empty:
+                        quantities = units.quantity_frame(export_df["Value"])
+                        export_df["SI Value"] = quantities["si_value"]
+                        export_df["SI Unit"] = quantities["si_unit"]
                     csv = export_df.to_csv(index=False)
                     st.download_button(
                         label="Export to CSV",
@@ -3497,6 +3358,49 @@ def main():
         st.session_state.needs_rerun = False
         st.rerun()
 
+def build_region_content(image_bytes, fields, initial_results):
+    """
+    Build the image content for the second pass: one labelled crop per region.
+    
+    Fields are grouped by the region they are expected in (see regions.py).
+    Falls back to the whole page when the page cannot be cropped.
+    
+    Returns:
+        List of chat content parts (text label followed by its image, per region)
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+        content = []
+        for region, box, region_fields in regions.plan_regions(fields, initial_results):
+            fields_str = "\n".join([f"- {field}" for field in region_fields])
+            crop_bytes = regions.crop_region(image, box)
+            content.append({
+                "type": "text",
+                "text": f"REGION: {regions.REGION_LABELS[region]}. Parameters to look for in this crop:\n{fields_str}"
+            })
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": encode_image_to_base64(image_policy.prepare_image(crop_bytes, "region_crop"))
+                }
+            })
+        metrics.incr("second_pass_region_crops", len(content) // 2)
+        return content
+    except Exception as e:
+        print(f"Region cropping failed, sending full page: {str(e)}")
+        fields_str = "\n".join([f"- {field}" for field in fields])
+        return [
+            {"type": "text", "text": f"REGION: Full page. Parameters to look for:\n{fields_str}"},
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": encode_image_to_base64(image_policy.prepare_image(image_bytes, "second_pass"))
+                }
+            }
+        ]
+
+
 def perform_second_extraction_pass(image_bytes, initial_results, component_type=None):
     """
     Perform a second, more focused extraction pass to fill in missing fields.
@@ -3552,79 +3456,40 @@ def perform_second_extraction_pass(image_bytes, initial_results, component_type=
     if not component_type and "COMPONENT_TYPE" in initial_results:
         component_type = initial_results["COMPONENT_TYPE"]
     
-    # Format empty fields for the prompt
-    empty_fields_str = "\n".join([f"- {field}" for field in empty_fields])
-    
-    # Convert image to base64
-    base64_image = encode_image_to_base64(image_bytes)
+    # Send crops of the regions where the missing fields should be (title block,
+    # specification tables, dimensioned views) instead of the whole page
+    region_content = build_region_content(image_bytes, empty_fields, initial_results)
     
     # Create a targeted system prompt for the second pass with emphasis on drawing elements
     system_content = """
     You are a senior mechanical design engineer with specialized expertise in technical drawing interpretation.
-    Your task is to extract engineering data directly from visual elements of the drawing rather than from text or tables.
+    Your task is to fill in engineering parameters that a first extraction pass missed.
     
     CORE CAPABILITIES:
     1. Dimensional Analysis - Extract precise measurements from dimension lines and callouts
     2. Engineering Symbol Interpretation - Decode GD&T symbols, tolerances, and technical annotations
     3. Cross-Section Analysis - Evaluate internal features from sectional views
     4. Visual Engineering Inference - Determine mechanical properties from visual representations
-    5. Manufacturing Assessment - Identify production requirements from drawing details
     
-    Your expertise as a design engineer allows you to understand not just WHAT is shown, but WHY certain design choices were made.
-    Focus on extracting information from the drawing itself, not from specification tables or text blocks which have already been processed.
+    You are shown cropped regions of a drawing, each labelled with the parameters to look for in it.
     """
     
-    # Create user prompt focusing on the missing fields and visual elements
+    # Create user prompt; the per-region parameter lists follow with their crops
     user_content = f"""
-    FOCUSED DRAWING ANALYSIS TASK:
-    
-    This is a {component_type} drawing. I need you to extract information DIRECTLY FROM THE DRAWING ELEMENTS (not from specification tables) for these specific parameters:
-    {empty_fields_str}
-    
-    INSTRUCTIONS FOR VISUAL ANALYSIS:
-    
-    1. DIMENSION FOCUS: Carefully examine all dimension lines on the drawing. These appear as lines with arrowheads and numerical values indicating measurements.
-       - Look for dimensions showing lengths, diameters, depths, radii, etc.
-       - Pay attention to the unit symbols (mm, in, etc.) and decimal precision
-    
-    2. ENGINEERING SYMBOLS: Identify and interpret standard engineering symbols:
-       - Ø symbol indicates diameter
-       - R symbol indicates radius
-       - ± indicates tolerance
-       - ▭ indicates square
-       - ⌀ indicates cylindrical feature
-       - Surface finish symbols
-    
-    3. SECTION VIEWS: Examine any cross-sectional views (typically indicated by hatched areas):
-       - These reveal internal features not visible from the outside
-       - Look for wall thicknesses, internal clearances, and nested components
-    
-    4. DETAIL VIEWS: Check for any magnified detail views:
-       - These show specific features at a larger scale
-       - Often indicated by a circled letter or number referencing the main view
-    
-    5. VISUAL INFERENCE: Make professional inferences based on the drawing:
-       - For cylinder action, check for visible ports (one port = single acting, two ports = double acting)
-       - For mounting type, observe how the component connects to other parts
-       - For materials, note any hatching patterns or material symbols
-    
-    6. DRAWING ANNOTATIONS: Look for non-tabular annotations:
-       - Notes directly on the drawing pointing to specific features
-       - Text along dimension lines
-       - Labels on components
-    
-    7. REFERENCE INFORMATION: Check the drawing borders and title blocks for:
-       - Scale information (to verify dimensions)
-       - Drawing standards used
-       - Revision history
-    
-    For each parameter, provide:
-    1. The extracted value with proper units
-    2. A precise justification explaining EXACTLY where in the drawing you found this information
-    3. Description of any visual elements that led to this determination
+    FOCUSED REGION ANALYSIS TASK:
+    
+    These are regions cropped from a {component_type} drawing. Each crop is preceded by the parameters to look for in it.
+    
+    INSTRUCTIONS:
+    1. DIMENSIONS: Read dimension lines and callouts with their units (Ø = diameter, R = radius, ± = tolerance).
+    2. TABLES AND TITLE BLOCKS: Read the value in the cell or field labelled with the parameter or a synonym of it.
+    3. VISUAL INFERENCE: For cylinder action count the ports (one port = single acting, two ports = double acting);
+       for mounting type observe how the component connects; for materials note hatching patterns or material symbols.
+    
+    For each parameter, respond in this format:
+    PARAMETER NAME: value with proper units
+    JUSTIFICATION: exactly where in the crop you found this information
     """
-    base64_image_data_url = f"data:image/png;base64,{base64_image}"
-
     
     # Make the API call
     payload = {
@@ -3640,28 +3505,17 @@ def perform_second_extraction_pass(image_bytes, initial_results, component_type=
                     {
                         "type": "text",
                         "text": user_content
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url":  base64_image_data_url
-                        }
                     }
-                ]
+                ] + region_content
             }
         ],
         "max_tokens": 4000,
         "temperature": 0.1
     }
 
-    headers = {
-        "Authorization": f"Bearer {st.session_state.current_api_key}",
-        "Content-Type": "application/json"
-    }
-
     try:
         # Make the API call
-        response = requests.post(API_URL, headers=headers, json=payload)
+        response = llm_transport.post_chat_completion(API_URL, payload, get_llm_cache_context(component_type))
         result = process_api_response(response)
         
         if "❌" not in result:
@@ -3930,95 +3784,8 @@ def process_raw_results(raw_results, drawing_id, file_name, image_bytes):
             formatted_params = []
             engineering_analysis = None
             
-            # Group parameters into categories
-            categories = {
-                "PRIMARY PHYSICAL DIMENSIONS": [],
-                "MECHANICAL PROPERTIES": [],
-                "MANUFACTURING FEATURES": [],
-                "APPLICATION CONTEXT": [],
-                "IDENTIFICATION": [],
-                "OTHER": []
-            }
-            
-            # Define which parameters go into which category
-            category_mapping = {
-                # Physical dimensions
-                "BORE DIAMETER": "PRIMARY PHYSICAL DIMENSIONS",
-                "ROD DIAMETER": "PRIMARY PHYSICAL DIMENSIONS",
-                "STROKE LENGTH": "PRIMARY PHYSICAL DIMENSIONS",
-                "CLOSED LENGTH": "PRIMARY PHYSICAL DIMENSIONS",
-                "OPEN LENGTH": "PRIMARY PHYSICAL DIMENSIONS",
-                "OUTSIDE DIAMETER": "PRIMARY PHYSICAL DIMENSIONS",
-                "DIMENSIONS": "PRIMARY PHYSICAL DIMENSIONS",
-                "WEIGHT": "PRIMARY PHYSICAL DIMENSIONS",
-                "SIZE/DIMENSION": "PRIMARY PHYSICAL DIMENSIONS",
-                "SHAFT DIAMETER": "PRIMARY PHYSICAL DIMENSIONS",
-                "VALVE SIZE/PORT SIZE": "PRIMARY PHYSICAL DIMENSIONS",
-                "PORT SIZE": "PRIMARY PHYSICAL DIMENSIONS",
-                
-                # Mechanical properties
-                "OPERATING PRESSURE": "MECHANICAL PROPERTIES",
-                "TEST PRESSURE": "MECHANICAL PROPERTIES",
-                "OPERATING TEMPERATURE": "MECHANICAL PROPERTIES",
-                "RATED LOAD/CAPACITY": "MECHANICAL PROPERTIES",
-                "LOAD CAPACITY": "MECHANICAL PROPERTIES",
-                "PRESSURE RATING": "MECHANICAL PROPERTIES",
-                "FLOW CAPACITY": "MECHANICAL PROPERTIES",
-                "INPUT POWER": "MECHANICAL PROPERTIES",
-                "GEAR RATIO": "MECHANICAL PROPERTIES",
-                "EFFICIENCY": "MECHANICAL PROPERTIES",
-                "PROPERTY/STRENGTH CLASS": "MECHANICAL PROPERTIES",
-                "LOAD RATING": "MECHANICAL PROPERTIES",
-                "SPEED RATING": "MECHANICAL PROPERTIES",
-                
-                # Manufacturing features
-                "BODY MATERIAL": "MANUFACTURING FEATURES",
-                "ROD MATERIAL": "MANUFACTURING FEATURES",
-                "MATERIAL": "MANUFACTURING FEATURES",
-                "SURFACE FINISH": "MANUFACTURING FEATURES",
-                "COATING/PLATING": "MANUFACTURING FEATURES",
-                "SEAL TYPE": "MANUFACTURING FEATURES",
-                "THREAD TYPE": "MANUFACTURING FEATURES",
-                "THREAD PITCH": "MANUFACTURING FEATURES",
-                "HOUSING MATERIAL": "MANUFACTURING FEATURES",
-                "SEALING TYPE": "MANUFACTURING FEATURES",
-                "SEAT/SEAL MATERIAL": "MANUFACTURING FEATURES",
-                
-                # Application context
-                "CYLINDER ACTION": "APPLICATION CONTEXT",
-                "MOUNTING TYPE": "APPLICATION CONTEXT",
-                "ROD END TYPE": "APPLICATION CONTEXT",
-                "FLUID TYPE": "APPLICATION CONTEXT",
-                "STANDARD COMPLIANCE": "APPLICATION CONTEXT",
-                "PORT TYPE": "APPLICATION CONTEXT",
-                "PORT LOCATION": "APPLICATION CONTEXT",
-                "CUSHIONING": "APPLICATION CONTEXT",
-                "VALVE TYPE": "APPLICATION CONTEXT",
-                "FLOW DIRECTION": "APPLICATION CONTEXT",
-                "OPERATING MEDIUM": "APPLICATION CONTEXT",
-                "CONNECTION TYPE": "APPLICATION CONTEXT",
-                "ACTUATION TYPE": "APPLICATION CONTEXT",
-                "OPERATION PATTERN": "APPLICATION CONTEXT",
-                "SPECIAL FEATURES": "APPLICATION CONTEXT",
-                "GEAR TYPE": "APPLICATION CONTEXT",
-                "MOUNTING ARRANGEMENT": "APPLICATION CONTEXT",
-                "SHAFT ORIENTATION": "APPLICATION CONTEXT",
-                "COOLING ARRANGEMENT": "APPLICATION CONTEXT",
-                "LUBRICATION SYSTEM": "APPLICATION CONTEXT",
-                "TORQUE SPECIFICATION": "APPLICATION CONTEXT",
-                "ACTIVATION TYPE": "APPLICATION CONTEXT",
-                "BEARING TYPE": "APPLICATION CONTEXT",
-                "LUBRICATION TYPE": "APPLICATION CONTEXT",
-                
-                # Identification
-                "MANUFACTURER/MAKE": "IDENTIFICATION",
-                "MODEL/PART NUMBER": "IDENTIFICATION",
-                "DRAWING NUMBER": "IDENTIFICATION",
-                "MANUFACTURER": "IDENTIFICATION",
-                "MANUFACTURER/BRAND": "IDENTIFICATION",
-                "MODEL NUMBER": "IDENTIFICATION",
-                "PART NUMBER": "IDENTIFICATION"
-            }
+            # Group parameters into categories (see param_aliases.py)
+            categories = {category: [] for category in param_aliases.CATEGORIES}
             
             # Sort parameters into categories
             for key, value in raw_results.items():
@@ -4034,7 +3801,7 @@ def process_raw_results(raw_results, drawing_id, file_name, image_bytes):
                     continue
                 
                 # Determine category
-                category = category_mapping.get(key, "OTHER")
+                category = param_aliases.category(key)
                 
                 # Add to appropriate category
                 justification = raw_results.get(f"{key}_JUSTIFICATION", "")
@@ -4070,7 +3837,7 @@ def process_raw_results(raw_results, drawing_id, file_name, image_bytes):
                 "drawing_no": drawing_no,
                 "formatted_params": "\n".join(formatted_params),
                 "raw_params": raw_results,
-                "image_bytes": image_bytes,
+                "image_key": image_store.put(image_bytes) if image_bytes else None,
                 "confidence_score": confidence_score,
                 "extraction_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
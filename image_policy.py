@@ -0,0 +1,103 @@
+"""
+Per-stage resolution policy for images sent to the model.
+
+Each pipeline stage gets its own long-edge cap, JPEG quality and byte
+budget: a small thumbnail is enough for triage, extraction gets a capped
+long edge, and full resolution is reserved for stages that need it.
+Overrides can be given as JSON in the IMAGE_POLICY environment variable,
+e.g. IMAGE_POLICY='{"extraction": {"max_edge": 2560}}'.
+"""
+import io
+import json
+import os
+
+from PIL import Image
+
+import metrics
+
+# max_edge of None keeps the native resolution
+DEFAULT_POLICIES = {
+    "triage": {"max_edge": 1024, "quality": 80, "max_bytes": 250 * 1024},
+    "orientation": {"max_edge": 768, "quality": 75, "max_bytes": 150 * 1024},
+    "identify": {"max_edge": 1024, "quality": 80, "max_bytes": 250 * 1024},
+    "extraction": {"max_edge": 2048, "quality": 88, "max_bytes": 1536 * 1024},
+    "second_pass": {"max_edge": 2048, "quality": 88, "max_bytes": 1536 * 1024},
+    # Layout context for vector PDF pages whose text comes from the text layer
+    "text_assist": {"max_edge": 1024, "quality": 75, "max_bytes": 200 * 1024},
+    # Region crops are already small; keep their native detail
+    "region_crop": {"max_edge": 1536, "quality": 88, "max_bytes": 600 * 1024},
+    # Tiles of large-format sheets are cut near the API's native tile size
+    "tile": {"max_edge": 2048, "quality": 88, "max_bytes": 1536 * 1024},
+    "full": {"max_edge": None, "quality": 90, "max_bytes": 15 * 1024 * 1024},
+}
+
+# Lowest JPEG quality tried before the image is scaled down further
+MIN_QUALITY = 55
+
+
+def _load_policies():
+    policies = {stage: dict(policy) for stage, policy in DEFAULT_POLICIES.items()}
+    overrides = os.environ.get("IMAGE_POLICY")
+    if overrides:
+        try:
+            for stage, policy in json.loads(overrides).items():
+                policies.setdefault(stage, dict(DEFAULT_POLICIES["extraction"])).update(policy)
+        except (ValueError, AttributeError) as e:
+            print(f"Ignoring invalid IMAGE_POLICY override: {str(e)}")
+    return policies
+
+
+POLICIES = _load_policies()
+
+
+def get_policy(stage):
+    """Return the resolution policy for a stage (extraction policy for unknown stages)"""
+    return POLICIES.get(stage, POLICIES["extraction"])
+
+
+def _encode_jpeg(image, quality):
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='JPEG', quality=quality)
+    return img_byte_arr.getvalue()
+
+
+def prepare_image(image_bytes, stage):
+    """
+    Fit an encoded image to the policy of a pipeline stage.
+
+    The original bytes are passed through untouched when they are already a
+    JPEG within the size cap and byte budget. Otherwise the image is scaled
+    to the long-edge cap and re-encoded, lowering quality and then size
+    until it fits the budget. Bytes sent are recorded per stage in metrics.
+    """
+    policy = get_policy(stage)
+    max_edge = policy.get("max_edge")
+    max_bytes = policy.get("max_bytes")
+
+    image = Image.open(io.BytesIO(image_bytes))
+    fits_edge = not max_edge or max(image.size) <= max_edge
+    fits_budget = not max_bytes or len(image_bytes) <= max_bytes
+
+    if fits_edge and fits_budget and image.format == 'JPEG':
+        output = image_bytes
+    else:
+        if max_edge and image.format == 'JPEG':
+            # Let the JPEG decoder downscale by a power of two while decoding
+            image.draft('RGB', (max_edge, max_edge))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        quality = policy.get("quality", 85)
+        output = _encode_jpeg(image, quality)
+        while max_bytes and len(output) > max_bytes:
+            if quality > MIN_QUALITY:
+                quality = max(MIN_QUALITY, quality - 10)
+            else:
+                image = image.resize((max(1, int(image.width * 0.8)), max(1, int(image.height * 0.8))), Image.LANCZOS)
+            output = _encode_jpeg(image, quality)
+
+    metrics.incr(f"image_requests_{stage}")
+    metrics.incr(f"image_bytes_{stage}", len(output))
+    return output
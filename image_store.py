@@ -0,0 +1,142 @@
+"""
+Content-addressed on-disk store for page images.
+
+Session state used to hold every processed page's full JPEG, once per
+connected user. Pages are now written once to a local directory, named by
+the SHA-256 of their bytes, and sessions keep only the key. Reads
+memory-map the file, and a process-wide LRU bounded by total bytes keeps
+recently viewed pages in RAM. The directory is bounded by size too: the
+least recently used files are removed first, and a missing key reads as
+None (the page shows as "Image not available").
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+STORE_DIR = os.environ.get(
+    "IMAGE_STORE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "cad_extractor", "images")
+)
+STORE_MAX_BYTES = int(os.environ.get("IMAGE_STORE_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+MEMORY_MAX_BYTES = int(os.environ.get("IMAGE_STORE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+# Disk usage is re-checked after this many new files
+EVICT_EVERY = 50
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_lock = threading.Lock()
+_puts_since_evict = 0
+
+
+def _path(key):
+    return os.path.join(STORE_DIR, key[:2], f"{key}.img")
+
+
+def _remember(key, data):
+    """Add data to the in-memory LRU, evicting the least recently used entries over the byte bound"""
+    global _memory_bytes
+    if len(data) > MEMORY_MAX_BYTES:
+        return
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return
+        _memory[key] = data
+        _memory_bytes += len(data)
+        while _memory_bytes > MEMORY_MAX_BYTES:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+
+
+def put(image_bytes):
+    """
+    Store image bytes and return their key.
+    Storing the same bytes again only refreshes the file's access time.
+    """
+    global _puts_since_evict
+    key = hashlib.sha256(image_bytes).hexdigest()
+    path = _path(key)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial image
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(image_bytes)
+        os.replace(temp_path, path)
+        metrics.incr("image_store_writes")
+        metrics.incr("image_store_bytes_written", len(image_bytes))
+        with _lock:
+            _puts_since_evict += 1
+            evict = _puts_since_evict >= EVICT_EVERY
+            if evict:
+                _puts_since_evict = 0
+        if evict:
+            _evict_disk()
+    _remember(key, bytes(image_bytes))
+    return key
+
+
+def get(key):
+    """Return the image bytes stored under key, or None when the key is unknown or was evicted"""
+    if not key:
+        return None
+    with _lock:
+        data = _memory.get(key)
+        if data is not None:
+            _memory.move_to_end(key)
+    if data is not None:
+        metrics.incr("image_store_memory_hits")
+        return data
+
+    path = _path(key)
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                data = mapped[:]
+        # Mark as recently used for disk eviction
+        os.utime(path)
+    except (OSError, ValueError):
+        # ValueError: empty file, which mmap cannot map
+        metrics.incr("image_store_misses")
+        return None
+    metrics.incr("image_store_disk_reads")
+    _remember(key, data)
+    return data
+
+
+def _evict_disk():
+    """Remove the least recently used files until the store fits STORE_MAX_BYTES"""
+    files = []
+    total = 0
+    for root, _, names in os.walk(STORE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith(".tmp") and time.time() - stat.st_mtime < 3600:
+                # Probably being written right now
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    evicted = 0
+    for _, size, path in sorted(files):
+        if total <= STORE_MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        evicted += 1
+    if evicted:
+        metrics.incr("image_store_evictions", evicted)
@@ -0,0 +1,68 @@
+"""
+Lossless quarter-turn rotation of JPEG page images.
+
+jpegtran rotates a JPEG by rearranging its DCT blocks, so no decode or
+re-encode happens and fine dimension text keeps its original quality. A
+partial block row or column at the edge (at most 15 pixels of page
+border) is trimmed, as a lossless transform requires. Other formats, or
+hosts without jpegtran, fall back to a pixel transpose and a single
+re-encode in the source format.
+"""
+import io
+import os
+import shutil
+import subprocess
+
+from PIL import Image
+
+import metrics
+
+# Path of the jpegtran binary (libjpeg-turbo-progs / libjpeg-progs); found on PATH when unset
+JPEGTRAN_CMD = os.environ.get("JPEGTRAN_CMD") or shutil.which("jpegtran")
+JPEG_QUALITY = 90
+
+# Clockwise degrees for each rotation decision
+DEGREES = {"ROTATE_0": 0, "ROTATE_90": 90, "ROTATE_180": 180, "ROTATE_270": 270}
+# PIL transposes turning an image clockwise by the given degrees
+TRANSPOSE = {90: Image.ROTATE_270, 180: Image.ROTATE_180, 270: Image.ROTATE_90}
+
+
+def _jpegtran(image_bytes, degrees):
+    result = subprocess.run(
+        [JPEGTRAN_CMD, "-rotate", str(degrees), "-trim", "-copy", "none"],
+        input=image_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or "jpegtran failed")
+    return result.stdout
+
+
+def rotate(image_bytes, rotation):
+    """
+    Turn an encoded image clockwise according to a ROTATE_0/90/180/270 decision.
+
+    Returns:
+        The rotated image bytes (the input itself for ROTATE_0 or unknown values)
+    """
+    degrees = DEGREES.get(rotation, 0)
+    if not degrees:
+        return image_bytes
+
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.format == 'JPEG' and JPEGTRAN_CMD:
+        try:
+            rotated = _jpegtran(image_bytes, degrees)
+            metrics.incr("rotations_lossless")
+            return rotated
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            print(f"Lossless JPEG rotation failed, re-encoding instead: {str(e)}")
+
+    # transpose() moves pixels exactly; only the encode below is lossy (for JPEG)
+    rotated_image = image.transpose(TRANSPOSE[degrees])
+    img_byte_arr = io.BytesIO()
+    if image.format == 'JPEG':
+        rotated_image.save(img_byte_arr, format='JPEG', quality=JPEG_QUALITY)
+    else:
+        rotated_image.save(img_byte_arr, format=image.format or 'PNG')
+    metrics.incr("rotations_reencoded")
+    return img_byte_arr.getvalue()
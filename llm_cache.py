@@ -0,0 +1,139 @@
+"""
+Content-addressed on-disk cache for LLM responses.
+
+Responses are stored in SQLite keyed by a SHA-256 over the full request
+payload (which embeds the base64 image bytes, prompt text, model and
+temperature) plus the extraction settings that shape the prompt, such as
+the parameter mode and custom parameter list. The cache is bounded by
+total size with least-recently-used eviction and an optional TTL.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "cad_extractor", "llm_cache.sqlite3")
+)
+CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Time-to-live in seconds; 0 keeps entries until they are evicted by size
+CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "0"))
+
+_connection = None
+_lock = threading.Lock()
+
+
+def _get_connection():
+    """Open (once) the shared SQLite connection and create the schema"""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        connection = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " body BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        connection.commit()
+        _connection = connection
+    return _connection
+
+
+def make_key(payload, context=None):
+    """
+    Build the cache key for a request.
+
+    Args:
+        payload: The chat completion payload as sent to the API
+        context: Optional dict of settings that influence the answer but are
+            not part of the payload (parameter mode, custom parameter list)
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    if context:
+        digest.update(b"\0")
+        digest.update(json.dumps(context, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get(key):
+    """Return the cached response body for key, or None on a miss"""
+    if not CACHE_ENABLED:
+        return None
+    now = time.time()
+    try:
+        with _lock:
+            connection = _get_connection()
+            row = connection.execute("SELECT body, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and CACHE_TTL and now - row[1] > CACHE_TTL:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                connection.commit()
+                metrics.incr("llm_cache_expired")
+                row = None
+            if row is not None:
+                connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                connection.commit()
+    except sqlite3.Error as e:
+        print(f"LLM cache read failed: {str(e)}")
+        return None
+
+    if row is None:
+        metrics.incr("llm_cache_misses")
+        return None
+    metrics.incr("llm_cache_hits")
+    return bytes(row[0])
+
+
+def put(key, body):
+    """Store a response body and evict least-recently-used entries over the size bound"""
+    if not CACHE_ENABLED:
+        return
+    now = time.time()
+    try:
+        with _lock:
+            connection = _get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(body), len(body), now, now)
+            )
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            evicted = 0
+            while total > CACHE_MAX_BYTES:
+                oldest = connection.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 1"
+                ).fetchone()
+                if oldest is None or oldest[0] == key:
+                    break
+                connection.execute("DELETE FROM responses WHERE key = ?", (oldest[0],))
+                total -= oldest[1]
+                evicted += 1
+            connection.commit()
+    except sqlite3.Error as e:
+        print(f"LLM cache write failed: {str(e)}")
+        return
+
+    metrics.incr("llm_cache_stores")
+    if evicted:
+        metrics.incr("llm_cache_evictions", evicted)
+
+
+def clear():
+    """Remove every cached response"""
+    with _lock:
+        connection = _get_connection()
+        connection.execute("DELETE FROM responses")
+        connection.commit()
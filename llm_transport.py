@@ -0,0 +1,204 @@
+"""
+Shared HTTP transport for every GPT-4o call.
+
+All model requests go through one pooled requests.Session so pages reuse
+keep-alive connections instead of paying a fresh TLS handshake per call,
+and every request carries connect/read timeouts so a hung socket cannot
+stall the whole Streamlit run.
+"""
+import json
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import llm_cache
+import metrics
+import rate_limiter
+
+# Pool and timeout settings - override through environment variables
+POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "180"))
+WARMUP_CONNECTIONS = int(os.environ.get("LLM_WARMUP_CONNECTIONS", "2"))
+
+_session = None
+_session_lock = threading.Lock()
+_warmed_hosts = set()
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def post(url, headers=None, json=None, timeout=None, stream=False):
+    """POST through the pooled session with connect and read timeouts applied"""
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    return get_session().post(url, headers=headers, json=json, timeout=timeout, stream=stream)
+
+
+def _json_response(url, body):
+    """Wrap a JSON body in a requests.Response"""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.url = url
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+def _cached_response(url, body):
+    """Wrap a cached body in a requests.Response so callers handle hits and misses alike"""
+    response = _json_response(url, body)
+    response.headers["X-Cache"] = "HIT"
+    return response
+
+
+def _auth_headers(api_key):
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+def configure_api_keys(api_keys):
+    """Set the pool of API keys the request scheduler rotates through"""
+    rate_limiter.configure(api_keys)
+
+
+def post_chat_completion(url, payload, cache_context=None):
+    """
+    Send a chat completion request, answering from the response cache when possible.
+    Misses are queued through the rate-limit scheduler, which picks the API key.
+    Only successful completions are stored, so errors are always retried.
+    """
+    key = llm_cache.make_key(payload, cache_context)
+    body = llm_cache.get(key)
+    if body is not None:
+        return _cached_response(url, body)
+
+    def send(api_key):
+        metrics.incr("llm_requests_sent")
+        return post(url, headers=_auth_headers(api_key), json=payload)
+
+    response = rate_limiter.get_scheduler().submit(payload, send)
+    if response.status_code == 200:
+        llm_cache.put(key, response.content)
+    return response
+
+
+def _message_content(body):
+    try:
+        return json.loads(body)["choices"][0]["message"]["content"] or ""
+    except (ValueError, KeyError, IndexError, TypeError):
+        return ""
+
+
+def stream_chat_completion(url, payload, on_text, cache_context=None):
+    """
+    Send a chat completion request with stream=True, calling on_text(delta) for
+    every piece of content as it arrives.
+
+    The streamed deltas are assembled into a regular (non-streamed) completion
+    body, so the return value is a response the caller handles exactly like
+    one from post_chat_completion, and the cache is shared with it. Cache hits
+    deliver the whole content in a single on_text call.
+    """
+    key = llm_cache.make_key(payload, cache_context)
+    body = llm_cache.get(key)
+    if body is not None:
+        content = _message_content(body)
+        if content:
+            on_text(content)
+        return _cached_response(url, body)
+
+    stream_payload = dict(payload, stream=True, stream_options={"include_usage": True})
+    scheduler = rate_limiter.get_scheduler()
+    sent_with = {}
+
+    def send(api_key):
+        sent_with["api_key"] = api_key
+        metrics.incr("llm_requests_sent")
+        metrics.incr("llm_requests_streamed")
+        return post(url, headers=_auth_headers(api_key), json=stream_payload, stream=True)
+
+    response = scheduler.submit(stream_payload, send)
+    if response.status_code != 200:
+        return response
+
+    parts = []
+    usage = None
+    finish_reason = None
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            # Server-sent events: "data: {chunk}" lines, terminated by "data: [DONE]"
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            usage = chunk.get("usage") or usage
+            for choice in chunk.get("choices", []):
+                finish_reason = choice.get("finish_reason") or finish_reason
+                text = (choice.get("delta") or {}).get("content")
+                if text:
+                    parts.append(text)
+                    on_text(text)
+    finally:
+        response.close()
+
+    if usage and usage.get("total_tokens") is not None:
+        estimated_tokens = rate_limiter.estimate_tokens(stream_payload)
+        scheduler.refund(sent_with["api_key"], estimated_tokens - usage["total_tokens"])
+
+    body = json.dumps({
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(parts)},
+            "finish_reason": finish_reason
+        }],
+        "usage": usage
+    }).encode("utf-8")
+    # A stream cut off before its final chunk is returned but never cached
+    if finish_reason:
+        llm_cache.put(key, body)
+    return _json_response(url, body)
+
+
+def _open_connection(url):
+    """Issue a cheap HEAD request so the TLS connection lands in the pool"""
+    try:
+        get_session().head(url, timeout=(CONNECT_TIMEOUT, CONNECT_TIMEOUT))
+    except Exception as e:
+        print(f"Connection warm-up failed for {url}: {str(e)}")
+
+
+def warm_up(url, connections=None):
+    """
+    Pre-open pooled connections to the API host in the background.
+    Streamlit re-executes the app script on every interaction, so this only
+    does work the first time it is called for a given host in the process.
+    """
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host in _warmed_hosts:
+            return
+        _warmed_hosts.add(host)
+
+    connections = min(connections or WARMUP_CONNECTIONS, POOL_SIZE)
+    for _ in range(max(1, connections)):
+        threading.Thread(target=_open_connection, args=(url,), daemon=True).start()
@@ -0,0 +1,29 @@
+"""
+Process-wide pipeline counters (cache hits, request bytes, ...).
+
+Counters are shared by every Streamlit session in the process and are
+shown in the sidebar so the pipeline can be tuned from real usage.
+"""
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    """Add amount to the named counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot():
+    """Return a copy of all counters, sorted by name"""
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset():
+    """Clear all counters"""
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,294 @@
+"""
+Local OpenAI-compatible stand-in for the chat completions endpoint.
+
+Replays recorded responses so the pipeline can be exercised and benchmarked
+offline. Requests are matched on a fingerprint of the model, response
+format, prompt text and a hash of every image. Responses are delayed by a
+configurable latency distribution, rate limits can be injected as 429s, and
+stream=True requests are answered with server-sent events.
+
+Recording: start with --upstream https://api.openai.com/v1/chat/completions
+and point the app at the server; misses are forwarded (with the caller's
+Authorization header) and saved to the recordings directory.
+
+Usage:
+    python mock_openai_server.py --port 8089 --latency lognormal:0.8,0.4 --rate-429 0.05
+    LLM_API_URL=http://127.0.0.1:8089/v1/chat/completions streamlit run cad_final.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_recordings")
+
+
+def request_fingerprint(payload):
+    """Hash of the parts of a request that decide its answer: model, format, prompt text and images"""
+    digest = hashlib.sha256()
+    digest.update(str(payload.get("model", "")).encode("utf-8"))
+    digest.update(json.dumps(payload.get("response_format"), sort_keys=True).encode("utf-8"))
+    for message in payload.get("messages", []):
+        digest.update(b"\0" + str(message.get("role", "")).encode("utf-8"))
+        content = message.get("content", "")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        for part in content:
+            if part.get("type") == "text":
+                digest.update(b"\1" + part.get("text", "").encode("utf-8"))
+            elif part.get("type") == "image_url":
+                url = part.get("image_url", {}).get("url", "")
+                digest.update(b"\2" + hashlib.sha256(url.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def parse_latency(spec):
+    """
+    Build a latency sampler from a spec string:
+    fixed:S, uniform:LOW,HIGH, normal:MEAN,STD or lognormal:MEDIAN,SIGMA (seconds).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        # Parameters are the median in seconds and the log-space sigma
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockState:
+    """Settings, recordings and counters shared by all request handler threads"""
+
+    def __init__(self, args):
+        self.recordings_dir = args.recordings
+        self.upstream = args.upstream
+        self.latency = parse_latency(args.latency)
+        self.token_delay = args.token_delay
+        self.rate_429 = args.rate_429
+        self.rpm = args.rpm
+        self.retry_after = args.retry_after
+        self.default_response = None
+        if args.default_response:
+            with open(args.default_response, "rb") as f:
+                self.default_response = f.read()
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.request_times = deque()
+        self.counters = {"requests": 0, "replayed": 0, "recorded": 0, "missing": 0, "rate_limited": 0, "streamed": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def sample_latency(self):
+        with self.lock:
+            return self.latency(self.rng)
+
+    def check_rate_limit(self):
+        """Return (limited, remaining) for a new request under injection and the RPM window"""
+        now = time.monotonic()
+        with self.lock:
+            if self.rate_429 and self.rng.random() < self.rate_429:
+                return True, 0
+            if self.rpm:
+                while self.request_times and now - self.request_times[0] > 60:
+                    self.request_times.popleft()
+                if len(self.request_times) >= self.rpm:
+                    return True, 0
+                self.request_times.append(now)
+                return False, self.rpm - len(self.request_times)
+            return False, None
+
+    def recording_path(self, fingerprint):
+        return os.path.join(self.recordings_dir, f"{fingerprint}.json")
+
+    def load(self, fingerprint):
+        try:
+            with open(self.recording_path(fingerprint), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, fingerprint, body):
+        os.makedirs(self.recordings_dir, exist_ok=True)
+        with open(self.recording_path(fingerprint), "wb") as f:
+            f.write(body)
+
+
+def _message_content(body):
+    try:
+        return json.loads(body)["choices"][0]["message"]["content"] or ""
+    except (ValueError, KeyError, IndexError, TypeError):
+        return ""
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_error(self, status, message, code, headers=None):
+            body = json.dumps({"error": {"message": message, "type": "invalid_request_error", "code": code}})
+            self._send_json(status, body.encode("utf-8"), headers)
+
+        def do_HEAD(self):
+            # Connection warm-up requests
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            state.count("requests")
+
+            limited, remaining = state.check_rate_limit()
+            if limited:
+                state.count("rate_limited")
+                self._send_error(429, "Rate limit reached (injected by mock server)", "rate_limit_exceeded",
+                                 {"retry-after": str(state.retry_after), "x-ratelimit-remaining-requests": "0"})
+                return
+
+            fingerprint = request_fingerprint(payload)
+            body = state.load(fingerprint)
+            if body is not None:
+                state.count("replayed")
+            elif state.upstream:
+                status, body = self._forward(payload)
+                if status != 200:
+                    self._send_json(status, body)
+                    return
+                state.save(fingerprint, body)
+                state.count("recorded")
+            elif state.default_response is not None:
+                state.count("missing")
+                body = state.default_response
+            else:
+                state.count("missing")
+                self._send_error(404, f"No recorded response for request {fingerprint}", "recording_not_found")
+                return
+
+            headers = {"x-mock-fingerprint": fingerprint}
+            if remaining is not None:
+                headers["x-ratelimit-limit-requests"] = str(state.rpm)
+                headers["x-ratelimit-remaining-requests"] = str(remaining)
+                headers["x-ratelimit-reset-requests"] = "60s"
+
+            time.sleep(state.sample_latency())
+            if payload.get("stream"):
+                state.count("streamed")
+                self._stream(body, headers)
+            else:
+                self._send_json(200, body, headers)
+
+        def _forward(self, payload):
+            """Send the request (non-streamed) to the upstream API and return (status, body)"""
+            upstream_payload = {k: v for k, v in payload.items() if k not in ("stream", "stream_options")}
+            request = urllib.request.Request(
+                state.upstream,
+                data=json.dumps(upstream_payload).encode("utf-8"),
+                headers={"Content-Type": "application/json", "Authorization": self.headers.get("Authorization", "")},
+                method="POST"
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=300) as response:
+                    return response.status, response.read()
+            except urllib.error.HTTPError as e:
+                return e.code, e.read()
+
+        def _stream(self, body, headers):
+            """Replay a completion as server-sent events, a few characters per chunk"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            content = _message_content(body)
+            try:
+                usage = json.loads(body).get("usage")
+            except ValueError:
+                usage = None
+            # Roughly one token per four characters
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+            events = [{"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]} for piece in pieces]
+            events.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            events.append({"choices": [], "usage": usage})
+            for event in events:
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                if state.token_delay:
+                    time.sleep(state.token_delay)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS_DIR, help="Directory of recorded responses")
+    parser.add_argument("--upstream", default=None, help="Forward and record misses to this endpoint")
+    parser.add_argument("--default-response", default=None, help="Completion body served for unrecorded requests")
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:LO,HI | normal:MEAN,STD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of answering with an injected 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and 429 injection")
+    return parser
+
+
+def start_server(args):
+    """Start the server on a background thread and return (server, state)"""
+    state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    server, state = start_server(args)
+    print(f"Mock OpenAI server on http://{args.host}:{server.server_port}/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(state.counters, indent=2))
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Local orientation detection with Tesseract, used when the model cannot decide.
+
+One orientation-and-script-detection (OSD) pass on a downscaled greyscale
+copy of the page answers the question in well under a second. Only when
+OSD is unsure or fails (too little text) are the four rotations scored
+with image_to_data, still on the small copy and in parallel: every
+pytesseract call runs its own tesseract process, so a thread per rotation
+keeps four processes busy at once. Results are cached per image hash.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# pytesseract is optional; without it every page is reported as ROTATE_0
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+# Path of the tesseract binary when it is not on PATH (e.g. a Windows install)
+TESSERACT_CMD = os.environ.get("TESSERACT_CMD", "")
+if TESSERACT_AVAILABLE and TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+# Long edge of the greyscale copy given to Tesseract
+OSD_MAX_EDGE = int(os.environ.get("OSD_MAX_EDGE", "2000"))
+# OSD orientation confidence below which the four-way scoring breaks the tie
+OSD_MIN_CONFIDENCE = float(os.environ.get("OSD_MIN_CONFIDENCE", "2.0"))
+CACHE_SIZE = 256
+
+ROTATIONS = {"ROTATE_0": 0, "ROTATE_90": 90, "ROTATE_180": 180, "ROTATE_270": 270}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=len(ROTATIONS), thread_name_prefix="osd")
+
+
+def _small_grey(image_bytes):
+    """Greyscale copy with the long edge capped at OSD_MAX_EDGE, decoded at reduced size where JPEG allows"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (OSD_MAX_EDGE, OSD_MAX_EDGE))
+    image = image.convert("L")
+    image.thumbnail((OSD_MAX_EDGE, OSD_MAX_EDGE))
+    return image
+
+
+def _osd_rotation(image):
+    """Return (ROTATE_*, confidence) from one OSD pass, or (None, 0) when OSD fails"""
+    try:
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        # Raised when the page has too few characters for OSD
+        print(f"Tesseract OSD failed: {str(e)}")
+        return None, 0.0
+    # 'rotate' is the clockwise rotation that makes the page upright
+    return f"ROTATE_{int(osd.get('rotate', 0)) % 360}", float(osd.get("orientation_conf", 0))
+
+
+def _text_score(image, degrees):
+    """Average word confidence times word count with the image turned clockwise by degrees"""
+    try:
+        rotated = image.rotate(-degrees, expand=True) if degrees else image
+        text_data = pytesseract.image_to_data(rotated, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        print(f"Error analyzing orientation ROTATE_{degrees}: {str(e)}")
+        return 0.0
+    conf_values = [float(conf) for conf in text_data['conf'] if str(conf) != '-1']
+    if not conf_values:
+        return 0.0
+    text_count = len([word for word in text_data['text'] if word.strip()])
+    return sum(conf_values) / len(conf_values) * text_count
+
+
+def _score_rotations(image):
+    """Tie-break: score all four rotations concurrently and return the best"""
+    futures = {rotation: _executor.submit(_text_score, image, degrees) for rotation, degrees in ROTATIONS.items()}
+    scores = {rotation: future.result() for rotation, future in futures.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else "ROTATE_0"
+
+
+def detect_rotation(image_bytes):
+    """
+    Decide which ROTATE_0/90/180/270 makes a page image upright.
+
+    Returns:
+        ROTATE_* (ROTATE_0 when Tesseract is unavailable or nothing can be read)
+    """
+    if not TESSERACT_AVAILABLE:
+        return "ROTATE_0"
+
+    key = hashlib.sha256(image_bytes).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    image = _small_grey(image_bytes)
+    rotation, confidence = _osd_rotation(image)
+    if rotation not in ROTATIONS or confidence < OSD_MIN_CONFIDENCE:
+        rotation = _score_rotations(image)
+
+    with _cache_lock:
+        _cache[key] = rotation
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return rotation
@@ -0,0 +1,113 @@
+"""
+Local page orientation from PDF signals.
+
+Working out which way up a page is used to cost a vision call per page.
+Vector PDFs already answer this: PyMuPDF reports the writing direction of
+every text line in get_text("dict"), in unrotated page coordinates, and
+page.rotation says how the page is turned for display. Mapping each line
+direction through the page rotation gives the direction the text runs in
+the rendered image, and the direction carrying most of the characters
+tells which ROTATE_* the image needs. The model is only asked when there
+is too little text, or no direction clearly dominates (drawings often
+have vertical dimension text alongside the horizontal notes).
+"""
+import os
+
+import metrics
+
+# Minimum characters of straight text before the text direction is trusted
+MIN_DIRECTION_CHARS = int(os.environ.get("ORIENTATION_MIN_CHARS", "40"))
+# Share of those characters the dominant direction must carry
+MIN_DIRECTION_SHARE = float(os.environ.get("ORIENTATION_MIN_SHARE", "0.7"))
+# Lines further than this (as a sine) from one of the four axes are ignored
+AXIS_TOLERANCE = 0.35
+
+# Rotation that turns text running in this (dx, dy) image direction into left-to-right text.
+# Image y points down, so (0, -1) is text reading bottom to top.
+ROTATION_FOR_DIRECTION = {
+    (1, 0): "ROTATE_0",
+    (0, -1): "ROTATE_90",
+    (-1, 0): "ROTATE_180",
+    (0, 1): "ROTATE_270",
+}
+
+
+def page_signals(page):
+    """
+    Collect the orientation signals of a PyMuPDF page.
+
+    Returns:
+        Dict with page_rotation (the page's /Rotate in degrees) and
+        direction_chars {ROTATE_*: characters of text running that way in
+        the rendered page}
+    """
+    matrix = page.rotation_matrix
+    direction_chars = {}
+    # flags=0: text only, no image blocks
+    for block in page.get_text("dict", flags=0).get("blocks", []):
+        for line in block.get("lines", []):
+            chars = sum(len(span.get("text", "").strip()) for span in line.get("spans", []))
+            if not chars:
+                continue
+            # Line direction in unrotated page space, turned like the rendered page
+            cos, sin = line.get("dir", (1, 0))
+            dx = cos * matrix.a + sin * matrix.c
+            dy = cos * matrix.b + sin * matrix.d
+            rotation = _rotation_for(dx, dy)
+            if rotation:
+                direction_chars[rotation] = direction_chars.get(rotation, 0) + chars
+    return {"page_rotation": page.rotation, "direction_chars": direction_chars}
+
+
+def _rotation_for(dx, dy):
+    """ROTATE_* for a text direction close to one of the axes, None for slanted text"""
+    if abs(dy) <= AXIS_TOLERANCE:
+        return ROTATION_FOR_DIRECTION[(1 if dx > 0 else -1, 0)]
+    if abs(dx) <= AXIS_TOLERANCE:
+        return ROTATION_FOR_DIRECTION[(0, 1 if dy > 0 else -1)]
+    return None
+
+
+def decide(signals):
+    """
+    Decide the rotation a rendered page needs from its local signals, without
+    recording metrics (safe to call in the raster worker processes).
+
+    Returns:
+        ROTATE_0/90/180/270, or None when the signals are absent or ambiguous
+    """
+    if not signals:
+        return None
+
+    direction_chars = signals.get("direction_chars", {})
+    total = sum(direction_chars.values())
+    if total >= MIN_DIRECTION_CHARS:
+        rotation, chars = max(direction_chars.items(), key=lambda item: item[1])
+        if chars >= MIN_DIRECTION_SHARE * total:
+            return rotation
+    elif signals.get("page_rotation") and not total:
+        # No text at all, but the producer set an explicit display rotation:
+        # the page is already turned the way it was meant to be read
+        return "ROTATE_0"
+    return None
+
+
+def resolve(signals):
+    """
+    Decide the rotation a page image still needs, counting local decisions.
+
+    Args:
+        signals: A page_signals result, or None for pages without a PDF source
+
+    Returns:
+        ROTATE_0/90/180/270, or None when the signals are absent or ambiguous
+        and the model has to decide. Pages turned upright at render time
+        (signals['applied'], see pdf_raster) need ROTATE_0.
+    """
+    if signals and signals.get("applied"):
+        metrics.incr("orientation_resolved_locally")
+        return "ROTATE_0"
+
+    rotation = decide(signals)
+    metrics.incr("orientation_resolved_locally" if rotation else "orientation_model_needed")
+    return rotation
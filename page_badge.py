@@ -0,0 +1,89 @@
+"""
+Display-only "Page X/Y" badge for page images.
+
+Rasters sent to the model and kept in session state are the untouched
+page renders; the badge is drawn only when a page is shown in the detail
+view. The font is loaded once per process and badged images are kept in a
+small LRU, so Streamlit reruns do not redraw or re-encode the same page.
+"""
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_SIZE = 24
+CACHE_SIZE = 32
+# Page suffix built by unpack_page_data, e.g. "_page_3_of_12"
+SUFFIX_PATTERN = re.compile(r"_page_(\d+)_of_(\d+)$")
+
+_font = None
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_font():
+    """Return the badge font, loading it on first use"""
+    global _font
+    with _lock:
+        if _font is None:
+            try:
+                # Try to get a font, fallback to default if not available
+                _font = ImageFont.truetype("arial.ttf", FONT_SIZE)
+            except IOError:
+                _font = ImageFont.load_default()
+        return _font
+
+
+def badge_text(suffix):
+    """Return "Page X/Y" for a multi-page suffix, or "" when the suffix carries no page count"""
+    match = SUFFIX_PATTERN.search(suffix or "")
+    return f"Page {match.group(1)}/{match.group(2)}" if match else ""
+
+
+def draw_badge(image, page_text):
+    """Draw the page badge in the bottom right corner of a PIL image, in place"""
+    font = get_font()
+    draw = ImageDraw.Draw(image)
+    text_width = draw.textlength(page_text, font=font) if hasattr(draw, 'textlength') else 150
+
+    # Position in bottom right with padding
+    draw.rectangle(
+        [(image.width - text_width - 20, image.height - 40), (image.width - 5, image.height - 5)],
+        fill=(50, 50, 50)
+    )
+    draw.text(
+        (image.width - text_width - 10, image.height - 35),
+        page_text,
+        fill=(255, 255, 255),
+        font=font
+    )
+    return image
+
+
+def badged_image(image_bytes, page_text):
+    """
+    Return JPEG bytes of the page with its badge for display.
+    The stored image_bytes are left unchanged; pages without badge text are returned as they are.
+    """
+    if not page_text:
+        return image_bytes
+
+    key = (hashlib.sha256(image_bytes).hexdigest(), page_text)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    image = draw_badge(Image.open(io.BytesIO(image_bytes)).convert('RGB'), page_text)
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='JPEG', quality=90)
+    badged = img_byte_arr.getvalue()
+
+    with _lock:
+        _cache[key] = badged
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return badged
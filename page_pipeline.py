@@ -0,0 +1,155 @@
+"""
+Bounded concurrent executor for the per-page drawing pipeline.
+
+Pages of a multi-page upload are independent, so their LLM round-trips can
+overlap. Workers run on a small thread pool; completion callbacks are
+delivered on the calling (Streamlit script) thread so all session state
+and UI updates stay single-threaded. Workers can also report partial
+progress (e.g. streamed fields) with report_progress; updates are queued
+and handed to the calling thread in batches while pages are running.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+# Default number of pages analysed at the same time
+PAGE_CONCURRENCY = int(os.environ.get("PAGE_CONCURRENCY", "4"))
+MAX_PAGE_CONCURRENCY = 16
+# Seconds between deliveries of queued progress updates to the calling thread
+UPDATE_INTERVAL = 0.25
+
+# Page index and update queue of the page running on the current worker thread
+_current = threading.local()
+
+
+def _attach_script_context(ctx):
+    """Let worker threads read st.session_state of the session that started them"""
+    if ctx is not None and add_script_run_ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+
+def report_progress(update):
+    """Queue an update for the page being processed on this worker thread (no-op elsewhere)"""
+    updates = getattr(_current, "updates", None)
+    if updates is not None:
+        updates.put((_current.index, update))
+
+
+def _run_page(worker, page, idx, updates):
+    _current.index = idx
+    _current.updates = updates
+    try:
+        return worker(page)
+    finally:
+        _current.updates = None
+
+
+def _deliver_updates(updates, on_page_update):
+    """Hand queued updates to on_page_update, batched per page"""
+    batches = {}
+    while True:
+        try:
+            idx, update = updates.get_nowait()
+        except queue.Empty:
+            break
+        batches.setdefault(idx, []).append(update)
+    if on_page_update:
+        for idx, batch in batches.items():
+            on_page_update(idx, batch)
+
+
+def run_pages(pages, worker, max_workers=None, on_page_done=None, on_page_update=None, on_page_start=None):
+    """
+    Run worker(page) for every page with at most max_workers in flight.
+
+    Pages are pulled from the iterable only when a worker slot is free, so a
+    generator page source renders pages just ahead of the workers and peak
+    memory is bounded by the concurrency level rather than the page count.
+
+    Args:
+        pages: Iterable (list or generator) of page records
+        worker: Callable run on a pool thread for each page
+        max_workers: Concurrency limit (defaults to PAGE_CONCURRENCY)
+        on_page_done: Optional callback(index, page, result) invoked on the
+            calling thread as each page finishes, in completion order
+        on_page_update: Optional callback(index, updates) invoked on the
+            calling thread with the updates a page reported since the last
+            delivery, always before that page's on_page_done
+        on_page_start: Optional callback(index, page) invoked on the calling
+            thread when a page is taken from the source, in page order
+
+    Returns:
+        List of worker results in page order. A worker that raises yields
+        a "❌ Processing Error" string in its slot instead. When on_page_done
+        is given it consumes each result and the slot only holds True, so
+        finished pages (and their rasters) are not kept until the last page.
+    """
+    page_source = iter(pages)
+    max_workers = max(1, min(max_workers or PAGE_CONCURRENCY, MAX_PAGE_CONCURRENCY))
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    results = []
+    updates = queue.Queue()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page",
+                            initializer=_attach_script_context, initargs=(ctx,)) as executor:
+        futures = {}
+        exhausted = False
+        while True:
+            # Top up the free worker slots from the page source
+            while not exhausted and len(futures) < max_workers:
+                page = next(page_source, None)
+                if page is None:
+                    exhausted = True
+                    break
+                idx = len(results)
+                results.append(None)
+                if on_page_start:
+                    on_page_start(idx, page)
+                futures[executor.submit(_run_page, worker, page, idx, updates)] = (idx, page)
+            if not futures:
+                break
+
+            done, _ = wait(futures, timeout=UPDATE_INTERVAL, return_when=FIRST_COMPLETED)
+            _deliver_updates(updates, on_page_update)
+            for future in done:
+                idx, page = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = f"❌ Processing Error: {str(e)}"
+                if on_page_done:
+                    on_page_done(idx, page, result)
+                    result = True
+                results[idx] = result
+
+    return results
+
+
+def map_concurrent(func, items, max_workers):
+    """
+    Run func(item) for every item on a short-lived thread pool and return the
+    results in item order. Used for work inside one page (e.g. the tiles of a
+    large sheet); the threads carry the caller's script context. A call that
+    raises yields a "❌ Processing Error" string in its slot.
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    items = list(items)
+    if not items:
+        return []
+
+    def run(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return f"❌ Processing Error: {str(e)}"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix="tile",
+                            initializer=_attach_script_context, initargs=(ctx,)) as executor:
+        return list(executor.map(run, items))
@@ -0,0 +1,142 @@
+"""
+Alias index for parameter names.
+
+The model names one parameter in many ways: "BORE DIAMETER", "BORE_DIA",
+"Bore Dia.", "INSIDE DIAMETER"; "MANUFACTURER/MAKE", "BRAND". Every
+spelling listed in PARAMETERS is normalised once at import (case,
+underscores, hyphens, slashes, dots, abbreviations such as DIA and NO) into
+ALIAS_INDEX, which maps it to a canonical parameter id. canonical() and
+category() are then one normalisation plus one dict lookup, and every
+place that compares parameter names uses them.
+"""
+import re
+
+CATEGORIES = (
+    "PRIMARY PHYSICAL DIMENSIONS",
+    "MECHANICAL PROPERTIES",
+    "MANUFACTURING FEATURES",
+    "APPLICATION CONTEXT",
+    "IDENTIFICATION",
+    "OTHER",
+)
+
+# Canonical id -> (category, other spellings of the same parameter)
+PARAMETERS = {
+    # Physical dimensions
+    "BORE DIAMETER": ("PRIMARY PHYSICAL DIMENSIONS", ["BORE", "INSIDE DIAMETER", "INNER DIAMETER"]),
+    "ROD DIAMETER": ("PRIMARY PHYSICAL DIMENSIONS", ["SHAFT DIAMETER", "PISTON ROD DIAMETER"]),
+    "STROKE LENGTH": ("PRIMARY PHYSICAL DIMENSIONS", ["STROKE"]),
+    "CLOSED LENGTH": ("PRIMARY PHYSICAL DIMENSIONS", ["CLOSE LENGTH", "RETRACTED LENGTH"]),
+    "OPEN LENGTH": ("PRIMARY PHYSICAL DIMENSIONS", ["EXTENDED LENGTH"]),
+    "OUTSIDE DIAMETER": ("PRIMARY PHYSICAL DIMENSIONS", ["OUTER DIAMETER", "OD"]),
+    "DIMENSIONS": ("PRIMARY PHYSICAL DIMENSIONS", ["ITEM DIMENSIONS", "OVERALL DIMENSIONS", "PRODUCT DIMENSIONS"]),
+    "SIZE/DIMENSION": ("PRIMARY PHYSICAL DIMENSIONS", []),
+    "WEIGHT": ("PRIMARY PHYSICAL DIMENSIONS", ["ITEM WEIGHT", "UNIT WEIGHT", "PRODUCT WEIGHT"]),
+    "HEIGHT": ("PRIMARY PHYSICAL DIMENSIONS", ["ITEM HEIGHT", "TOTAL HEIGHT"]),
+    "LENGTH": ("PRIMARY PHYSICAL DIMENSIONS", ["ITEM LENGTH", "TOTAL LENGTH"]),
+    "WIDTH": ("PRIMARY PHYSICAL DIMENSIONS", ["ITEM WIDTH", "TOTAL WIDTH"]),
+    "CLOSED HEIGHT": ("PRIMARY PHYSICAL DIMENSIONS", ["MINIMUM HEIGHT", "MIN HEIGHT", "COLLAPSED HEIGHT"]),
+    "OPEN HEIGHT": ("PRIMARY PHYSICAL DIMENSIONS", ["MAXIMUM HEIGHT", "MAX HEIGHT", "EXTENDED HEIGHT"]),
+    "VALVE SIZE/PORT SIZE": ("PRIMARY PHYSICAL DIMENSIONS", ["VALVE SIZE"]),
+    "PORT SIZE": ("PRIMARY PHYSICAL DIMENSIONS", []),
+
+    # Mechanical properties
+    "OPERATING PRESSURE": ("MECHANICAL PROPERTIES", ["PRESSURE RATING", "WORKING PRESSURE", "MAX PRESSURE"]),
+    "TEST PRESSURE": ("MECHANICAL PROPERTIES", []),
+    "OPERATING TEMPERATURE": ("MECHANICAL PROPERTIES", ["TEMPERATURE RANGE", "WORKING TEMPERATURE"]),
+    "LOAD CAPACITY": ("MECHANICAL PROPERTIES", [
+        "RATED CAPACITY", "RATED CAPACITY/LOAD", "RATED LOAD/CAPACITY", "RATED LOAD", "CAPACITY", "MAX LOAD"
+    ]),
+    "FLOW CAPACITY": ("MECHANICAL PROPERTIES", ["FLOW RATE"]),
+    "INPUT POWER": ("MECHANICAL PROPERTIES", []),
+    "GEAR RATIO": ("MECHANICAL PROPERTIES", []),
+    "EFFICIENCY": ("MECHANICAL PROPERTIES", []),
+    "PROPERTY/STRENGTH CLASS": ("MECHANICAL PROPERTIES", ["STRENGTH CLASS", "PROPERTY CLASS"]),
+    "LOAD RATING": ("MECHANICAL PROPERTIES", []),
+    "SPEED RATING": ("MECHANICAL PROPERTIES", []),
+
+    # Manufacturing features
+    "MATERIAL": ("MANUFACTURING FEATURES", ["BODY MATERIAL", "CONSTRUCTION MATERIAL", "HOUSING MATERIAL"]),
+    "ROD MATERIAL": ("MANUFACTURING FEATURES", []),
+    "SURFACE FINISH": ("MANUFACTURING FEATURES", []),
+    "COATING/PLATING": ("MANUFACTURING FEATURES", ["COATING", "PLATING"]),
+    "SEAL TYPE": ("MANUFACTURING FEATURES", ["SEALING TYPE"]),
+    "THREAD TYPE": ("MANUFACTURING FEATURES", []),
+    "THREAD PITCH": ("MANUFACTURING FEATURES", []),
+    "SEAT/SEAL MATERIAL": ("MANUFACTURING FEATURES", ["SEAL MATERIAL", "SEAT MATERIAL"]),
+
+    # Application context
+    "CYLINDER ACTION": ("APPLICATION CONTEXT", []),
+    "MOUNTING TYPE": ("APPLICATION CONTEXT", ["MOUNTING"]),
+    "ROD END TYPE": ("APPLICATION CONTEXT", ["ROD END"]),
+    "FLUID TYPE": ("APPLICATION CONTEXT", []),
+    "STANDARD COMPLIANCE": ("APPLICATION CONTEXT", []),
+    "PORT TYPE": ("APPLICATION CONTEXT", []),
+    "PORT LOCATION": ("APPLICATION CONTEXT", []),
+    "CUSHIONING": ("APPLICATION CONTEXT", []),
+    "VALVE TYPE": ("APPLICATION CONTEXT", []),
+    "FLOW DIRECTION": ("APPLICATION CONTEXT", []),
+    "OPERATING MEDIUM": ("APPLICATION CONTEXT", []),
+    "CONNECTION TYPE": ("APPLICATION CONTEXT", []),
+    "ACTUATION TYPE": ("APPLICATION CONTEXT", []),
+    "OPERATION PATTERN": ("APPLICATION CONTEXT", []),
+    "SPECIAL FEATURES": ("APPLICATION CONTEXT", []),
+    "GEAR TYPE": ("APPLICATION CONTEXT", []),
+    "MOUNTING ARRANGEMENT": ("APPLICATION CONTEXT", []),
+    "SHAFT ORIENTATION": ("APPLICATION CONTEXT", []),
+    "COOLING ARRANGEMENT": ("APPLICATION CONTEXT", []),
+    "LUBRICATION SYSTEM": ("APPLICATION CONTEXT", []),
+    "TORQUE SPECIFICATION": ("APPLICATION CONTEXT", []),
+    "ACTIVATION TYPE": ("APPLICATION CONTEXT", []),
+    "BEARING TYPE": ("APPLICATION CONTEXT", []),
+    "LUBRICATION TYPE": ("APPLICATION CONTEXT", []),
+
+    # Identification
+    "MAKE": ("IDENTIFICATION", ["MANUFACTURER", "MANUFACTURER/MAKE", "BRAND", "MANUFACTURER/BRAND"]),
+    "MODEL": ("IDENTIFICATION", ["MODEL NUMBER", "MODEL/PART NUMBER", "PART NUMBER", "MODEL NO", "PART NO"]),
+    "DRAWING NUMBER": ("IDENTIFICATION", ["DRAWING NO", "DWG NO", "DWG NUMBER"]),
+}
+
+# Abbreviated words, expanded before lookup
+ABBREVIATIONS = {
+    "DIA": "DIAMETER",
+    "DIAM": "DIAMETER",
+    "NO": "NUMBER",
+    "NUM": "NUMBER",
+    "NBR": "NUMBER",
+    "DWG": "DRAWING",
+    "TEMP": "TEMPERATURE",
+    "PRESS": "PRESSURE",
+    "MFR": "MANUFACTURER",
+    "MFG": "MANUFACTURER",
+    "MAX": "MAXIMUM",
+    "MIN": "MINIMUM",
+}
+
+# Separators treated as spaces; "*" is markdown emphasis left in by the model
+SEPARATOR_PATTERN = re.compile(r"[\s_\-/.*]+")
+
+
+def normalise(name):
+    """Reduce a parameter name to its comparison form: "Bore_Dia." -> "BORE DIAMETER" """
+    words = SEPARATOR_PATTERN.split(name.upper())
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words if word)
+
+
+# Normalised spelling -> canonical id
+ALIAS_INDEX = {}
+for _canonical, (_, _aliases) in PARAMETERS.items():
+    for _spelling in [_canonical] + _aliases:
+        ALIAS_INDEX.setdefault(normalise(_spelling), _canonical)
+
+
+def canonical(name):
+    """Canonical id for a parameter name; unknown names map to their normalised form"""
+    normalised = normalise(name)
+    return ALIAS_INDEX.get(normalised, normalised)
+
+
+def category(name):
+    """Display category of a parameter name, "OTHER" when it is not a known parameter"""
+    entry = PARAMETERS.get(canonical(name))
+    return entry[0] if entry else "OTHER"
@@ -0,0 +1,181 @@
+"""
+Parallel PDF rasterisation.
+
+Rendering a page at 2.5x zoom and JPEG-encoding it is CPU bound, so large
+PDFs are split into contiguous page slices rendered by a process pool.
+The document is written once to a temp file that every worker opens
+itself (the OS page cache shares the bytes), and pages are yielded in
+document order as soon as their slice is done. Short documents are rendered in-process, where pool
+start-up would cost more than it saves. Pixmap samples go straight into a
+PIL image and are encoded once, to JPEG; pages whose text direction
+settles their orientation (see orientation.py) are rotated in the render
+matrix rather than after encoding.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import orientation
+import pdf_text
+
+# Render settings - override through environment variables
+RASTER_ZOOM = float(os.environ.get("RASTER_ZOOM", "2.5"))
+RASTER_WORKERS = int(os.environ.get("RASTER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Documents with fewer pages than this are rendered without the process pool
+MIN_PAGES_FOR_POOL = int(os.environ.get("RASTER_MIN_PAGES_FOR_POOL", "4"))
+# Slices per worker; more than one keeps workers busy when pages differ in cost
+SLICES_PER_WORKER = 2
+# Upper bound on pages per slice, so the first pages of a long PDF arrive early
+MAX_SLICE_PAGES = 4
+# Clockwise render rotation for each orientation decision
+ROTATION_DEGREES = {"ROTATE_0": 0, "ROTATE_90": 90, "ROTATE_180": 180, "ROTATE_270": 270}
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """Return the shared process pool, (re)creating it when the worker count changes"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: the Streamlit server is multi-threaded, which makes fork unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def pixmap_to_image(pix):
+    """
+    Wrap the pixmap's RGB samples in a PIL image without an intermediate PNG encode.
+    The samples are read through a memoryview where PyMuPDF provides one.
+    """
+    samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    if pix.n != 3:
+        # Grey or CMYK pixmaps (non-RGB colorspace) are converted by MuPDF first
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+        samples = pix.samples
+    return Image.frombuffer("RGB", (pix.width, pix.height), samples, "raw", "RGB", pix.stride, 1)
+
+
+def _render_page(page, zoom, degrees=0):
+    """
+    Render one page to JPEG bytes, turned clockwise by degrees in the render matrix
+    so the page is encoded exactly once (the "Page X/Y" badge is added at display time, see page_badge)
+    """
+    img = pixmap_to_image(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom).prerotate(degrees), alpha=False))
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='JPEG', quality=90)
+    return img_byte_arr.getvalue()
+
+
+def _render_record(page, zoom):
+    """
+    Read a page's orientation signals and text layer and render it. When the text
+    direction settles the orientation, the page is rendered upright and the rotation
+    is recorded as signals['applied'], so no rotation is needed downstream.
+    """
+    signals = orientation.page_signals(page)
+    signals["applied"] = orientation.decide(signals)
+    degrees = ROTATION_DEGREES.get(signals["applied"], 0)
+    text_layer = pdf_text.extract_page_text(page, degrees)
+    text_layer["orientation"] = signals
+    return _render_page(page, zoom, degrees), text_layer
+
+
+def _render_slice(path, start, stop, zoom):
+    """Process-pool task: render pages start..stop-1 of the PDF at path"""
+    document = fitz.open(path)
+    try:
+        return [_render_record(document[page_num], zoom) for page_num in range(start, stop)]
+    finally:
+        document.close()
+
+
+def _slices(page_count, workers):
+    size = min(MAX_SLICE_PAGES, max(1, -(-page_count // (workers * SLICES_PER_WORKER))))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def iter_pdf_pages(pdf_bytes, zoom=None, workers=None):
+    """
+    Render the pages of a PDF to JPEG, yielding each page as soon as it is ready.
+
+    Only a few slices per worker are in flight at a time, so memory is bounded
+    by the worker count rather than the page count.
+
+    Args:
+        pdf_bytes: The PDF file contents
+        zoom: Render scale (defaults to RASTER_ZOOM)
+        workers: Number of render processes (defaults to RASTER_WORKERS)
+
+    Yields:
+        (jpeg_bytes, page_number, page_count, document_title, text_layer) in page
+        order, where text_layer is the page's pdf_text.extract_page_text result
+        with the orientation.page_signals result under 'orientation'
+    """
+    zoom = zoom or RASTER_ZOOM
+    workers = max(1, workers or RASTER_WORKERS)
+
+    document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        page_count = document.page_count
+        document_title = document.metadata.get('title', '')
+        if workers == 1 or page_count < MIN_PAGES_FOR_POOL:
+            for page_num in range(page_count):
+                image, text_layer = _render_record(document[page_num], zoom)
+                yield (image, page_num + 1, page_count, document_title, text_layer)
+            return
+    finally:
+        document.close()
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+        temp_pdf.write(pdf_bytes)
+    pending = deque()
+    try:
+        pool = _get_pool(workers)
+        slices = deque(_slices(page_count, workers))
+        while slices or pending:
+            # Keep a bounded number of slices rendering ahead of the consumer
+            while slices and len(pending) < workers * SLICES_PER_WORKER:
+                start, stop = slices.popleft()
+                pending.append((start, pool.submit(_render_slice, temp_pdf.name, start, stop, zoom)))
+            start, future = pending.popleft()
+            for offset, (image, text_layer) in enumerate(future.result()):
+                yield (image, start + offset + 1, page_count, document_title, text_layer)
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool for good; start a fresh one next time
+        _discard_pool()
+        raise
+    finally:
+        # Also runs when the consumer stops early: drop queued slices and the temp file
+        for _, future in pending:
+            future.cancel()
+        try:
+            os.unlink(temp_pdf.name)
+        except OSError:
+            pass
+
+
+def render_pdf(pdf_bytes, zoom=None, workers=None):
+    """Render every page of a PDF to JPEG and return the list of page records (see iter_pdf_pages)"""
+    return list(iter_pdf_pages(pdf_bytes, zoom, workers))
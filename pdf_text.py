@@ -0,0 +1,209 @@
+"""
+Native PDF text layer for vector drawings.
+
+Drawings exported from CAD carry their title block, tables and dimension
+text as real text. Words are read with their positions via PyMuPDF, title
+block fields and dimension strings are pre-extracted locally, and the
+text is handed to the model alongside a small image (or none at all), so
+the model no longer has to read those characters from pixels. Pages with
+little or no text (scans) keep the raster vision path.
+"""
+import os
+import re
+
+# Pages with fewer words than this are treated as scanned
+MIN_TEXT_WORDS = int(os.environ.get("PDF_TEXT_MIN_WORDS", "25"))
+# Upper bound on the positioned text sent to the model
+MAX_PROMPT_CHARS = int(os.environ.get("PDF_TEXT_MAX_CHARS", "12000"))
+MAX_DIMENSIONS = 200
+
+# Title block labels and the result field each one fills
+TITLE_BLOCK_LABELS = [
+    (re.compile(r"(?<![A-Za-z0-9])(?:DRAWING|DRG|DWG)\.?\s*(?:NO|NUMBER|NR|#)\.?", re.IGNORECASE), "DRAWING NUMBER"),
+    (re.compile(r"(?<![A-Za-z0-9])(?:PART|ITEM|MODEL)\.?\s*(?:NO|NUMBER|NR|#)\.?", re.IGNORECASE), "MODEL/PART NUMBER"),
+    (re.compile(r"(?<![A-Za-z0-9])SCALE\b", re.IGNORECASE), "SCALE"),
+    (re.compile(r"(?<![A-Za-z0-9])REV(?:ISION)?\.?(?:\s*NO\.?)?\b", re.IGNORECASE), "REVISION"),
+    (re.compile(r"(?<![A-Za-z0-9])MATERIAL\b", re.IGNORECASE), "MATERIAL"),
+    (re.compile(r"(?<![A-Za-z0-9])(?:WEIGHT|WT|MASS)\b\.?", re.IGNORECASE), "WEIGHT"),
+    (re.compile(r"(?<![A-Za-z0-9])(?:MANUFACTURER|MAKE)\b", re.IGNORECASE), "MANUFACTURER/MAKE"),
+    (re.compile(r"(?<![A-Za-z0-9])TITLE\b", re.IGNORECASE), "TITLE"),
+    (re.compile(r"(?<![A-Za-z0-9])DATE\b", re.IGNORECASE), "DATE"),
+    (re.compile(r"(?<![A-Za-z0-9])SHEET\b", re.IGNORECASE), "SHEET"),
+]
+
+# Diameters, radii, threads, toleranced values and values with units
+DIMENSION_PATTERN = re.compile(
+    r"(?:[Ø⌀]|\bR|\bM)\s?\d+(?:[.,]\d+)?(?:\s?[xX×]\s?\d+(?:[.,]\d+)?)?(?:\s?(?:±|\+/-)\s?\d+(?:[.,]\d+)?)?"
+    r"|\d+(?:[.,]\d+)?\s?(?:±|\+/-)\s?\d+(?:[.,]\d+)?"
+    r"|\d+(?:[.,]\d+)?\s?(?:mm|cm|in|bar|BAR|psi|PSI|MPa|kg|°)(?![A-Za-z])"
+)
+
+
+def extract_page_text(page, degrees=0):
+    """
+    Read the text layer of a PyMuPDF page.
+
+    Args:
+        page: PyMuPDF page
+        degrees: Clockwise quarter turn applied to the rendered page, so that
+            positions match the image sent to the model
+
+    Returns:
+        Dict with has_text_layer, word_count, lines [(x, y, text)] with x/y
+        as fractions of the displayed page, title_block {field: value} and
+        dimensions [text]
+    """
+    words = page.get_text("words")
+    rect = page.rect
+    # Word boxes are in unrotated page space; map them to the page as displayed
+    matrix = page.rotation_matrix
+    width = rect.width or 1
+    height = rect.height or 1
+
+    grouped = {}
+    for x0, y0, x1, y1, word, block_no, line_no, _ in words:
+        grouped.setdefault((block_no, line_no), []).append((x0, y0, x1, y1, word))
+
+    lines = []
+    for line_words in grouped.values():
+        box = _rotated_box(line_words, matrix)
+        text = " ".join(word for _, _, _, _, word in line_words).strip()
+        if text:
+            x0, y0, x1, y1 = _turn_box((box[0] / width, box[1] / height, box[2] / width, box[3] / height), degrees)
+            lines.append({"x0": x0, "y0": y0, "x1": x1, "y1": y1, "text": text})
+    lines.sort(key=lambda line: (round(line["y0"], 2), line["x0"]))
+
+    return {
+        "has_text_layer": len(words) >= MIN_TEXT_WORDS,
+        "word_count": len(words),
+        "lines": [(round(line["x0"], 3), round(line["y0"], 3), line["text"]) for line in lines],
+        "title_block": _title_block_fields(lines),
+        "dimensions": _dimension_strings(lines),
+    }
+
+
+def _rotated_box(line_words, matrix):
+    xs, ys = [], []
+    for x0, y0, x1, y1, _ in line_words:
+        for x, y in ((x0, y0), (x1, y1)):
+            xs.append(x * matrix.a + y * matrix.c + matrix.e)
+            ys.append(x * matrix.b + y * matrix.d + matrix.f)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _turn_box(box, degrees):
+    """Turn a box given as page fractions clockwise by a quarter-turn multiple"""
+    x0, y0, x1, y1 = box
+    if degrees == 90:
+        x0, y0, x1, y1 = 1 - y1, x0, 1 - y0, x1
+    elif degrees == 180:
+        x0, y0, x1, y1 = 1 - x1, 1 - y1, 1 - x0, 1 - y0
+    elif degrees == 270:
+        x0, y0, x1, y1 = y0, 1 - x1, y1, 1 - x0
+    return x0, y0, x1, y1
+
+
+def _value_near(label, lines):
+    """Text of the line right of the label on the same row, or else directly below it"""
+    label_height = max(label["y1"] - label["y0"], 0.005)
+    right, below = None, None
+    for line in lines:
+        if line is label:
+            continue
+        centre_dy = abs((line["y0"] + line["y1"]) / 2 - (label["y0"] + label["y1"]) / 2)
+        if centre_dy < label_height / 2 and line["x0"] >= label["x1"]:
+            if right is None or line["x0"] < right["x0"]:
+                right = line
+        elif 0 < line["y0"] - label["y1"] < 3 * label_height and line["x0"] < label["x1"] and line["x1"] > label["x0"]:
+            if below is None or line["y0"] < below["y0"]:
+                below = line
+    match = right or below
+    return match["text"] if match else ""
+
+
+def _labels_in(text):
+    """(start, end, field) of every title block label in a line, in order; overlapping matches are dropped"""
+    found = []
+    for pattern, field in TITLE_BLOCK_LABELS:
+        for match in pattern.finditer(text):
+            found.append((match.start(), match.end(), field))
+    labels = []
+    # Longest label first where two start at the same place
+    for start, end, field in sorted(found, key=lambda label: (label[0], -label[1])):
+        if labels and start < labels[-1][1]:
+            continue
+        labels.append((start, end, field))
+    return labels
+
+
+def _title_block_fields(lines):
+    """Pair title block labels with their values; labels in the bottom-right title block area win"""
+    fields = {}
+    # Title blocks sit in the bottom right on standard sheets, so look there first
+    ordered = sorted(lines, key=lambda line: not (line["x0"] > 0.5 and line["y0"] > 0.6))
+    for line in ordered:
+        text = line["text"]
+        labels = _labels_in(text)
+        # Only lines that start with a label; further labels on the line ("DRAWING NO. HC-0001 SCALE 1:2")
+        # end the value before them
+        if not labels or text[:labels[0][0]].strip():
+            continue
+        for i, (start, end, field) in enumerate(labels):
+            if field in fields:
+                continue
+            value_end = labels[i + 1][0] if i + 1 < len(labels) else len(text)
+            value = text[end:value_end].strip(" :.-\t")
+            if not value:
+                value = _value_near(line, lines)
+            if value:
+                fields[field] = value
+    return fields
+
+
+def _dimension_strings(lines):
+    dimensions = []
+    seen = set()
+    for line in lines:
+        for match in DIMENSION_PATTERN.finditer(line["text"]):
+            value = match.group(0).strip()
+            if value not in seen:
+                seen.add(value)
+                dimensions.append(value)
+                if len(dimensions) >= MAX_DIMENSIONS:
+                    return dimensions
+    return dimensions
+
+
+def prompt_section(text_layer):
+    """Format a text layer as a prompt section: pre-extracted fields, dimensions and positioned lines"""
+    parts = [
+        "PDF TEXT LAYER\n"
+        "  - This page is a vector PDF. The text below was read directly from the file and is exact;\n"
+        "    prefer it over reading characters from the image. Positions are (x, y) as fractions of\n"
+        "    the page width and height from the top left.\n"
+    ]
+    if text_layer.get("title_block"):
+        parts.append("  - Title block fields found locally:\n")
+        parts.extend(f"      {field}: {value}\n" for field, value in text_layer["title_block"].items())
+    if text_layer.get("dimensions"):
+        parts.append(f"  - Dimension strings on the page: {', '.join(text_layer['dimensions'])}\n")
+
+    parts.append("  - Text lines:\n")
+    used = sum(len(part) for part in parts)
+    for x, y, text in text_layer.get("lines", []):
+        line = f"      ({x:.2f}, {y:.2f}) {text}\n"
+        if used + len(line) > MAX_PROMPT_CHARS:
+            parts.append("      ... (truncated)\n")
+            break
+        parts.append(line)
+        used += len(line)
+    return "".join(parts) + "\n"
+
+
+def merge_title_block(results, text_layer):
+    """Fill result fields the model left empty with locally extracted title block values"""
+    for field, value in text_layer.get("title_block", {}).items():
+        if field in results and not str(results.get(field, "")).strip():
+            results[field] = value
+            results[f"{field}_JUSTIFICATION"] = "Read from the title block in the PDF text layer."
+    return results
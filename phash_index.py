@@ -0,0 +1,125 @@
+"""
+Perceptual-hash index for reusing results of near-identical pages.
+
+Every page gets a difference hash (dHash) of a small greyscale copy: one
+bit per horizontally adjacent pixel pair, set when brightness rises. The
+same drawing under another file name, or a title sheet repeated across a
+vendor package, hashes within a few bits of the original, so the index
+can hand back the existing result instead of analysing the page again.
+
+Lookups use banded buckets: the hash is cut into HASH_BANDS bands, and
+two hashes within MAX_DISTANCE bits must agree exactly on at least one
+band (pigeonhole), so only pages sharing a band are compared. Drawing
+sheets from one template look alike at hash resolution, so candidates
+are confirmed before reuse: by identical PDF text when both pages have
+a text layer, otherwise by a pixel comparison of a larger thumbnail that
+catches a changed drawing number or dimension.
+"""
+import io
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+import metrics
+
+# dHash grid: HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 16
+HASH_BANDS = 8
+# Largest Hamming distance treated as the same page; must stay below HASH_BANDS
+MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", "7"))
+# Long edge of the thumbnail used to confirm a candidate
+DETAIL_EDGE = 384
+# Grey-level difference counted as a changed pixel, and the share of changed pixels allowed
+DETAIL_PIXEL_DELTA = 48
+DETAIL_MAX_CHANGED = 0.002
+
+
+def _greyscale(image_bytes, edge):
+    image = Image.open(io.BytesIO(image_bytes))
+    # JPEG pages are decoded straight at a reduced scale
+    image.draft("L", (edge, edge))
+    return image.convert("L")
+
+
+def dhash(grey):
+    """Return the HASH_SIZE*HASH_SIZE-bit difference hash of a greyscale PIL image as an int"""
+    pixels = np.asarray(grey.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def page_signature(image_bytes, text_layer=None):
+    """
+    Compute what the index needs to match a page.
+
+    Returns:
+        Dict with hash (int), detail (uint8 thumbnail array) and text
+        (the page's PDF text, or None for raster-only pages)
+    """
+    grey = _greyscale(image_bytes, DETAIL_EDGE * 2)
+    detail = grey.copy()
+    detail.thumbnail((DETAIL_EDGE, DETAIL_EDGE))
+    text = None
+    if text_layer and text_layer.get("has_text_layer"):
+        text = "\n".join(line_text for _, _, line_text in text_layer.get("lines", []))
+    return {"hash": dhash(grey), "detail": np.asarray(detail, dtype=np.uint8), "text": text}
+
+
+def _bands(value):
+    band_bits = HASH_SIZE * HASH_SIZE // HASH_BANDS
+    mask = (1 << band_bits) - 1
+    return [(band, (value >> (band * band_bits)) & mask) for band in range(HASH_BANDS)]
+
+
+def _same_page(signature, other):
+    """Confirm a hash candidate: identical text layers, or thumbnails with almost no changed pixels"""
+    if signature["text"] is not None and other["text"] is not None:
+        return signature["text"] == other["text"]
+    if signature["detail"].shape != other["detail"].shape:
+        return False
+    delta = np.abs(signature["detail"].astype(np.int16) - other["detail"].astype(np.int16))
+    return np.count_nonzero(delta > DETAIL_PIXEL_DELTA) <= DETAIL_MAX_CHANGED * delta.size
+
+
+class PageIndex:
+    """Banded dHash index mapping page signatures to the key of an existing result"""
+
+    def __init__(self):
+        self._entries = []
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, signature, key):
+        """Register a page signature for the result stored under key"""
+        with self._lock:
+            entry_id = len(self._entries)
+            self._entries.append((signature, key))
+            for band in _bands(signature["hash"]):
+                self._buckets.setdefault(band, []).append(entry_id)
+
+    def find(self, signature):
+        """
+        Return (key, distance) of the closest confirmed near-identical page,
+        or None when the page has not been seen
+        """
+        with self._lock:
+            candidates = set()
+            for band in _bands(signature["hash"]):
+                candidates.update(self._buckets.get(band, ()))
+            entries = [self._entries[entry_id] for entry_id in candidates]
+
+        matches = []
+        for other, key in entries:
+            distance = bin(signature["hash"] ^ other["hash"]).count("1")
+            if distance <= MAX_DISTANCE and _same_page(signature, other):
+                matches.append((distance, key))
+        if not matches:
+            return None
+        distance, key = min(matches, key=lambda match: match[0])
+        metrics.incr("pages_deduplicated")
+        return key, distance
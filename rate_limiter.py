@@ -0,0 +1,330 @@
+"""
+Rate-limit-aware request scheduler with a pool of API keys.
+
+Every model call asks the scheduler for a key before it is sent. Each key
+has token buckets for requests-per-minute and tokens-per-minute that are
+kept in sync with the x-ratelimit-* response headers. Callers queue in
+FIFO order until some key has capacity, 429s block only the offending key,
+and retries back off exponentially with full jitter.
+"""
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import metrics
+
+REQUESTS_PER_MINUTE = int(os.environ.get("LLM_RPM", "500"))
+TOKENS_PER_MINUTE = int(os.environ.get("LLM_TPM", "30000"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "6"))
+BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "60"))
+# Longest a caller waits in the queue for capacity before giving up
+MAX_QUEUE_WAIT = float(os.environ.get("LLM_MAX_QUEUE_WAIT", "300"))
+# How long a key is parked after the account reports an exhausted quota
+QUOTA_BLOCK_SECONDS = 3600
+
+# Rough token cost of one image at the default detail level
+IMAGE_TOKEN_ESTIMATE = 1105
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parse_duration(value):
+    """Parse OpenAI reset durations such as '1s', '6m0s' or '20ms' into seconds"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def estimate_tokens(payload):
+    """Estimate the tokens a request counts against TPM (prompt plus max_tokens)"""
+    text_chars = 0
+    images = 0
+    for message in payload.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            text_chars += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                text_chars += len(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                images += 1
+    return text_chars // 4 + images * IMAGE_TOKEN_ESTIMATE + int(payload.get("max_tokens", 0))
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to capacity units per minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def refund(self, amount, now):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, limit, remaining, reset_seconds, now):
+        """Align the bucket with the limit and remaining budget reported by the server"""
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        self.rate = self.capacity / 60.0
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+            if reset_seconds:
+                # The server restores the full budget after reset_seconds
+                self.rate = max(self.rate, (self.capacity - self.level) / reset_seconds)
+
+
+class KeyState:
+    """Buckets and block state for one API key"""
+
+    def __init__(self, api_key, requests_per_minute, tokens_per_minute):
+        self.api_key = api_key
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+
+    def wait_time(self, estimated_tokens, now):
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now)
+        )
+
+
+class RequestScheduler:
+    """FIFO scheduler handing out API keys with spare rate-limit capacity"""
+
+    def __init__(self, api_keys, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        if not api_keys:
+            raise ValueError("At least one API key is required")
+        self.api_keys = list(api_keys)
+        self._keys = [KeyState(key, requests_per_minute, tokens_per_minute) for key in self.api_keys]
+        self._next_key = 0
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._next_ticket = 0
+
+    def _pick_key(self, estimated_tokens, now):
+        """Return (key_state, wait) for the key that can serve soonest, rotating on ties"""
+        best, best_wait = None, None
+        count = len(self._keys)
+        for offset in range(count):
+            state = self._keys[(self._next_key + offset) % count]
+            wait = state.wait_time(estimated_tokens, now)
+            if best is None or wait < best_wait:
+                best, best_wait = state, wait
+            if wait <= 0:
+                break
+        return best, max(0.0, best_wait)
+
+    def acquire(self, estimated_tokens, timeout=MAX_QUEUE_WAIT):
+        """Block until a key has capacity for the request and return it (None on timeout)"""
+        deadline = time.monotonic() + timeout
+        waited = False
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = 0.5
+                    if self._queue[0] == ticket:
+                        state, wait = self._pick_key(estimated_tokens, now)
+                        if wait <= 0:
+                            state.requests.consume(1, now)
+                            state.tokens.consume(estimated_tokens, now)
+                            self._next_key = (self._keys.index(state) + 1) % len(self._keys)
+                            return state.api_key
+                    if now + wait > deadline:
+                        return None
+                    if not waited:
+                        metrics.incr("llm_scheduler_waits")
+                        waited = True
+                    self._cond.wait(timeout=min(wait, 1.0))
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def _state(self, api_key):
+        for state in self._keys:
+            if state.api_key == api_key:
+                return state
+        return None
+
+    def record_response(self, api_key, headers, estimated_tokens, used_tokens=None):
+        """Update the key's buckets from rate-limit headers and actual token usage"""
+        headers = headers or {}
+        with self._cond:
+            state = self._state(api_key)
+            if state is None:
+                return
+            now = time.monotonic()
+            state.requests.sync(
+                _to_number(headers.get("x-ratelimit-limit-requests")),
+                _to_number(headers.get("x-ratelimit-remaining-requests")),
+                parse_duration(headers.get("x-ratelimit-reset-requests")),
+                now
+            )
+            state.tokens.sync(
+                _to_number(headers.get("x-ratelimit-limit-tokens")),
+                _to_number(headers.get("x-ratelimit-remaining-tokens")),
+                parse_duration(headers.get("x-ratelimit-reset-tokens")),
+                now
+            )
+            if used_tokens is not None and used_tokens < estimated_tokens:
+                state.tokens.refund(estimated_tokens - used_tokens, now)
+            self._cond.notify_all()
+
+    def refund(self, api_key, amount):
+        """Return unused estimated tokens to a key (for streamed responses, once usage is known)"""
+        if amount <= 0:
+            return
+        with self._cond:
+            state = self._state(api_key)
+            if state is not None:
+                state.tokens.refund(amount, time.monotonic())
+            self._cond.notify_all()
+
+    def block_key(self, api_key, seconds):
+        """Park a key for the given number of seconds so other keys take the load"""
+        with self._cond:
+            state = self._state(api_key)
+            if state is not None:
+                state.blocked_until = max(state.blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def submit(self, payload, send):
+        """
+        Send a request through the scheduler, retrying rate limits and server errors.
+
+        Args:
+            payload: The chat completion payload (used for the token estimate)
+            send: Callable taking an API key and returning a response object
+
+        Returns:
+            The final response. Raises RuntimeError if no key frees up in time.
+        """
+        estimated_tokens = estimate_tokens(payload)
+        response = None
+        for attempt in range(MAX_RETRIES + 1):
+            api_key = self.acquire(estimated_tokens)
+            if api_key is None:
+                if response is not None:
+                    return response
+                raise RuntimeError("Timed out waiting for API rate limit capacity")
+
+            response = send(api_key)
+            self.record_response(api_key, response.headers, estimated_tokens, _used_tokens(response))
+
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == MAX_RETRIES:
+                return response
+
+            metrics.incr("llm_retries")
+            delay = _backoff_delay(attempt)
+            if response.status_code == 429:
+                metrics.incr("llm_rate_limited")
+                if _error_code(response) == "insufficient_quota":
+                    delay = QUOTA_BLOCK_SECONDS
+                retry_after = parse_duration(response.headers.get("retry-after"))
+                if retry_after:
+                    delay = max(delay, retry_after)
+                # Only this key is throttled - other keys in the pool keep serving
+                self.block_key(api_key, delay)
+            else:
+                time.sleep(delay)
+        return response
+
+
+def _backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _to_number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_code(response):
+    try:
+        error = response.json().get("error", {})
+        return error.get("code") if isinstance(error, dict) else None
+    except Exception:
+        return None
+
+
+def _used_tokens(response):
+    # Reading the body of a streamed response here would consume the stream
+    if response.status_code != 200 or "text/event-stream" in response.headers.get("Content-Type", ""):
+        return None
+    try:
+        return response.json().get("usage", {}).get("total_tokens")
+    except Exception:
+        return None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def configure(api_keys):
+    """Install the process-wide scheduler for api_keys (no-op if the pool is unchanged)"""
+    global _scheduler
+    api_keys = [key for key in dict.fromkeys(api_keys) if key]
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler.api_keys != api_keys:
+            _scheduler = RequestScheduler(api_keys)
+    return _scheduler
+
+
+def get_scheduler():
+    """Return the configured scheduler"""
+    if _scheduler is None:
+        raise RuntimeError("Request scheduler has not been configured with API keys")
+    return _scheduler
+
+
+def install(scheduler):
+    """Replace the process-wide scheduler, e.g. to start a benchmark run with full buckets"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+    return _scheduler
@@ -0,0 +1,150 @@
+"""
+Region planning for the cropped second extraction pass.
+
+Instead of re-sending the whole page, the second pass sends crops of the
+regions where the missing fields are expected: the title block, the
+specification tables and the dimensioned drawing area. Regions start from
+standard drawing-sheet layout, are moved to wherever the first-pass
+justifications say tables and title blocks were found, and are trimmed to
+their inked content with a cheap local layout analysis.
+"""
+import io
+import re
+
+import numpy as np
+
+# Fractional page boxes (x0, y0, x1, y1) for standard sheet layouts
+DEFAULT_REGION_BOXES = {
+    "title_block": (0.50, 0.65, 1.0, 1.0),
+    "spec_table": (0.50, 0.0, 1.0, 0.70),
+    "dimensions": (0.0, 0.0, 0.80, 0.90),
+}
+
+REGION_LABELS = {
+    "title_block": "Title block",
+    "spec_table": "Specification tables",
+    "dimensions": "Dimensioned drawing views",
+}
+
+# Page areas named in justifications such as "found in the top right table"
+LOCATION_BOXES = [
+    ("top left", (0.0, 0.0, 0.55, 0.55)),
+    ("top right", (0.45, 0.0, 1.0, 0.55)),
+    ("bottom left", (0.0, 0.45, 0.55, 1.0)),
+    ("bottom right", (0.45, 0.45, 1.0, 1.0)),
+    ("upper left", (0.0, 0.0, 0.55, 0.55)),
+    ("upper right", (0.45, 0.0, 1.0, 0.55)),
+    ("lower left", (0.0, 0.45, 0.55, 1.0)),
+    ("lower right", (0.45, 0.45, 1.0, 1.0)),
+    ("top", (0.0, 0.0, 1.0, 0.55)),
+    ("bottom", (0.0, 0.45, 1.0, 1.0)),
+    ("left", (0.0, 0.0, 0.55, 1.0)),
+    ("right", (0.45, 0.0, 1.0, 1.0)),
+    ("center", (0.2, 0.2, 0.8, 0.8)),
+]
+
+# Field-name keywords that decide which region a missing field is searched in
+REGION_KEYWORDS = {
+    "title_block": [
+        "DRAWING", "DRG", "REV", "SCALE", "MANUFACTURER", "MAKE", "BRAND", "MODEL",
+        "PART NUMBER", "PART NO", "CODE", "DATE", "STANDARD", "WEIGHT", "MATERIAL"
+    ],
+    "dimensions": [
+        "DIAMETER", "DIA", "BORE", "ROD", "STROKE", "LENGTH", "HEIGHT", "WIDTH",
+        "THICKNESS", "DIMENSION", "SIZE", "THREAD", "PITCH", "RADIUS", "MOUNTING", "PORT LOCATION"
+    ],
+}
+
+# Padding added around trimmed content, as a fraction of the region size
+TRIM_PADDING = 0.03
+# Pixels darker than this count as ink in the layout analysis
+INK_THRESHOLD = 200
+
+
+def location_box(text):
+    """Return the page box for the first location phrase found in text, if any"""
+    text = text.lower()
+    for phrase, box in LOCATION_BOXES:
+        if re.search(r"\b" + phrase + r"\b", text):
+            return box
+    return None
+
+
+def locate_regions(initial_results):
+    """
+    Return region boxes, moved to where first-pass justifications located
+    the title block and specification tables.
+    """
+    boxes = dict(DEFAULT_REGION_BOXES)
+    for key, justification in initial_results.items():
+        if not key.endswith("_JUSTIFICATION") or not justification:
+            continue
+        lowered = justification.lower()
+        box = location_box(lowered)
+        if box is None:
+            continue
+        if "title block" in lowered:
+            boxes["title_block"] = box
+        elif "table" in lowered:
+            boxes["spec_table"] = box
+    return boxes
+
+
+def region_for_field(field):
+    """Pick the region a missing field is most likely found in"""
+    name = field.upper().replace("_", " ")
+    for region, keywords in REGION_KEYWORDS.items():
+        if any(keyword in name for keyword in keywords):
+            return region
+    return "spec_table"
+
+
+def plan_regions(fields, initial_results):
+    """
+    Group fields by region.
+
+    Returns:
+        List of (region_name, box, fields) for every region with fields, in
+        title block, specification table, dimensions order
+    """
+    boxes = locate_regions(initial_results)
+    grouped = {}
+    for field in fields:
+        grouped.setdefault(region_for_field(field), []).append(field)
+    return [(region, boxes[region], grouped[region]) for region in DEFAULT_REGION_BOXES if region in grouped]
+
+
+def _trim_to_content(image, box):
+    """Shrink a pixel box to the inked content inside it using a downsampled greyscale copy"""
+    x0, y0, x1, y1 = box
+    region = image.crop(box).convert("L")
+    scale = max(1, max(region.size) // 512)
+    small = np.asarray(region.reduce(scale) if scale > 1 else region)
+    ink = small < INK_THRESHOLD
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return box
+
+    pad_x = int((x1 - x0) * TRIM_PADDING)
+    pad_y = int((y1 - y0) * TRIM_PADDING)
+    return (
+        int(max(x0, x0 + cols[0] * scale - pad_x)),
+        int(max(y0, y0 + rows[0] * scale - pad_y)),
+        int(min(x1, x0 + (cols[-1] + 1) * scale + pad_x)),
+        int(min(y1, y0 + (rows[-1] + 1) * scale + pad_y)),
+    )
+
+
+def crop_region(image, box):
+    """Crop a fractional box out of a decoded page image and return JPEG bytes"""
+    width, height = image.size
+    pixel_box = (int(box[0] * width), int(box[1] * height), int(box[2] * width), int(box[3] * height))
+    pixel_box = _trim_to_content(image, pixel_box)
+
+    crop = image.crop(pixel_box)
+    if crop.mode != "RGB":
+        crop = crop.convert("RGB")
+    img_byte_arr = io.BytesIO()
+    crop.save(img_byte_arr, format="JPEG", quality=90)
+    return img_byte_arr.getvalue()
@@ -0,0 +1,259 @@
+"""
+Single-pass parser for extraction responses.
+
+Turns PARAMETER: value / PARAMETER_JUSTIFICATION: text responses (or the
+(name, value) pairs of a structured response) into the results dict used
+throughout the app. Lines are tokenised once with a precompiled pattern,
+unit spellings after numbers are normalised through the unit registry in
+units.py, and duplicate parameters are found through the alias index in
+param_aliases.py instead of scanning every relationship list per key.
+"""
+import re
+
+import param_aliases
+import units
+
+DOCUMENT_KEYS = ("DOCUMENT_TYPE", "COMPONENT_TYPE")
+
+# "NAME: value" lines: everything before the first colon, and the rest of the line
+LINE_PATTERN = re.compile(r"^([^:\n]*):(.*)$", re.MULTILINE)
+
+# Quoted 'key': 'value' pairs inside JSON-like values
+QUOTED_PAIR_PATTERN = re.compile(r'[\'"]([^\'"]*)[\'"]\s*:\s*[\'"]([^\'"]*)[\'"]\s*(?:,|$)')
+
+# Values meaning "no value"
+NOT_SPECIFIED_MARKERS = (
+    "NOT SPECIFIED", "NOT AVAILABLE", "NOT VISIBLE", "UNKNOWN", "N/A", "NONE",
+    "NOT FOUND", "NOT INDICATED", "NOT MARKED", "NOT GIVEN", "MISSING"
+)
+
+DIMENSION_TRIPLE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)')
+DIMENSION_UNIT_PATTERN = re.compile(r'(?:x|×)\s*\d+(?:\.\d+)?\s*([a-zA-Z]+)')
+# "200mm FOR 1 TON, 750mm FOR 1.5TON"
+HEIGHT_FOR_CAPACITY_PATTERN = re.compile(r'(\d+(?:\.\d+)?(?:\s*[a-zA-Z]+)?)\s+FOR\s+([\d\.]+\s*TON)', re.IGNORECASE)
+
+
+def _is_json_like(value):
+    return (
+        (value.startswith('{') and value.endswith('}')) or
+        (value.startswith('[{') and value.endswith('}]')) or
+        (value.startswith("'") and ":" in value)
+    )
+
+
+def _strip_brackets(value):
+    if value.startswith('[{') and value.endswith('}]'):
+        return value[1:-1]  # Remove outer brackets only; the quoted pairs are found inside the braces
+    if value.startswith('{') and value.endswith('}'):
+        return value.strip('{}')
+    return value
+
+
+def _quoted_values(value):
+    """Values of the quoted 'key': 'value' pairs in value, without their keys"""
+    return [v for _, v in QUOTED_PAIR_PATTERN.findall(value)]
+
+
+def _flatten_json_like(value):
+    """
+    Reduce a JSON-like value ({'k': 'v', ...}, [{'k': 'v'}] or 'k': 'v') to its
+    values, one per line. Values that cannot be read are returned unchanged.
+    """
+    processed_value = _strip_brackets(value)
+    values = _quoted_values(processed_value)
+    if not values and ',' in processed_value:
+        # Fallback to simple splitting if the pattern found nothing
+        for part in processed_value.split(','):
+            if ':' in part:
+                values.append(part.split(':', 1)[1].strip().strip('\'"'))
+    if not values:
+        return value
+    return values[0] if len(values) == 1 else "\n".join(values)
+
+
+def _clean_value(value):
+    """Normalise one parameter value: placeholders, "not specified" markers, JSON-like values and units"""
+    value = value.strip()
+    # Remove any ** characters from the beginning of values
+    if value.startswith('**'):
+        value = value[2:].strip()
+
+    lowered = value.lower()
+    if '[value]' in lowered or '[values]' in lowered:
+        value = ""
+    upper = value.upper()
+    if any(marker in upper for marker in NOT_SPECIFIED_MARKERS):
+        value = ""
+
+    if _is_json_like(value):
+        value = _flatten_json_like(value)
+
+    if value:
+        # Standardize diameter symbol, then unit spellings (see units.py)
+        value = units.normalise_unit_spellings(value.replace('ø', 'Ø'))
+    return value
+
+
+def split_lines(response_text):
+    """Tokenise a text response into (key, value) pairs, one per line containing a colon"""
+    return LINE_PATTERN.findall(response_text)
+
+
+def _split_dimensions(results):
+    """Fill LENGTH/WIDTH/HEIGHT from an "L x W x H unit" dimensions value when they are missing"""
+    for dim_param in ("DIMENSIONS", "ITEM DIMENSIONS", "OVERALL DIMENSIONS"):
+        dimensions = results.get(dim_param)
+        if not dimensions:
+            continue
+        lowered = dimensions.lower()
+        match = DIMENSION_TRIPLE_PATTERN.search(lowered)
+        if not match:
+            continue
+        unit_match = DIMENSION_UNIT_PATTERN.search(lowered)
+        unit = unit_match.group(1) if unit_match else "cm"  # Default to cm if no unit found
+        for name, number in zip(("LENGTH", "WIDTH", "HEIGHT"), match.groups()):
+            if not results.get(name):
+                results[name] = f"{number} {unit}"
+                results[f"{name}_JUSTIFICATION"] = "Extracted from overall dimensions."
+
+
+def _split_loose_dimensions(results):
+    """Fallback for dimensions such as "93 x 55" or "93 x 55 x 29 Centimeters" the strict pattern missed"""
+    dimensions = results.get("DIMENSIONS")
+    if not dimensions or not ("x" in dimensions.lower() or "×" in dimensions):
+        return
+    dim_parts = [part.strip() for part in dimensions.lower().replace('×', 'x').split("x")]
+
+    # Split a trailing unit off the last part
+    unit = ""
+    last_part = dim_parts[-1]
+    for i, char in enumerate(last_part):
+        if not (char.isdigit() or char == "." or char.isspace()):
+            if i > 0:
+                unit = last_part[i:].strip()
+                dim_parts[-1] = last_part[:i].strip()
+            break
+
+    for name, part in zip(("LENGTH", "WIDTH", "HEIGHT"), dim_parts):
+        if not results.get(name):
+            results[name] = f"{part} {unit}" if unit else part
+            results[f"{name}_JUSTIFICATION"] = "Extracted from item dimensions."
+
+
+def _default_justification(doc_type, has_value):
+    if has_value:
+        if "PRODUCT_LISTING" in doc_type or "CATALOG" in doc_type:
+            return "Extracted from the product listing specifications."
+        if "SPECIFICATION" in doc_type:
+            return "Extracted from the specification sheet."
+        if "MIXED" in doc_type:
+            return "Extracted from the document. Exact location unspecified."
+        return "Extracted directly from the drawing."
+    if "PRODUCT_LISTING" in doc_type or "CATALOG" in doc_type:
+        return "Not provided in the product listing."
+    if "SPECIFICATION" in doc_type:
+        return "Not included in the specification sheet."
+    if "MIXED" in doc_type:
+        return "Not found in any part of the document."
+    return "Not visible in the drawing."
+
+
+def build_results(pairs):
+    """
+    Build the results dict from (key, value) pairs in one pass over the pairs.
+
+    Returns:
+        Dict with DOCUMENT_TYPE / COMPONENT_TYPE when given, then every
+        parameter and its PARAMETER_JUSTIFICATION
+    """
+    document_info = {}
+    parameters = {}
+    justifications = {}
+
+    for key, value in pairs:
+        key = key.strip().upper()
+        if key in DOCUMENT_KEYS:
+            document_info[key] = value.strip()
+            continue
+        # Remove any ** characters from parameter names
+        key = key.replace('*', '')
+        if key in DOCUMENT_KEYS:
+            continue
+        if key.endswith('_JUSTIFICATION'):
+            value = value.strip()
+            if value.startswith('**'):
+                value = value[2:].strip()
+            justifications[key.replace('_JUSTIFICATION', '')] = value
+        else:
+            parameters[key] = _clean_value(value)
+
+    # Document type information comes first, as in the text format's layout
+    results = dict(document_info)
+    results.update(parameters)
+
+    _split_dimensions(results)
+
+    # Combine port type and size when both are present
+    if results.get("PORT TYPE") and results.get("PORT SIZE"):
+        results["PORT_SPECIFICATION"] = f"{results['PORT TYPE']} {results['PORT SIZE']}"
+        results["PORT_SPECIFICATION_JUSTIFICATION"] = "Combined from port type and port size information."
+
+    # Clear synonyms of parameters that already have a value, moving their justification over
+    seen = {}
+    for key in list(results.keys()):
+        if key.endswith("_JUSTIFICATION") or not results.get(key, "").strip():
+            continue
+        value = results[key]
+        if isinstance(value, str) and _is_json_like(value):
+            # Only quoted pairs here; the comma-split fallback applies to raw values
+            values = _quoted_values(_strip_brackets(value))
+            if values:
+                results[key] = "\n".join(values)
+        seen[key] = results[key]
+        main_param = param_aliases.canonical(key)
+        if main_param != key and seen.get(main_param):
+            just_key = f"{key}_JUSTIFICATION"
+            if just_key in results:
+                results[f"{main_param}_JUSTIFICATION"] = results[just_key]
+            results[key] = ""
+
+    _split_loose_dimensions(results)
+
+    # Heights that vary by capacity, e.g. "200mm FOR 1 TON, 750mm FOR 1.5TON"
+    for height_field in ("CLOSED HEIGHT", "OPEN HEIGHT", "MINIMUM HEIGHT", "MAXIMUM HEIGHT"):
+        if height_field in results and "FOR" in results[height_field].upper():
+            height_matches = HEIGHT_FOR_CAPACITY_PATTERN.findall(results[height_field])
+            if height_matches:
+                results[height_field] = ", ".join(f"{height} @ {capacity}" for height, capacity in height_matches)
+                results[f"{height_field}_JUSTIFICATION"] = "Structured from height specifications that vary by capacity."
+
+    # Justifications, with a default matching the document type where the response gave none
+    doc_type = document_info.get("DOCUMENT_TYPE", "").upper()
+    for key in list(results.keys()):
+        if key in DOCUMENT_KEYS or key.endswith("_JUSTIFICATION"):
+            continue
+        just_key = f"{key}_JUSTIFICATION"
+        if just_key not in results:
+            if key in justifications:
+                results[just_key] = justifications[key]
+            else:
+                results[just_key] = _default_justification(doc_type, bool(results[key]))
+    return results
+
+
+def parse_text(response_text):
+    """Parse a PARAMETER: value / PARAMETER_JUSTIFICATION: text response into the results dict"""
+    return build_results(split_lines(response_text))
+
+
+def parse_structured(data):
+    """Parse a structured-output response (document_type, component_type, parameters list) into the results dict"""
+    pairs = [(key.upper(), data[key]) for key in ("document_type", "component_type") if data.get(key)]
+    for parameter in data.get("parameters", []):
+        name = str(parameter.get("name") or "").strip()
+        if not name:
+            continue
+        # Values may contain line breaks (e.g. several sizes), which the line format could not carry
+        pairs.append((name, str(parameter.get("value") or "")))
+        pairs.append((f"{name}_JUSTIFICATION", str(parameter.get("justification") or "")))
+    return build_results(pairs)
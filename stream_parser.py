@@ -0,0 +1,77 @@
+"""
+Incremental field parser for streamed extraction responses.
+
+Text deltas are fed in as they arrive and every parameter is returned as
+soon as its value is complete, so the UI can show fields long before the
+full completion has been received. Both response formats are handled: the
+structured JSON object ({"parameters": [{"name", "value", ...}]}) and the
+PARAMETER: value / PARAMETER_JUSTIFICATION: text line format. The fields
+are a preview only; the complete response is still parsed as a whole.
+"""
+import json
+import re
+
+_JSON_STRING = r'"((?:[^"\\]|\\.)*)"'
+_JSON_PARAMETER = re.compile(r'\{\s*"name"\s*:\s*' + _JSON_STRING + r'\s*,\s*"value"\s*:\s*' + _JSON_STRING)
+_JSON_TYPE = re.compile(r'"(document_type|component_type)"\s*:\s*' + _JSON_STRING)
+
+
+def _unescape(value):
+    try:
+        return json.loads(f'"{value}"')
+    except ValueError:
+        return value
+
+
+class StreamingFieldParser:
+    """Turns a stream of text deltas into completed (NAME, value) fields"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.mode = None
+        self._pos = 0
+        self._seen_types = set()
+
+    def feed(self, text):
+        """Add a text delta and return the list of fields completed by it"""
+        self.buffer += text
+        if self.mode is None:
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return []
+            self.mode = "json" if stripped[0] == "{" else "lines"
+        if self.mode == "json":
+            return self._feed_json()
+        return self._feed_lines()
+
+    def _feed_json(self):
+        fields = []
+        if len(self._seen_types) < 2:
+            for match in _JSON_TYPE.finditer(self.buffer):
+                key = match.group(1).upper()
+                if key not in self._seen_types:
+                    self._seen_types.add(key)
+                    fields.append((key, _unescape(match.group(2))))
+
+        while True:
+            match = _JSON_PARAMETER.search(self.buffer, self._pos)
+            if match is None:
+                break
+            self._pos = match.end()
+            fields.append((_unescape(match.group(1)).strip().upper(), _unescape(match.group(2))))
+        return fields
+
+    def _feed_lines(self):
+        fields = []
+        end = self.buffer.rfind("\n")
+        if end < self._pos:
+            return fields
+        for line in self.buffer[self._pos:end].split("\n"):
+            if ":" not in line:
+                continue
+            key, value = line.split(":", 1)
+            key = key.replace("*", "").strip().lstrip("- ").upper()
+            if key and not key.endswith("_JUSTIFICATION"):
+                fields.append((key, value.strip()))
+        self._pos = end + 1
+        return fields
@@ -0,0 +1,143 @@
+"""
+Cached thumbnails for the upload grid.
+
+The grid is redrawn on every Streamlit rerun. Fully decoding each upload
+with PIL and handing the full image to st.image made a page with dozens of
+uploads sluggish after every click. Thumbnails are keyed by the SHA-256
+of the file contents and built once: JPEGs are decoded at reduced scale
+with Image.draft, other images are shrunk with Image.reduce before the
+final resize, and PDFs get their first page rendered at thumbnail zoom.
+Results are kept in a process-wide LRU shared by every session, and on
+disk so they survive restarts.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import metrics
+import pdf_raster
+
+# Long edge in pixels; twice the 150px grid width so thumbnails stay sharp on HiDPI screens
+THUMBNAIL_EDGE = int(os.environ.get("THUMBNAIL_EDGE", "300"))
+THUMBNAIL_DIR = os.environ.get(
+    "THUMBNAIL_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "cad_extractor", "thumbnails")
+)
+MEMORY_ENTRIES = 512
+
+_memory = OrderedDict()
+# Upload identity -> content hash, so unchanged uploads are not re-hashed on every rerun
+_file_keys = {}
+_lock = threading.Lock()
+
+
+def file_key(uploaded_file):
+    """Return the content hash of a Streamlit upload, computed once per upload"""
+    identity = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    with _lock:
+        key = _file_keys.get(identity)
+    if key is None:
+        key = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        with _lock:
+            _file_keys[identity] = key
+    return key
+
+
+def _image_thumbnail(data):
+    image = Image.open(io.BytesIO(data))
+    # JPEG: let the decoder scale down by up to 8x while decoding
+    image.draft("RGB", (THUMBNAIL_EDGE, THUMBNAIL_EDGE))
+    # Other formats: cheap integer box reduction before the filtered resize
+    factor = max(image.size) // (THUMBNAIL_EDGE * 2)
+    if factor > 1:
+        image = image.reduce(factor)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.LANCZOS)
+    return image
+
+
+def _pdf_thumbnail(data):
+    document = fitz.open(stream=data, filetype="pdf")
+    try:
+        if document.page_count == 0:
+            return None
+        page = document[0]
+        zoom = THUMBNAIL_EDGE / max(page.rect.width, page.rect.height, 1)
+        return pdf_raster.pixmap_to_image(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False))
+    finally:
+        document.close()
+
+
+def _disk_path(key):
+    return os.path.join(THUMBNAIL_DIR, f"{key}_{THUMBNAIL_EDGE}.jpg")
+
+
+def _remember(key, thumbnail):
+    with _lock:
+        _memory[key] = thumbnail
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def get_thumbnail(uploaded_file):
+    """
+    Return JPEG thumbnail bytes for an uploaded image or PDF.
+
+    Returns:
+        JPEG bytes, or None when the file cannot be read as an image or PDF
+    """
+    key = file_key(uploaded_file)
+    with _lock:
+        thumbnail = _memory.get(key)
+        if thumbnail is not None:
+            _memory.move_to_end(key)
+    if thumbnail is not None:
+        metrics.incr("thumbnail_memory_hits")
+        # b"" marks a file that could not be thumbnailed
+        return thumbnail or None
+
+    path = _disk_path(key)
+    try:
+        with open(path, "rb") as f:
+            thumbnail = f.read()
+        metrics.incr("thumbnail_disk_hits")
+        _remember(key, thumbnail)
+        return thumbnail
+    except OSError:
+        pass
+
+    try:
+        if uploaded_file.type == "application/pdf":
+            image = _pdf_thumbnail(uploaded_file.getvalue())
+        else:
+            image = _image_thumbnail(uploaded_file.getvalue())
+    except Exception as e:
+        print(f"Thumbnail for {uploaded_file.name} failed: {str(e)}")
+        image = None
+    if image is None:
+        # Remember the failure so the grid does not retry on every rerun
+        _remember(key, b"")
+        return None
+
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='JPEG', quality=80)
+    thumbnail = img_byte_arr.getvalue()
+    metrics.incr("thumbnails_built")
+    _remember(key, thumbnail)
+
+    try:
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(thumbnail)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not save thumbnail: {str(e)}")
+    return thumbnail
@@ -0,0 +1,208 @@
+"""
+Tiled extraction for large-format sheets.
+
+An A1 or A0 drawing rendered at 2.5x zoom is 25-50 megapixels. The vision
+API scales every image to fit 2048px and then to a 768px short side, so
+on a whole sheet small dimension text and table cells shrink to a pixel
+or two. Above TILE_PIXEL_THRESHOLD the page is split into an overlapping
+grid of tiles instead. The tiles are extracted concurrently, and the
+per-tile fields are merged. When tiles disagree on a field, position
+decides: the value found closest to where that field is expected on the
+sheet wins (title block, specification tables, drawing views; see
+regions.py). Among equally placed values, the one seen in more tiles wins,
+then the one further from a tile edge, where text may be cut off.
+"""
+import io
+import math
+import os
+
+from PIL import Image
+
+import regions
+
+# Pages with more pixels than this are extracted tile by tile
+TILE_PIXEL_THRESHOLD = int(os.environ.get("TILE_PIXEL_THRESHOLD", str(16 * 1000 * 1000)))
+# Target tile edge in pixels and overlap between neighbouring tiles (fraction of the tile edge)
+TILE_EDGE = int(os.environ.get("TILE_EDGE", "1536"))
+TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", "0.12"))
+# Upper bound on tiles per page; the tile edge grows when a sheet would need more
+MAX_TILES = int(os.environ.get("TILE_MAX_TILES", "12"))
+# Tiles of one page extracted at the same time
+TILE_CONCURRENCY = int(os.environ.get("TILE_CONCURRENCY", "4"))
+
+DOCUMENT_KEYS = ("DOCUMENT_TYPE", "COMPONENT_TYPE")
+
+
+def needs_tiling(image_bytes):
+    """Return True when the page is large enough for tiled extraction (header read only)"""
+    width, height = Image.open(io.BytesIO(image_bytes)).size
+    return width * height > TILE_PIXEL_THRESHOLD
+
+
+def _spans(length, edge):
+    """Split length into overlapping (start, stop) spans of at most about edge pixels"""
+    overlap = int(edge * TILE_OVERLAP)
+    count = max(1, math.ceil((length - overlap) / max(1, edge - overlap)))
+    size = math.ceil((length + (count - 1) * overlap) / count)
+    spans = []
+    for i in range(count):
+        start = min(i * (size - overlap), max(0, length - size))
+        spans.append((start, min(length, start + size)))
+    return spans
+
+
+def plan_tiles(width, height):
+    """
+    Lay out the tile grid for a page.
+
+    Returns:
+        List of tile dicts with row, col, rows, cols, pixel box (x0, y0, x1, y1)
+        and fractional page box
+    """
+    edge = TILE_EDGE
+    while True:
+        columns, rows = _spans(width, edge), _spans(height, edge)
+        if len(columns) * len(rows) <= MAX_TILES:
+            break
+        edge = int(edge * 1.25)
+
+    tiles = []
+    for row, (y0, y1) in enumerate(rows):
+        for col, (x0, x1) in enumerate(columns):
+            tiles.append({
+                "row": row, "col": col, "rows": len(rows), "cols": len(columns),
+                "box": (x0, y0, x1, y1),
+                "page_box": (x0 / width, y0 / height, x1 / width, y1 / height),
+            })
+    return tiles
+
+
+def crop_tiles(image_bytes):
+    """Decode the page once and return (tiles, [JPEG bytes per tile])"""
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    tiles = plan_tiles(image.width, image.height)
+    crops = []
+    for tile in tiles:
+        img_byte_arr = io.BytesIO()
+        image.crop(tile["box"]).save(img_byte_arr, format='JPEG', quality=90)
+        crops.append(img_byte_arr.getvalue())
+    return tiles, crops
+
+
+def tile_prompt(tile):
+    """Prompt section telling the model which part of the sheet a tile shows"""
+    x0, y0, x1, y1 = tile["page_box"]
+    return (
+        "TILED SHEET\n"
+        f"  - This image is tile {tile['row'] * tile['cols'] + tile['col'] + 1} of {tile['rows'] * tile['cols']} "
+        f"(row {tile['row'] + 1} of {tile['rows']}, column {tile['col'] + 1} of {tile['cols']}) of a large-format sheet.\n"
+        f"  - It covers {x0:.0%}-{x1:.0%} of the sheet width and {y0:.0%}-{y1:.0%} of its height;\n"
+        "    neighbouring tiles overlap it slightly.\n"
+        "  - Extract only values that are fully legible in this tile. Leave out values cut off at the\n"
+        "    tile edge; they are read from the neighbouring tile.\n"
+        "  - In justifications, describe locations relative to this tile.\n\n"
+    )
+
+
+def _position(tile, justification):
+    """Page-fraction centre of a value: the located part of the tile, or the tile centre"""
+    tx0, ty0, tx1, ty1 = tile["page_box"]
+    box = regions.location_box(justification or "") or (0.0, 0.0, 1.0, 1.0)
+    return (
+        tx0 + (box[0] + box[2]) / 2 * (tx1 - tx0),
+        ty0 + (box[1] + box[3]) / 2 * (ty1 - ty0),
+    )
+
+
+def _distance_to_box(point, box):
+    x, y = point
+    dx = max(box[0] - x, 0, x - box[2])
+    dy = max(box[1] - y, 0, y - box[3])
+    return math.hypot(dx, dy)
+
+
+def _edge_margin(point, tile):
+    """How far a point sits from the nearest inner tile edge (page edges do not cut text)"""
+    x, y = point
+    x0, y0, x1, y1 = tile["page_box"]
+    margins = [1.0]
+    if x0 > 0:
+        margins.append(x - x0)
+    if x1 < 1:
+        margins.append(x1 - x)
+    if y0 > 0:
+        margins.append(y - y0)
+    if y1 < 1:
+        margins.append(y1 - y)
+    return min(margins)
+
+
+def merge_tile_results(tiles, tile_results):
+    """
+    Merge per-tile parsed results into one results dict.
+
+    Args:
+        tiles: The tile dicts from plan_tiles
+        tile_results: Parsed results dict per tile (error strings are skipped)
+
+    Returns:
+        Merged results dict, or None when no tile produced results
+    """
+    expected_boxes = regions.DEFAULT_REGION_BOXES
+    candidates = {}
+    document_votes = {key: {} for key in DOCUMENT_KEYS}
+
+    for tile, results in zip(tiles, tile_results):
+        if not isinstance(results, dict):
+            continue
+        for key, value in results.items():
+            if key in DOCUMENT_KEYS:
+                if value:
+                    document_votes[key][value] = document_votes[key].get(value, 0) + 1
+                continue
+            if key.endswith("_JUSTIFICATION"):
+                continue
+            value = str(value).strip()
+            justification = results.get(f"{key}_JUSTIFICATION", "")
+            candidates.setdefault(key, []).append((value, justification, tile))
+
+    if not candidates and not any(document_votes.values()):
+        return None
+
+    merged = {}
+    for key, votes in document_votes.items():
+        if votes:
+            merged[key] = max(votes, key=votes.get)
+
+    for field, field_candidates in candidates.items():
+        found = [candidate for candidate in field_candidates if candidate[0]]
+        if not found:
+            # Every tile that listed the field left it empty
+            merged[field] = ""
+            merged[f"{field}_JUSTIFICATION"] = field_candidates[0][1]
+            continue
+
+        agreement = {}
+        for value, _, _ in found:
+            normalised = " ".join(value.upper().split())
+            agreement[normalised] = agreement.get(normalised, 0) + 1
+
+        expected = expected_boxes[regions.region_for_field(field)]
+
+        def rank(candidate):
+            value, justification, tile = candidate
+            point = _position(tile, justification)
+            return (
+                round(_distance_to_box(point, expected), 2),
+                -agreement[" ".join(value.upper().split())],
+                -_edge_margin(point, tile),
+            )
+
+        value, justification, tile = min(found, key=rank)
+        merged[field] = value
+        merged[f"{field}_JUSTIFICATION"] = (
+            f"{justification} (tile row {tile['row'] + 1}, column {tile['col'] + 1} of the sheet)".strip()
+        )
+    return merged
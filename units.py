@@ -0,0 +1,310 @@
+"""
+Unit registry and quantity parsing.
+
+Extracted values are strings such as "Ø50 mm", "160...210 bar",
+"-10°C +60°C" or "25 ± 0.1 mm". parse_quantity reads one of them into a
+Quantity (magnitude, high end of a range, tolerance, unit) using a
+single pattern compiled from the registry, and Quantity.to_si converts it
+to the SI unit of its dimension. quantity_frame runs the same pattern over
+a whole column with pandas, so exports and filters compare numbers rather
+than strings. Only values that are a quantity as a whole are parsed: "M12
+x 1.5", "93 x 55 x 29 cm" or "160 BAR (max 210)" are left to the caller.
+"""
+import math
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+# display, dimension, SI scale, SI offset, aliases rewritten to display in text, other names recognised when parsing.
+# SI value = magnitude * scale + offset; the offset only applies to absolute temperatures.
+UNITS = [
+    ("mm", "length", 1e-3, 0.0, [], ["millimeter", "millimeters", "millimetre", "millimetres"]),
+    ("cm", "length", 1e-2, 0.0, [], ["centimeter", "centimeters", "centimetre", "centimetres"]),
+    ("m", "length", 1.0, 0.0, [], ["meter", "meters", "metre", "metres"]),
+    ("in", "length", 0.0254, 0.0, [], ["inch", "inches"]),
+    ("ft", "length", 0.3048, 0.0, [], ["foot", "feet"]),
+    ("g", "mass", 1e-3, 0.0, [], ["gram", "grams"]),
+    ("kg", "mass", 1.0, 0.0, [], ["kgs", "kilogram", "kilograms"]),
+    ("tons", "mass", 1e3, 0.0, ["t"], ["ton", "tonne", "tonnes"]),
+    ("lb", "mass", 0.45359237, 0.0, [], ["lbs", "pound", "pounds"]),
+    ("N", "force", 1.0, 0.0, [], ["newton", "newtons"]),
+    ("kN", "force", 1e3, 0.0, [], []),
+    ("Pa", "pressure", 1.0, 0.0, [], []),
+    ("kPa", "pressure", 1e3, 0.0, [], []),
+    ("MPa", "pressure", 1e6, 0.0, ["mpa", "MPA"], ["N/mm2", "N/mm²"]),
+    ("BAR", "pressure", 1e5, 0.0, ["bar"], ["bars"]),
+    ("mbar", "pressure", 1e2, 0.0, [], []),
+    ("PSI", "pressure", 6894.757293168, 0.0, ["psi"], []),
+    ("°C", "temperature", 1.0, 273.15, ["C", "DEG C", "deg C"], ["ºC", "degC", "degrees C", "celsius"]),
+    ("°F", "temperature", 5 / 9, 459.67 * 5 / 9, ["F", "DEG F", "deg F"], ["ºF", "degF", "degrees F", "fahrenheit"]),
+    ("K", "temperature", 1.0, 0.0, [], ["kelvin"]),
+    ("L", "volume", 1e-3, 0.0, [], ["l", "litre", "litres", "liter", "liters"]),
+    ("ml", "volume", 1e-6, 0.0, [], ["millilitre", "milliliter"]),
+    ("L/min", "flow", 1e-3 / 60, 0.0, [], ["l/min", "lpm"]),
+    ("Nm", "torque", 1.0, 0.0, [], ["N.m", "N·m"]),
+    ("°", "angle", math.pi / 180, 0.0, [], ["º", "deg", "degrees"]),
+]
+
+SI_UNITS = {
+    "length": "m", "mass": "kg", "force": "N", "pressure": "Pa", "temperature": "K",
+    "volume": "m³", "flow": "m³/s", "torque": "Nm", "angle": "rad",
+}
+
+# Display unit -> (dimension, scale, offset)
+UNIT_INFO = {display: (dimension, scale, offset) for display, dimension, scale, offset, _, _ in UNITS}
+
+
+def _lookup_key(spelling):
+    return re.sub(r"\s+", "", spelling.lower())
+
+
+def _spelling_pattern(spelling):
+    # Words of multi-word spellings may be separated by any amount of space, or none
+    return r"\s*".join(map(re.escape, spelling.split()))
+
+
+# Any spelling (case-insensitive, spaces removed) -> display unit
+UNIT_LOOKUP = {}
+for _display, _, _, _, _aliases, _names in UNITS:
+    for _spelling in [_display] + _aliases + _names:
+        UNIT_LOOKUP.setdefault(_lookup_key(_spelling), _display)
+
+_ALL_SPELLINGS = sorted(
+    {spelling for entry in UNITS for spelling in [entry[0]] + entry[4] + entry[5]}, key=len, reverse=True
+)
+# Longest spellings first, so "mm" is not read as "m" and "DEG C" not as a bare angle
+UNIT_ALTERNATION = "(?:" + "|".join(map(_spelling_pattern, _ALL_SPELLINGS)) + r")(?![A-Za-z0-9²])"
+
+# 1,000.5 / 1000.5 / 2,5 (decimal comma)
+NUMBER = r"[-+]?(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:[.,]\d+)?|[.,]\d+)"
+RANGE_SEPARATOR = r"(?:to|\.{2,3}|~|–|—|-|(?=\+))"
+
+QUANTITY_PATTERN = re.compile(
+    r"^\s*(?:Ø|⌀|DIA\.?)?\s*"
+    rf"(?P<magnitude>{NUMBER})\s*(?P<low_unit>{UNIT_ALTERNATION})?"
+    rf"(?:\s*{RANGE_SEPARATOR}\s*(?P<high>{NUMBER}))?"
+    rf"(?:\s*(?:±|\+/-)\s*(?P<tolerance>{NUMBER}))?"
+    rf"\s*(?P<unit>{UNIT_ALTERNATION})?\s*$",
+    re.IGNORECASE
+)
+
+# Thousands separators: a comma followed by exactly three digits
+THOUSANDS_PATTERN = re.compile(r",(?=\d{3}(?!\d))")
+
+# Unit aliases after a standalone number, rewritten to their display spelling ("160 bar" -> "160 BAR").
+# The number must start a token, so part and drawing numbers such as "HC-4520C" or "DWG-1002F"
+# are left alone; a "-" before it only counts as a range or sign when no letter precedes it.
+# Single-letter aliases (C, F, t) must also stand apart: "80 C" is rewritten, "300F-12" is not.
+_ALIASES = {alias: display for display, _, _, _, aliases, _ in UNITS for alias in aliases}
+
+
+def _alias_alternation(aliases):
+    return "|".join(map(_spelling_pattern, sorted(aliases, key=len, reverse=True)))
+
+
+ALIAS_PATTERN = re.compile(
+    r"(?<![A-Za-z0-9.,])(?<![A-Za-z]-)(\d+(?:[.,]\d+)?)"
+    r"(?:(\s+)(" + _alias_alternation([alias for alias in _ALIASES if len(alias) == 1]) + r")(?=\s|$|[,;)])"
+    r"|(\s*)(" + _alias_alternation([alias for alias in _ALIASES if len(alias) > 1]) + r")(?![A-Za-z0-9°]))"
+)
+
+
+def _to_number(text):
+    if text is None:
+        return None
+    return float(THOUSANDS_PATTERN.sub("", text).replace(",", "."))
+
+
+def _format_number(value):
+    return ("%.10f" % value).rstrip("0").rstrip(".")
+
+
+class Quantity(namedtuple("Quantity", "magnitude high tolerance unit")):
+    """
+    A parsed value: magnitude, high end of a range (or None), symmetric
+    tolerance (or None) and display unit (or None when the value had none)
+    """
+    __slots__ = ()
+
+    @property
+    def dimension(self):
+        return UNIT_INFO[self.unit][0] if self.unit else None
+
+    def to_si(self):
+        """Return the quantity in the SI unit of its dimension, or None when it has no unit"""
+        if not self.unit:
+            return None
+        dimension, scale, offset = UNIT_INFO[self.unit]
+        return Quantity(
+            self.magnitude * scale + offset,
+            None if self.high is None else self.high * scale + offset,
+            None if self.tolerance is None else self.tolerance * scale,
+            SI_UNITS[dimension]
+        )
+
+    def __str__(self):
+        text = _format_number(self.magnitude)
+        if self.high is not None:
+            text += f" to {_format_number(self.high)}"
+        if self.tolerance is not None:
+            text += f" ± {_format_number(self.tolerance)}"
+        return f"{text} {self.unit}" if self.unit else text
+
+
+def _unit_for(low_spelling, spelling, default_unit):
+    """Resolve the unit of a match; None when the two ends of a range name different units"""
+    low_unit = UNIT_LOOKUP.get(_lookup_key(low_spelling)) if low_spelling else None
+    unit = UNIT_LOOKUP.get(_lookup_key(spelling)) if spelling else None
+    if low_unit and unit and low_unit != unit:
+        return None, False
+    return unit or low_unit or default_unit, True
+
+
+def parse_quantity(text, default_unit=None):
+    """
+    Parse a value that is one quantity, range or toleranced quantity.
+
+    Args:
+        text: The value as extracted, e.g. "160...210 bar" or "Ø25 ± 0.1 mm"
+        default_unit: Display unit assumed when the value names none
+
+    Returns:
+        Quantity, or None when the value is not a single quantity
+    """
+    match = QUANTITY_PATTERN.match(text or "")
+    if not match:
+        return None
+    unit, consistent = _unit_for(match.group("low_unit"), match.group("unit"), default_unit)
+    if not consistent:
+        return None
+    return Quantity(
+        _to_number(match.group("magnitude")),
+        _to_number(match.group("high")),
+        _to_number(match.group("tolerance")),
+        unit
+    )
+
+
+def standardise(text, default_unit):
+    """
+    Rewrite a quantity value in the standard form "low to high UNIT" /
+    "value ± tolerance UNIT", adding default_unit when it names none.
+    Values that are not a single quantity are returned unchanged.
+    """
+    quantity = parse_quantity(text, default_unit)
+    return str(quantity) if quantity else text
+
+
+def normalise_unit_spellings(text):
+    """Rewrite unit aliases that follow a number to their display spelling ("5 t" -> "5 tons", "80 DEG C" -> "80 °C")"""
+    def rewrite(match):
+        number, space, alias = match.group(1), match.group(2) or match.group(4), match.group(3) or match.group(5)
+        # Multi-word aliases may be spaced differently from the registry ("DEG  C")
+        return number + space + _ALIASES[" ".join(alias.split())]
+    return ALIAS_PATTERN.sub(rewrite, text)
+
+
+def _numbers(series):
+    """Vectorised _to_number over a Series of number strings (NaN where missing)"""
+    return pd.to_numeric(
+        series.str.replace(THOUSANDS_PATTERN, "", regex=True).str.replace(",", ".", regex=False),
+        errors="coerce"
+    )
+
+
+def _units(series):
+    return series.str.lower().str.replace(r"\s+", "", regex=True).map(UNIT_LOOKUP)
+
+
+def quantity_frame(values, default_unit=None):
+    """
+    Parse a whole column of values at once.
+
+    Args:
+        values: Series or list of value strings
+        default_unit: Display unit assumed for values that name none
+
+    Returns:
+        DataFrame on the same index with magnitude, high, tolerance, unit,
+        dimension, si_value, si_high, si_tolerance and si_unit columns; the
+        numeric columns are NaN and the unit columns None where a value is
+        not a single quantity
+    """
+    values = pd.Series(values, dtype="object").fillna("").astype(str)
+    parts = values.str.extract(QUANTITY_PATTERN)
+
+    low_unit = _units(parts["low_unit"])
+    unit = _units(parts["unit"])
+    consistent = ~(low_unit.notna() & unit.notna() & (low_unit != unit))
+    unit = unit.fillna(low_unit)
+    if default_unit:
+        unit = unit.where(parts["magnitude"].isna(), unit.fillna(default_unit))
+    unit = unit.where(consistent)
+
+    magnitude = _numbers(parts["magnitude"]).where(consistent)
+    high = _numbers(parts["high"]).where(consistent)
+    tolerance = _numbers(parts["tolerance"]).where(consistent)
+
+    info = unit.map(UNIT_INFO)
+    dimension = info.map(lambda entry: entry[0], na_action="ignore")
+    scale = info.map(lambda entry: entry[1], na_action="ignore").astype(float)
+    offset = info.map(lambda entry: entry[2], na_action="ignore").astype(float)
+
+    return pd.DataFrame({
+        "magnitude": magnitude,
+        "high": high,
+        "tolerance": tolerance,
+        "unit": unit,
+        "dimension": dimension,
+        "si_value": magnitude * scale + offset,
+        "si_high": high * scale + offset,
+        "si_tolerance": tolerance * scale,
+        "si_unit": dimension.map(SI_UNITS),
+    }, index=values.index)
+
+
+def si_columns(table, columns=None):
+    """
+    Convert the quantity columns of a wide table (one column per parameter) to SI numbers.
+
+    Returns:
+        (DataFrame of SI values on the table's index, {column: SI unit}) for the
+        columns whose parsed values all share one dimension; the low end is
+        used for ranges
+    """
+    si_values = {}
+    si_units = {}
+    for column in (columns if columns is not None else table.columns):
+        if pd.api.types.is_numeric_dtype(table[column]):
+            continue
+        quantities = quantity_frame(table[column])
+        found = quantities["si_unit"].dropna().unique()
+        if len(found) != 1:
+            continue
+        si_values[column] = quantities["si_value"]
+        si_units[column] = found[0]
+    return pd.DataFrame(si_values, index=table.index), si_units
+
+
+def results_table(all_results):
+    """Wide table of extracted values: one row per drawing number, one column per parameter"""
+    rows = {
+        drawing_number: {
+            key: value for key, value in results.items()
+            if not key.endswith("_JUSTIFICATION") and key not in ("DOCUMENT_TYPE", "COMPONENT_TYPE")
+        }
+        for drawing_number, results in all_results.items()
+        if isinstance(results, dict)
+    }
+    return pd.DataFrame.from_dict(rows, orient="index", dtype=object)
+
+
+def in_range(si_values, minimum=None, maximum=None):
+    """Boolean mask of SI values within [minimum, maximum]; missing values never match"""
+    mask = si_values.notna()
+    if minimum is not None:
+        mask &= si_values >= minimum
+    if maximum is not None:
+        mask &= si_values <= maximum
+    return mask